@@ -10,15 +10,72 @@ Description: A wrap for build a BSgenome
 """
 
 import os
+import sys
+import argparse
+import builtins
+import csv
 import datetime
+import json
+import re
 import subprocess
 import glob
 import shutil
-from prompt_toolkit import prompt
-from rich import print
-from rich.markdown import Markdown
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path
 
-from prompts import PROMPT_TEXTS
+from journal import Journal, inputs_fingerprint
+
+# Helper modules under scripts/ are imported where they are first needed.
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+# rich and prompt_toolkit take longer to import than a headless run needs to
+# start, so they are imported on first use, and with --headless not at all:
+# output is plain text and any question that has no answer is an error.
+HEADLESS = False
+MARKUP = re.compile(r'\[/?(?:bold )?(?:red|green|yellow|cyan)\]')
+
+def print(*objects, **kwargs):
+    """rich's print, or the built-in print without markup when headless."""
+    if HEADLESS:
+        builtins.print(*(MARKUP.sub('', o) if isinstance(o, str) else o for o in objects), **kwargs)
+        return
+    from rich import print as rich_print
+    rich_print(*objects, **kwargs)
+
+def set_headless(headless):
+    """Process pool initializer, so spawned manifest workers print like the parent."""
+    global HEADLESS
+    HEADLESS = headless
+
+def prompt(message, **kwargs):
+    """prompt_toolkit's prompt; exits when headless, where nobody can answer."""
+    if HEADLESS:
+        print(f"[bold red]--headless run needs an answer to:[/bold red] {message.strip()}")
+        sys.exit(1)
+    from prompt_toolkit import prompt as toolkit_prompt
+    return toolkit_prompt(message, **kwargs)
+
+# Long-lived R process (scripts/r_worker.py) used instead of one Rscript per
+# R task when --r-worker is given; see start_r_worker().
+rworker = None
+# Background scans of the candidate FASTA files, started by the wizard.
+fasta_prescan = None
+
+def start_r_worker():
+    """Starts the shared R worker, loading BSgenome once for every later R task."""
+    global rworker
+    import r_worker
+
+    print("[bold green]Starting the R worker (loading BSgenome once)...[/bold green]")
+    rworker = r_worker.RWorker()
+    try:
+        rworker.start()
+    except r_worker.RWorkerError as e:
+        print(f"[bold yellow]R worker unavailable, running Rscript per task:[/bold yellow] {e}")
+        rworker = None
 
 def check_and_install_dependencies():
     """Checks for faToTwoBit and installs it if necessary."""
@@ -35,11 +92,11 @@ def check_and_install_dependencies():
         subprocess.run(['chmod', '+x', './faToTwoBit'], check=True)
         return './faToTwoBit'
 
-    # 3. If not found, ask to download
-    answer = prompt('faToTwoBit is not found. Do you want to download and install it? (yes/no) ').strip().lower()
+    # 3. If not found, ask to download (headless runs never download)
+    answer = 'no' if HEADLESS else prompt('faToTwoBit is not found. Do you want to download and install it? (yes/no) ').strip().lower()
     if answer != 'yes':
-        print('faToTwoBit is not installed. Exiting.')
-        exit()
+        print('[yellow]faToTwoBit is not installed. Using the built-in 2bit encoder instead.[/yellow]')
+        return None
 
     print('Downloading faToTwoBit...')
     try:
@@ -48,7 +105,8 @@ def check_and_install_dependencies():
         subprocess.run(['chmod', '+x', 'faToTwoBit'], check=True)
     except (subprocess.CalledProcessError, FileNotFoundError) as e:
         print(f"[bold red]Failed to download or set permissions for faToTwoBit: {e}[/bold red]")
-        exit()
+        print('[yellow]Using the built-in 2bit encoder instead.[/yellow]')
+        return None
 
     # Try to move to a bin directory, but fall back to current dir
     install_path = ""
@@ -66,23 +124,73 @@ def check_and_install_dependencies():
     print('faToTwoBit is available in the current directory.')
     return './faToTwoBit'
 
+def r_probe_path():
+    """Where the result of the last successful R package check is kept."""
+    root = os.environ.get('AUTOBSGENOME_CACHE') or os.path.join(os.path.expanduser('~'), '.cache', 'autoBSgenome')
+    return os.path.join(root, 'r-packages.json')
+
+def r_probe_state(packages, libpaths):
+    """What the R package check depends on: Rscript, the R_LIBS* variables and the library directories.
+
+    Installing, updating or removing a package changes its library directory's mtime.
+    """
+    rscript = shutil.which('Rscript')
+    return {
+        'packages': packages,
+        'rscript': [rscript, os.stat(rscript).st_mtime_ns] if rscript else None,
+        'env': {name: os.environ.get(name) for name in ('R_HOME', 'R_LIBS', 'R_LIBS_USER', 'R_LIBS_SITE')},
+        'libpaths': {path: os.stat(path).st_mtime_ns if os.path.isdir(path) else None for path in libpaths},
+    }
+
+def r_packages_cached(packages):
+    """True if the last check found every package and nothing it depended on has changed since."""
+    try:
+        with open(r_probe_path()) as f:
+            saved = json.load(f)
+        return saved == r_probe_state(packages, list(saved['libpaths']))
+    except (OSError, ValueError, KeyError, TypeError):
+        return False
+
+def save_r_probe(packages, libpaths):
+    path = r_probe_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(r_probe_state(packages, libpaths), f, sort_keys=True)
+        os.replace(path + '.tmp', path)
+    except OSError as e:
+        print(f"[yellow]Cannot cache the R package check: {e}[/yellow]")
+
 def check_r_dependencies():
     """Checks for required R packages and prompts for installation if missing."""
     required_packages = ['BSgenome', 'BSgenomeForge']
+    if r_packages_cached(required_packages):
+        print("All required R packages are already installed (cached check).")
+        return
     print("[bold green]Checking for required R packages...[/bold green]")
     
-    # Command to find missing packages
+    # Command to find missing packages; the library paths follow on later lines
     r_check_command = f"""
     packages <- c('{required_packages[0]}', '{required_packages[1]}');
     missing_packages <- packages[!sapply(packages, function(p) requireNamespace(p, quietly = TRUE))];
-    cat(paste(missing_packages, collapse=','))
+    cat(paste(missing_packages, collapse=','), .libPaths(), sep='\\n')
     """
     
-    result = subprocess.run(['Rscript', '-e', r_check_command], capture_output=True, text=True)
-    missing_packages_str = result.stdout.strip()
+    if rworker is not None:
+        reply = rworker.probe(required_packages)
+        missing_packages_str = ','.join(reply['missing'])
+        libpaths = reply['libpaths']
+    else:
+        result = subprocess.run(['Rscript', '-e', r_check_command], capture_output=True, text=True)
+        missing_packages_str, *libpaths = result.stdout.rstrip('\n').split('\n')
+        if result.returncode != 0:
+            libpaths = []
     
     if not missing_packages_str:
         print("All required R packages are already installed.")
+        # Only a complete check is cached; a missing package is looked for again next run.
+        if libpaths:
+            save_r_probe(required_packages, libpaths)
         return
 
     missing_packages = missing_packages_str.split(',')
@@ -108,14 +216,9 @@ def check_r_dependencies():
     
     print("[bold green]R packages installed successfully.[/bold green]")
 
-def get_user_input():
-    """Gathers all necessary metadata from the user via prompts in a wizard-like fashion."""
-    
-    print(Markdown("\n---\n*Entering interactive metadata entry mode. At any prompt, type `back` to return to the previous question.*---\n"))
-    
-    metadata = {}
-    
-    steps = [
+def metadata_steps():
+    """The metadata keys in wizard order, with the rules used to check and default them."""
+    return [
         {
             'key': 'package_name',
             'prompt_text_key': "package",
@@ -167,66 +270,211 @@ def get_user_input():
             'key': 'seqfile_name',
             'prompt_text_key': "seqfile_name",
             'display_text': "Please enter the seqfile_name: ",
-            'pre_prompt_action': lambda data: print('All the fa/fasta files in current folder list here:', glob.glob("*.fasta") + glob.glob("*.fa") + glob.glob("*.fas") + glob.glob("*.fna"))
+            'pre_prompt_action': lambda data: print_fasta_candidates(),
+            'validate': lambda val, data: bool(val) or bool(list_fasta_files(data.get('seqs_srcdir') or os.getcwd())),
+            'on_error': lambda val, data: print("[bold red]No fa/fasta files found in seqs_srcdir to combine. Please enter a file name.[/bold red]")
         },
     ]
 
-    i = 0
-    while i < len(steps):
-        step = steps[i]
+class FastaPrescan:
+    """Profiles candidate FASTA files in background threads while the wizard asks its questions.
+
+    Each scan (scripts/twobit.py prescan) validates the file and records its size,
+    sequence count, largest sequence and whether faToTwoBit needs -long; the
+    conversion step takes the chosen files' record layout from it instead of
+    reading them again.
+    """
+
+    def __init__(self):
+        import twobit
+
+        self.twobit = twobit
+        self.pool = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix='prescan')
+        self.scans = {}
+
+    def add_directory(self, directory):
+        """Starts scanning every FASTA in the directory that is not being scanned yet."""
+        for path in list_fasta_files(directory):
+            path = os.path.abspath(path)
+            if path not in self.scans:
+                stop = threading.Event()
+                self.scans[path] = (self.pool.submit(self.twobit.prescan, Path(path), stop), stop)
+
+    def describe(self, path):
+        """One line on the file for the file-selection prompt."""
+        future, _ = self.scans[os.path.abspath(path)]
+        size = f"{os.path.getsize(path) / 1024 ** 2:,.1f} MB"
+        if not future.done():
+            return f"{size}, [cyan]still scanning[/cyan]"
+        try:
+            scan = future.result()
+        except Exception as e:
+            return f"{size}, [bold red]not usable: {e}[/bold red]"
+        long = ", [yellow]needs -long[/yellow]" if scan['long'] else ""
+        return f"{size}, {scan['seq_count']:,} sequences, largest {scan['longest_seq']:,} bp{long}"
+
+    def keep(self, paths):
+        """Stops the scans of every file not in `paths`; the others run on for the conversion step."""
+        chosen = {os.path.abspath(path) for path in paths}
+        for path, (future, stop) in self.scans.items():
+            if path not in chosen:
+                future.cancel()
+                stop.set()
+        self.pool.shutdown(wait=False)
+
+    def results(self, paths):
+        """The finished scans of `paths`; None if any is missing or stale."""
+        scans = []
+        for path in paths:
+            entry = self.scans.get(os.path.abspath(path))
+            if entry is None:
+                return None
+            try:
+                scan = entry[0].result()
+            except Exception:
+                return None
+            info = os.stat(path)
+            if scan is None or (scan['size'], scan['mtime_ns']) != (info.st_size, info.st_mtime_ns):
+                return None
+            scans.append(scan)
+        return scans
+
+    def layout(self, paths, only=None):
+        """encode_files() headers and long from the scans of `paths`, for the records in `only`; None if any scan is missing or stale."""
+        scans = self.results(paths)
+        if scans is None:
+            return None
+        headers = {Path(path): scan['headers'] for path, scan in zip(paths, scans)}
+        records = [record for scan in scans for record in scan['records'] if only is None or record[0] in only]
+        return {'headers': headers, 'long': self.twobit.needs_long(records)}
+
+def print_fasta_candidates():
+    """Lists the FASTA files in the current folder with what the background scan found so far."""
+    candidates = list_fasta_files(os.getcwd())
+    if not candidates:
+        print('No fa/fasta files in the current folder.')
+        return
+    print('All the fa/fasta files in current folder list here:')
+    for path in candidates:
+        details = fasta_prescan.describe(path) if fasta_prescan else ''
+        print(f"  {os.path.basename(path)}  {details}")
+
+def get_user_input():
+    """Gathers all necessary metadata from the user via prompts in a wizard-like fashion."""
+    global fasta_prescan
+    from rich.markdown import Markdown
+    from prompts import PROMPT_TEXTS
+
+    fasta_prescan = FastaPrescan()
+    fasta_prescan.add_directory(os.getcwd())
+
+    print(Markdown("\n---\n*Entering interactive metadata entry mode. At any prompt, type `back` to return to the previous question.*---\n"))
+    
+    metadata = {}
+    
+    steps = metadata_steps()
+
+    # Without this the scan threads would hold up the exit after Ctrl-C.
+    try:
+        i = 0
+        while i < len(steps):
+            step = steps[i]
         
-        print(Markdown(PROMPT_TEXTS[step['prompt_text_key']]))
+            print(Markdown(PROMPT_TEXTS[step['prompt_text_key']]))
 
-        if 'pre_prompt_action' in step:
-            step['pre_prompt_action'](metadata)
+            if 'pre_prompt_action' in step:
+                step['pre_prompt_action'](metadata)
 
-        default_value = metadata.get(step['key'], '')
-        if 'get_default' in step:
-            suggested_default = step['get_default'](metadata)
-            if suggested_default:
-                print(f"Suggested value: [cyan]{suggested_default}[/cyan]")
-                default_value = suggested_default
+            default_value = metadata.get(step['key'], '')
+            if 'get_default' in step:
+                suggested_default = step['get_default'](metadata)
+                if suggested_default:
+                    print(f"Suggested value: [cyan]{suggested_default}[/cyan]")
+                    default_value = suggested_default
         
-        user_input = prompt(step['display_text'], default=default_value).strip()
+            user_input = prompt(step['display_text'], default=default_value).strip()
 
-        if user_input.lower() == 'back':
-            if i > 0:
-                i -= 1
-            else:
-                print("[yellow]Cannot go back further.[/yellow]")
-            print(Markdown("---"))
-            continue
+            if user_input.lower() == 'back':
+                if i > 0:
+                    i -= 1
+                else:
+                    print("[yellow]Cannot go back further.[/yellow]")
+                print(Markdown("---"))
+                continue
 
-        if 'validate' in step and not step['validate'](user_input, metadata):
-            if 'on_error' in step:
-                step['on_error'](user_input, metadata)
-            continue
+            if 'validate' in step and not step['validate'](user_input, metadata):
+                if 'on_error' in step:
+                    step['on_error'](user_input, metadata)
+                continue
         
-        if 'on_success' in step:
-            step['on_success'](user_input, metadata)
+            if 'on_success' in step:
+                step['on_success'](user_input, metadata)
 
-        metadata[step['key']] = user_input
+            metadata[step['key']] = user_input
+            if step['key'] == 'seqs_srcdir' and os.path.isdir(user_input):
+                fasta_prescan.add_directory(user_input)
         
-        i += 1
-        print(Markdown("---"))
+            i += 1
+            print(Markdown("---"))
+    except BaseException:
+        fasta_prescan.keep([])
+        raise
+
+    resolve_seqfiles(metadata)
+    fasta_prescan.keep(metadata.get('seqfiles') or [metadata['seqfile_name']])
+    if metadata.get('seqfiles'):
+        print(f"Combining {len(metadata['seqfiles'])} FASTA files into {metadata['twobit_name']}")
+
+    return metadata
 
+def resolve_seqfiles(metadata):
+    """Sets twobit_name from seqfile_name; without one, every FASTA in seqs_srcdir goes in seqfiles and twobit_dir is the 2bit's directory."""
     seqfile = metadata.get('seqfile_name', '')
-    if seqfile.endswith(('.fa', '.fna', '.fasta', '.fas')):
-        metadata['twobit_name'] = seqfile.rsplit('.', 1)[0] + '.2bit'
+    if not seqfile:
+        # One FASTA per chromosome: combine everything in seqs_srcdir. The
+        # combined 2bit is written to the current directory, which the seed
+        # must then name as seqs_srcdir.
+        metadata['seqfiles'] = list_fasta_files(metadata.get('seqs_srcdir') or os.getcwd())
+        metadata['twobit_name'] = metadata['genome'] + '.2bit'
+        metadata['twobit_dir'] = os.getcwd()
+    elif seqfile.removesuffix('.gz').endswith(('.fa', '.fna', '.fasta', '.fas')):
+        metadata['twobit_name'] = seqfile.removesuffix('.gz').rsplit('.', 1)[0] + '.2bit'
     else:
         metadata['twobit_name'] = seqfile
 
-    return metadata
+def list_fasta_files(directory):
+    """Lists the fa/fasta files (optionally gzipped) in a directory in name order."""
+    patterns = ('*.fa', '*.fna', '*.fasta', '*.fas')
+    patterns += tuple(pattern + '.gz' for pattern in patterns)
+    return sorted(path for pattern in patterns for path in glob.glob(os.path.join(directory, pattern)))
 
-def create_seed_file(metadata):
+def create_seed_file(metadata, selection=None):
     """Creates the .seed file from the provided metadata."""
     seed_filename = metadata['package_name'] + '.seed'
     print(f"\n[bold green]Generating seed file: {seed_filename}[/bold green]")
     
-    content = f"""
+    content = seed_content(metadata, selection)
+    with open(seed_filename, 'w') as f:
+        f.write(content + '\n')
+    
+    print('--- Seed File Content ---')
+    print(content)
+    print('-------------------------')
+    return seed_filename
+
+def seed_content(metadata, selection=None):
+    """The DCF text of the .seed file for the metadata; a build-mode selection is described and drops its excluded circ_seqs."""
+    description = metadata['description']
+    circ_seqs = metadata['circ_seqs']
+    if selection:
+        import select_sequences
+
+        description = f"{description} {select_sequences.description(selection)}".strip()
+        circ_seqs = select_sequences.kept_circ_seqs(circ_seqs, selection['kept'])
+    return f"""
 Package: {metadata['package_name']}
 Title: {metadata['title']}
-Description: {metadata['description']}
+Description: {description}
 Version: {metadata['version']}
 organism: {metadata['organism']}
 common_name: {metadata['common_name']}
@@ -236,53 +484,179 @@ release_date: {metadata['release_date']}
 source_url: {metadata['source_url']}
 organism_biocview: {metadata['organism_biocview']}
 BSgenomeObjname: {metadata['BSgenomeObjname']}
-circ_seqs: {metadata['circ_seqs']}
-seqs_srcdir: {metadata['seqs_srcdir']}
+circ_seqs: {circ_seqs}
+seqs_srcdir: {metadata.get('twobit_dir') or metadata['seqs_srcdir']}
 seqfile_name: {metadata['twobit_name']}
-"""
-    with open(seed_filename, 'w') as f:
-        f.write(content.strip() + '\n')
-    
-    print('--- Seed File Content ---')
-    print(content.strip())
-    print('-------------------------')
-    return seed_filename
+""".strip()
 
-def run_faToTwoBit(faToTwoBit_path, metadata):
-    """Converts FASTA to 2bit format."""
-    print(f"\n[bold green]Converting {metadata['seqfile_name']} to {metadata['twobit_name']}...[/bold green]")
-    command = [faToTwoBit_path, metadata['seqfile_name'], metadata['twobit_name']]
-    result = subprocess.run(command, capture_output=True, text=True)
-    if result.returncode != 0:
-        print(f"[bold red]Error converting to 2bit format:[/bold red]")
-        print(result.stderr)
+def plan_staging(sources):
+    """The scripts/staging.py plan for building from `sources` here, or None if the disk is too small for any."""
+    import staging
+
+    try:
+        # The wizard never deletes the user's FASTA files, and streams a .gz.
+        plan, figures = staging.choose([Path(source) for source in sources], Path('.'), os.cpu_count() or 1, inflate=False)
+    except OSError as e:
+        print(f"[yellow]Cannot estimate the disk space the build needs: {e}[/yellow]")
+        return staging.Plan('stream', os.cpu_count() or 1, False, 'hardlink', 0)
+    if plan is None:
+        print(f"[bold red]Not enough disk space: the build needs about {staging.gigabytes(figures['required_bytes'])} "
+              f"at its peak, but only {staging.gigabytes(figures['free_bytes'])} is free here.[/bold red]")
+        return None
+    print(f"Disk: about {staging.gigabytes(figures['required_bytes'])} needed at the peak, "
+          f"{staging.gigabytes(figures['free_bytes'])} free; encoding with {plan.encode_jobs} process(es), 2bit placed by {plan.placement}.")
+    return plan
+
+def build_mode_inputs(metadata):
+    """(mode, parameter, assembly report) of the metadata's build mode."""
+    return metadata.get('build_mode') or 'full', metadata.get('build_mode_param') or '', metadata.get('assembly_report') or ''
+
+def select_build_sequences(metadata, sources, journal=None):
+    """The scripts/select_sequences.py selection for the build mode, or None after printing why it failed.
+
+    Lengths come from the background scans when they are still current; a selection
+    made from the same files and mode is taken from the journal.
+    """
+    import select_sequences
+    import twobit
+
+    mode, param, report = build_mode_inputs(metadata)
+    inputs = inputs_fingerprint([mode, param], sources + ([report] if report else []))
+    saved = journal.options.get('selection') if journal else None
+    if saved and saved['inputs'] == inputs:
+        selection = saved['result']
+    else:
+        print(f"\n[bold green]Selecting sequences for build mode {mode}...[/bold green]")
+        try:
+            assembled = select_sequences.read_assembly_report(Path(report)) if report and mode == 'chromosomes' else None
+            scans = fasta_prescan.results(sources) if fasta_prescan else None
+            scans = scans or [twobit.prescan(Path(source)) for source in sources]
+            selection = select_sequences.select(select_sequences.records_from_scans(scans), mode, param, assembled)
+        except (OSError, ValueError) as e:
+            print(f"[bold red]Cannot select sequences:[/bold red] {e}")
+            return None
+        if journal:
+            journal.options['selection'] = {'inputs': inputs, 'result': selection}
+            journal.save()
+    print(select_sequences.description(selection))
+    return selection
+
+def run_faToTwoBit(faToTwoBit_path, metadata, jobs=None, selection=None):
+    """Converts FASTA to 2bit format, reusing a cached 2bit of the same FASTA.
+
+    A build-mode `selection` is always encoded by scripts/twobit.py, which writes only the kept sequences.
+    """
+    import artifact_cache
+
+    sources = metadata.get('seqfiles') or [metadata['seqfile_name']]
+    cache = artifact_cache.default_cache()
+    kept_digest = selection['kept_digest'] if selection else None
+    key = cache.twobit_key([Path(source) for source in sources], kept_digest) if cache.enabled else None
+    if key and cache.fetch('2bit', key, Path(metadata['twobit_name'])):
+        print(f"\n[bold green]Reusing cached 2bit of {', '.join(sources)} as {metadata['twobit_name']}.[/bold green]")
+        return True
+    print(f"\n[bold green]Converting {', '.join(sources)} to {metadata['twobit_name']}...[/bold green]")
+    only = set(selection['kept']) if selection else None
+    layout = fasta_prescan.layout(sources, only) if fasta_prescan else None
+    if layout:
+        print("Using the record layout found by the background scan.")
+    if faToTwoBit_path is None or selection:
+        converted = run_builtin_twobit(sources, metadata, layout, jobs, only)
     else:
-        print('[bold green]Conversion successful.[/bold green]')
+        command = [faToTwoBit_path, *sources, metadata['twobit_name']]
+        if layout and layout['long']:
+            command.insert(1, '-long')
+        result = subprocess.run(command, capture_output=True, text=True)
+        converted = result.returncode == 0
+        if not converted:
+            print(f"[bold red]Error converting to 2bit format:[/bold red]")
+            print(result.stderr)
+        else:
+            print('[bold green]Conversion successful.[/bold green]')
+    if converted and key:
+        cache.store('2bit', key, Path(metadata['twobit_name']))
+    return converted
+
+def run_builtin_twobit(sources, metadata, layout=None, jobs=None, only=None):
+    """Converts FASTA to 2bit with scripts/twobit.py, byte-identical to faToTwoBit; True on success.
+
+    `layout` is FastaPrescan.layout() of the sources, which saves the encoder its header pass;
+    `only` limits the 2bit to the sequences with these names.
+    """
+    import twobit
+
+    layout = layout or {'headers': None, 'long': False}
+    try:
+        twobit.encode_files([Path(source) for source in sources], Path(metadata['twobit_name']), jobs=jobs or os.cpu_count() or 1,
+                            long=True if layout['long'] else None, headers=layout['headers'], only=only)
+    except (OSError, ValueError) as e:
+        print(f"[bold red]Error converting to 2bit format:[/bold red]")
+        print(str(e))
+        return False
+    print('[bold green]Conversion successful.[/bold green]')
+    return True
 
-def create_and_run_build_script(metadata, seed_filename):
-    """Creates the build.R script and optionally runs it."""
-    build_script_name = prompt("Press ENTER to use default script name 'build.R', or enter a new name: ").strip()
-    if not build_script_name:
-        build_script_name = "build.R"
+def assemble_package(seed_filename, placement=None):
+    """Writes the package tree from the seed with scripts/forge_bsgenome.py; False if R has to forge it."""
+    import forge_bsgenome
 
+    try:
+        result = forge_bsgenome.assemble(Path(seed_filename), placement=placement)
+    except (OSError, ValueError) as e:
+        print(f"[bold yellow]Could not assemble the package directly, build.R will forge it:[/bold yellow] {e}")
+        return False
+    print(f"[bold green]Assembled package {result['package']} ({result['seq_count']} sequences).[/bold green]")
+    return True
+
+def forge_package(metadata, seed_filename, placement=None):
+    """Writes the package directory, with forgeBSgenomeDataPkg in R if the Python assembler fails.
+
+    `placement` is the staging plan's way of putting the 2bit into the package.
+    """
     package_name = metadata['package_name']
     twobit_name = metadata['twobit_name']
 
     if os.path.exists(package_name):
         shutil.rmtree(package_name)
 
-    r_script_content = f"""
-suppressPackageStartupMessages(library(BSgenome))
+    if assemble_package(seed_filename, placement):
+        return True
+
+    if rworker is not None:
+        import r_worker
+        try:
+            rworker.forge(Path(seed_filename), replace=True)
+        except r_worker.RWorkerError as e:
+            print(f"Error occurred during forgeBSgenomeDataPkg: {e}")
+            # Fallback to manual creation if forging fails at certain steps
+            import staging
+            os.makedirs(os.path.join(package_name, 'inst', 'extdata'), exist_ok=True)
+            methods = (placement,) if placement else ('hardlink', 'reflink', 'copy')
+            staging.place(Path(twobit_name), Path(package_name, 'inst', 'extdata', 'single_sequences.2bit'), methods)
+        return os.path.isdir(package_name)
 
+    r_forge = f"""
+suppressPackageStartupMessages(library(BSgenome))
 tryCatch({{
   if (dir.exists('{package_name}')) {{ unlink('{package_name}', recursive = TRUE) }}
   forgeBSgenomeDataPkg('{seed_filename}')
 }}, error = function(e) {{
   message('Error occurred during forgeBSgenomeDataPkg: ', e$message)
-  # Fallback to manual creation if forging fails at certain steps
+  # Fallback to manual creation if forging fails at certain steps; a hardlink
+  # instead of a second copy of the 2bit where the filesystem allows it
   dir.create('./{package_name}/inst/extdata/', recursive = TRUE, showWarnings = FALSE)
-  file.copy('./{twobit_name}', './{package_name}/inst/extdata/single_sequences.2bit')
+  if (!suppressWarnings(file.link('./{twobit_name}', './{package_name}/inst/extdata/single_sequences.2bit'))) {{
+    file.copy('./{twobit_name}', './{package_name}/inst/extdata/single_sequences.2bit')
+  }}
 }})
+"""
+    subprocess.run(['Rscript', '-e', r_forge])
+    return os.path.isdir(package_name)
+
+def create_build_script(metadata, build_script_name):
+    """Writes the R script that builds and installs the forged package by hand."""
+    package_name = metadata['package_name']
+    r_script_content = f"""
 system('R CMD build {package_name}')
 system('R CMD INSTALL {package_name}')
 """
@@ -293,21 +667,448 @@ system('R CMD INSTALL {package_name}')
     print('You can build the package using this R command:')
     print(f"Rscript {build_script_name}")
 
-    install_answer = prompt("Do you want to install the package now? (yes/no): ").strip().lower()
-    if install_answer == 'yes':
-        print('[bold green]Running build and installation...[/bold green]')
-        subprocess.run(['Rscript', build_script_name])
+def build_package(metadata):
+    """Writes PACKAGE_VERSION.tar.gz from the package directory with scripts/build_tarball.py."""
+    import build_tarball
+
+    try:
+        result = build_tarball.build_tarball(Path(metadata['package_name']))
+    except (OSError, ValueError) as e:
+        print(f"[bold red]Error building the package tarball:[/bold red] {e}")
+        return False
+    print(f"[bold green]Built {result['tarball']}.[/bold green]")
+    return True
+
+def install_package(tarball):
+    """Installs the package tarball with R CMD INSTALL (through the R worker if one is running)."""
+    if rworker is not None:
+        import r_worker
+        try:
+            rworker.install(Path(tarball), r_worker.package_name(Path(tarball)))
+        except r_worker.RWorkerError as e:
+            print(f"[bold red]R CMD INSTALL {tarball} failed:[/bold red] {e}")
+            return False
+        print('[bold green]Package installed.[/bold green]')
+        return True
+    result = subprocess.run(['R', 'CMD', 'INSTALL', tarball])
+    if result.returncode != 0:
+        print(f"[bold red]R CMD INSTALL {tarball} failed.[/bold red]")
+        return False
+    print('[bold green]Package installed.[/bold green]')
+    return True
+
+def package_cache_key(metadata, seed_filename, sources, selection=None):
+    """The artifact cache and the tarball key of this build; the key is None when the cache is disabled."""
+    import artifact_cache
+    import forge_bsgenome
+
+    cache = artifact_cache.default_cache()
+    if not cache.enabled:
+        return cache, None
+    twobit_key = cache.twobit_key([Path(source) for source in sources], selection['kept_digest'] if selection else None)
+    return cache, artifact_cache.tarball_key(forge_bsgenome.read_seed(Path(seed_filename)), twobit_key)
+
+def run_step(journal, step, inputs, outputs, action, resuming):
+    """Runs one pipeline step unless the journal shows it finished from the same inputs."""
+    if resuming and journal.is_done(step, inputs):
+        print(f"[cyan]Skipping step {step}: already done with the same inputs.[/cyan]")
+        return True
+    journal.invalidate(step)
+    if not action():
+        print(f"[bold red]Step {step} failed. Fix the problem and rerun with --resume to continue from here.[/bold red]")
+        return False
+    journal.complete(step, inputs, outputs)
+    return True
+
+def run_pipeline(faToTwoBit_path, metadata, journal, resuming, install=False):
+    """seed -> 2bit -> forge -> build -> install, each step recorded in the journal.
+
+    A cached tarball of the same seed and FASTA skips 2bit, forge and build.
+    """
+    package_name = metadata['package_name']
+    seed_filename = package_name + '.seed'
+    twobit_name = metadata['twobit_name']
+    sources = metadata.get('seqfiles') or [metadata['seqfile_name']]
+    tarball = f"{package_name}_{metadata['version']}.tar.gz"
+
+    # A build mode other than full keeps a subset of the sequences.
+    selection = None
+    if build_mode_inputs(metadata)[0] != 'full':
+        selection = select_build_sequences(metadata, sources, journal)
+        if selection is None:
+            return
+    kept = [selection['kept_digest']] if selection else []
+    twobit_inputs = inputs_fingerprint([faToTwoBit_path or 'builtin'] + kept, sources)
+
+    # Refuse before any work if the disk cannot hold the build at its peak.
+    jobs = placement = None
+    if not (resuming and journal.is_done('2bit', twobit_inputs)):
+        plan = plan_staging(sources)
+        if plan is None:
+            return
+        jobs, placement = plan.encode_jobs, plan.placement
+
+    # A step that reruns changes its outputs, so every later step reruns too.
+    if not run_step(journal, 'seed', inputs_fingerprint([metadata] + kept), [seed_filename],
+                    lambda: bool(create_seed_file(metadata, selection)), resuming):
+        return
+    cache, tarball_key = package_cache_key(metadata, seed_filename, sources, selection)
+    cached = tarball_key is not None and cache.fetch('tarball', tarball_key, Path(tarball))
+    options = journal.options
+    if cached:
+        print(f"\n[bold green]Reusing cached package {tarball}; skipping 2bit, forge and build.[/bold green]")
     else:
+        if not run_step(journal, '2bit', twobit_inputs, [twobit_name],
+                        lambda: run_faToTwoBit(faToTwoBit_path, metadata, jobs, selection), resuming):
+            return
+        if not run_step(journal, 'forge', inputs_fingerprint(paths=[seed_filename, twobit_name]), [package_name],
+                        lambda: forge_package(metadata, seed_filename, placement), resuming):
+            return
+
+        # Headless runs take the defaults: build.R, and install only with --install.
+        if 'build_script' not in options:
+            build_script_name = '' if HEADLESS else prompt("Press ENTER to use default script name 'build.R', or enter a new name: ").strip()
+            options['build_script'] = build_script_name or "build.R"
+            journal.save()
+        create_build_script(metadata, options['build_script'])
+
+    if options.get('install') != 'yes':
+        if install or HEADLESS:
+            options['install'] = 'yes' if install else 'no'
+        else:
+            options['install'] = prompt("Do you want to install the package now? (yes/no): ").strip().lower()
+        journal.save()
+    if options['install'] != 'yes':
         print("Skipping package installation.")
+        return
+    print('[bold green]Running installation...[/bold green]' if cached else '[bold green]Running build and installation...[/bold green]')
+
+    def build():
+        if not build_package(metadata):
+            return False
+        if tarball_key is not None:
+            cache.store('tarball', tarball_key, Path(tarball))
+        return True
+
+    if not cached and not run_step(journal, 'build', inputs_fingerprint(paths=[package_name]), [tarball],
+                                   build, resuming):
+        return
+    run_step(journal, 'install', inputs_fingerprint(paths=[tarball]), [],
+             lambda: install_package(tarball), resuming)
+
+# Seed fields forgeBSgenomeDataPkg needs that the wizard lets through empty.
+MANIFEST_REQUIRED = ('title', 'version', 'organism')
+# Peak memory of one build apart from faToTwoBit, which keeps the whole 2bit in memory.
+BUILD_MEMORY = 512 * 1024 ** 2
+# Optional manifest columns (and command-line defaults) that pick the sequences a build keeps.
+BUILD_MODE_KEYS = ('build_mode', 'build_mode_param', 'assembly_report')
+
+def read_manifest(path):
+    """Reads genome rows from a TSV file with the metadata keys as header, or a JSON list of objects."""
+    if path.endswith('.json'):
+        with open(path) as f:
+            rows = json.load(f)
+        if not isinstance(rows, list):
+            raise ValueError(f"{path} must hold a list of genome objects")
+        return rows
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f, delimiter='\t'))
+
+def check_manifest_row(row, base_dir, defaults=None):
+    """Applies the wizard's defaults and checks to one manifest row; returns (metadata, errors).
+
+    `defaults` fills the build-mode columns a row leaves empty.
+    """
+    import select_sequences
+
+    metadata = {}
+    errors = []
+    for step in metadata_steps():
+        key = step['key']
+        value = str(row.get(key) or '').strip()
+        if key == 'seqs_srcdir':
+            # Relative to the manifest, not to wherever the batch is started.
+            value = os.path.abspath(os.path.join(base_dir, value))
+        elif not value and 'get_default' in step:
+            value = step['get_default'](metadata)
+        if 'validate' in step and not step['validate'](value, metadata):
+            errors.append(f"invalid {key} {value!r}")
+        metadata[key] = value
+    errors += [f"missing {key}" for key in MANIFEST_REQUIRED if not metadata[key]]
+    for key in BUILD_MODE_KEYS:
+        value = str(row.get(key) or '').strip()
+        if value and key == 'assembly_report':
+            value = os.path.abspath(os.path.join(base_dir, value))
+        value = value or (defaults or {}).get(key) or ''
+        if value:
+            metadata[key] = value
+    mode, param, report = build_mode_inputs(metadata)
+    try:
+        select_sequences.parse_param(mode, param)
+    except ValueError as e:
+        errors.append(str(e))
+    if report and not os.path.isfile(report):
+        errors.append(f"{report} does not exist")
+    if errors:
+        return metadata, errors
+
+    resolve_seqfiles(metadata)
+    metadata['sources'] = metadata.get('seqfiles') or [os.path.join(metadata['seqs_srcdir'], metadata['seqfile_name'])]
+    errors += [f"{source} does not exist" for source in metadata['sources'] if not os.path.isfile(source)]
+    return metadata, errors
+
+def estimate_needs(metadata, faToTwoBit_path, threads):
+    """Rough peak (memory, disk) bytes of one build; disk is what scripts/staging.py predicts on top of the inputs."""
+    import staging
+
+    inputs = staging.measure([Path(source) for source in metadata['sources']])
+    twobit_size = int(inputs.fasta_bytes * staging.TWOBIT_RATIO)
+    memory = BUILD_MEMORY + (twobit_size if faToTwoBit_path else 0)
+    # Manifest inputs are kept; the 2bit is moved into the package (no copy).
+    disk = staging.peak_disk(inputs, 'stream', 1 if faToTwoBit_path else threads, False, 'rename') - inputs.on_disk
+    return memory, disk
+
+def build_manifest_genome(metadata, outdir, threads, faToTwoBit_path):
+    """Seed, 2bit, package tree and source tarball for one genome; runs in a worker process."""
+    import artifact_cache
+    import build_tarball
+    import forge_bsgenome
+    import select_sequences
+    import twobit
+
+    start = time.monotonic()
+    package = metadata['package_name']
+    result = {'package': package, 'status': 'failed', 'sequences': None, 'tarball': None, 'tarball_bytes': None}
+    workdir = Path(outdir) / 'build' / package
+    cache = artifact_cache.default_cache()
+    sources = [Path(source) for source in metadata['sources']]
+    try:
+        selection = scans = None
+        mode, param, report = build_mode_inputs(metadata)
+        if mode != 'full':
+            assembled = select_sequences.read_assembly_report(Path(report)) if report and mode == 'chromosomes' else None
+            scans = [twobit.prescan(source) for source in sources]
+            selection = select_sequences.select(select_sequences.records_from_scans(scans), mode, param, assembled)
+            result['sequences_excluded'] = len(selection['excluded'])
+        shutil.rmtree(workdir, ignore_errors=True)
+        workdir.mkdir(parents=True)
+        twobit_path = workdir / f"{package}.2bit"
+        seed_path = workdir / f"{package}.seed"
+        seed_path.write_text(seed_content({**metadata, 'twobit_dir': str(workdir), 'twobit_name': twobit_path.name}, selection) + '\n')
+        tarball = Path(outdir) / f"{package}_{metadata['version']}.tar.gz"
+        if cache.enabled:
+            twobit_key = cache.twobit_key(sources, selection['kept_digest'] if selection else None)
+            tarball_key = artifact_cache.tarball_key(forge_bsgenome.read_seed(seed_path), twobit_key)
+            if cache.fetch('tarball', tarball_key, tarball):
+                shutil.rmtree(workdir)
+                result.update(status='cached', tarball=str(tarball), tarball_bytes=tarball.stat().st_size)
+                result['seconds'] = round(time.monotonic() - start, 1)
+                return result
+
+        if not (cache.enabled and cache.fetch('2bit', twobit_key, twobit_path)):
+            if faToTwoBit_path and not selection:
+                completed = subprocess.run([faToTwoBit_path, *metadata['sources'], str(twobit_path)], capture_output=True, text=True)
+                if completed.returncode != 0:
+                    raise RuntimeError(f"faToTwoBit failed: {completed.stderr.strip()}")
+            elif selection:
+                twobit.encode_files(sources, twobit_path, jobs=threads, headers={source: scan['headers'] for source, scan in zip(sources, scans)},
+                                    only=set(selection['kept']))
+            else:
+                twobit.encode_files(sources, twobit_path, jobs=threads)
+            if cache.enabled:
+                cache.store('2bit', twobit_key, twobit_path)
+
+        assembled = forge_bsgenome.assemble(seed_path, workdir, move=True)
+        built = build_tarball.build_tarball(workdir / package, Path(outdir), jobs=threads)
+        if cache.enabled:
+            cache.store('tarball', tarball_key, tarball)
+        shutil.rmtree(workdir)
+    except Exception as e:
+        result['error'] = str(e)
+    else:
+        result.update(status='ok', sequences=assembled['seq_count'], tarball=built['tarball'], tarball_bytes=built['bytes'])
+    result['seconds'] = round(time.monotonic() - start, 1)
+    return result
+
+def run_manifest(manifest, outdir, jobs, memory_budget, disk_budget, install=False, defaults=None):
+    """Builds every genome in the manifest in a process pool kept within the memory and disk budgets.
+
+    With install, finished tarballs are installed one after another by the R worker while
+    the other builds go on. `defaults` are the build-mode settings for rows without their own.
+    """
+    try:
+        rows = read_manifest(manifest)
+    except (OSError, ValueError, csv.Error) as e:
+        print(f"[bold red]Cannot read manifest {manifest}:[/bold red] {e}")
+        return 1
+
+    base_dir = os.path.dirname(os.path.abspath(manifest))
+    results = {}
+    pending = []
+    seen = set()
+    faToTwoBit_path = shutil.which('faToTwoBit')
+    os.makedirs(outdir, exist_ok=True)
+    threads = max(1, (os.cpu_count() or 1) // jobs)
+    free = shutil.disk_usage(outdir).free
+    for number, row in enumerate(rows, 1):
+        metadata, errors = check_manifest_row(row, base_dir, defaults)
+        package = metadata['package_name'] or f"row {number}"
+        if package in seen:
+            errors.append("duplicate package_name")
+        seen.add(package)
+        if not errors:
+            memory, disk = estimate_needs(metadata, faToTwoBit_path, threads)
+            if disk > free:
+                errors.append(f"needs about {disk / 1024 ** 3:.1f} GB of disk at its peak, only {free / 1024 ** 3:.1f} GB is free")
+        if errors:
+            results[number] = {'package': package, 'status': 'invalid', 'error': '; '.join(errors)}
+        else:
+            pending.append((number, metadata, memory, disk))
+
+    print(f"[bold green]Building {len(pending)} of {len(rows)} genomes with up to {jobs} at a time.[/bold green]")
+    running = {}
+    installs = {}
+    used_memory = used_disk = 0
+    if install:
+        start_r_worker()
+    with ProcessPoolExecutor(max_workers=jobs, initializer=set_headless, initargs=(HEADLESS,)) as pool, ThreadPoolExecutor(max_workers=1) as installer:
+        while pending or running:
+            for item in list(pending):
+                number, metadata, memory, disk = item
+                fits = used_memory + memory <= memory_budget and used_disk + disk <= disk_budget
+                # A genome over budget on its own still runs, just not next to others.
+                if len(running) < jobs and (fits or not running):
+                    pending.remove(item)
+                    running[pool.submit(build_manifest_genome, metadata, outdir, threads, faToTwoBit_path)] = item
+                    used_memory += memory
+                    used_disk += disk
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                number, metadata, memory, disk = running.pop(future)
+                used_memory -= memory
+                used_disk -= disk
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'package': metadata['package_name'], 'status': 'failed', 'error': str(e)}
+                results[number] = result
+                color = 'green' if result['status'] in ('ok', 'cached', 'installed') else 'red'
+                print(f"[{color}]{result['status']:>6}[/{color}] {result['package']}")
+                if install and result['status'] in ('ok', 'cached'):
+                    installs[number] = installer.submit(install_package, result['tarball'])
+
+    for number, future in installs.items():
+        if future.result():
+            results[number]['status'] = 'installed'
+        else:
+            results[number].update(status='failed', error='R CMD INSTALL failed')
+    if rworker is not None:
+        rworker.close()
+
+    print_manifest_summary([results[number] for number in sorted(results)])
+    return 0 if all(result['status'] in ('ok', 'cached', 'installed') for result in results.values()) else 1
+
+def print_manifest_summary(results):
+    """Prints one row per genome: status, sequence count, tarball and build time or the error."""
+    columns = ('Package', 'Status', 'Sequences', 'Tarball', 'Size (MB)', 'Time (s)', 'Error')
+    rows = []
+    for result in results:
+        size = result.get('tarball_bytes')
+        rows.append((
+            result['package'],
+            result['status'],
+            str(result.get('sequences') or ''),
+            os.path.basename(result.get('tarball') or ''),
+            f"{size / 1024 ** 2:.1f}" if size else '',
+            str(result.get('seconds', '')),
+            result.get('error', ''),
+        ))
+    if HEADLESS:
+        for row in [columns] + rows:
+            print('\t'.join(row))
+        return
+
+    from rich.table import Table
+    table = Table(title="autoBSgenome manifest build")
+    for column in columns:
+        table.add_column(column)
+    for package, status, *rest in rows:
+        color = 'green' if status in ('ok', 'cached', 'installed') else 'red'
+        table.add_row(package, f"[{color}]{status}[/{color}]", *rest)
+    print(table)
+
+def parse_args():
+    """Command-line options; without --manifest the interactive wizard runs."""
+    parser = argparse.ArgumentParser(description="Build BSgenome data packages from FASTA files.")
+    parser.add_argument('--manifest', help="TSV or JSON file with one genome per row, keyed like the wizard's metadata; builds all of them without prompting.")
+    parser.add_argument('--outdir', default='.', help="Where manifest builds write their tarballs (default: current directory).")
+    parser.add_argument('--jobs', type=int, default=max(1, (os.cpu_count() or 1) // 2), help="Genomes built at the same time.")
+    parser.add_argument('--memory-budget', type=float, default=None, help="GB of memory the concurrent builds may use (default: 80%% of RAM).")
+    parser.add_argument('--disk-budget', type=float, default=None, help="GB of disk the concurrent builds may use (default: free space in --outdir).")
+    parser.add_argument('--install', action='store_true', help="Install each tarball a manifest build produces, through the R worker; with --resume, install without asking.")
+    parser.add_argument('--r-worker', action='store_true', help="Run the R dependency check, forge fallback and install in one long-lived R process instead of a new Rscript each.")
+    parser.add_argument('--resume', nargs='?', const='', default=None, metavar='JOURNAL', help="Continue an interrupted build from its <package>.journal.json (default: the only one here), skipping the wizard and finished steps.")
+    parser.add_argument('--headless', action='store_true', help="Never prompt and print plain text, without loading the terminal UI; needs --manifest or --resume.")
+    parser.add_argument('--build-mode', choices=('full', 'chromosomes', 'top_n', 'min_length', 'coverage_pct'), default='full',
+                        help="Which sequences go into the package (see scripts/select_sequences.py); manifest rows can set their own build_mode.")
+    parser.add_argument('--build-mode-param', default='', help="N for top_n, bp for min_length (e.g. 10kb), percent for coverage_pct.")
+    parser.add_argument('--assembly-report', default='', help="NCBI assembly report (assembly_report.txt or sequence_report.jsonl) naming the chromosomes for --build-mode chromosomes.")
+    args = parser.parse_args()
+    if args.build_mode != 'full':
+        import select_sequences
+
+        try:
+            select_sequences.parse_param(args.build_mode, args.build_mode_param)
+        except ValueError as e:
+            parser.error(str(e))
+    return args
+
+def build_mode_defaults(args):
+    """The build-mode metadata keys given on the command line; none for a full build."""
+    if args.build_mode == 'full':
+        return {}
+    defaults = {'build_mode': args.build_mode, 'build_mode_param': args.build_mode_param}
+    if args.assembly_report:
+        defaults['assembly_report'] = os.path.abspath(args.assembly_report)
+    return defaults
 
 def main():
     """Main function to orchestrate the BSgenome package creation."""
+    args = parse_args()
+    set_headless(args.headless)
+    if HEADLESS and not (args.manifest or args.resume is not None):
+        print("--headless needs --manifest or --resume; the metadata wizard is interactive.")
+        sys.exit(2)
+    if args.manifest:
+        os.makedirs(args.outdir, exist_ok=True)
+        memory_budget = args.memory_budget * 1024 ** 3 if args.memory_budget else os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') * 0.8
+        disk_budget = args.disk_budget * 1024 ** 3 if args.disk_budget else shutil.disk_usage(args.outdir).free
+        sys.exit(run_manifest(args.manifest, args.outdir, max(1, args.jobs), memory_budget, disk_budget, args.install, build_mode_defaults(args)))
+
+    journal = None
+    if args.resume is not None:
+        try:
+            journal = Journal.find(args.resume)
+        except (OSError, ValueError) as e:
+            print(f"[bold red]Cannot resume:[/bold red] {e}")
+            sys.exit(1)
+        if not journal.metadata:
+            print(f"[bold red]Cannot resume: {journal.path} has no metadata.[/bold red]")
+            sys.exit(1)
+        print(f"[bold green]Resuming {journal.metadata['package_name']} from {journal.path}.[/bold green]")
+
     faToTwoBit_path = check_and_install_dependencies()
+    if args.r_worker:
+        start_r_worker()
     check_r_dependencies()
-    metadata = get_user_input()
-    seed_filename = create_seed_file(metadata)
-    run_faToTwoBit(faToTwoBit_path, metadata)
-    create_and_run_build_script(metadata, seed_filename)
+    if journal is None:
+        metadata = get_user_input()
+        metadata.update(build_mode_defaults(args))
+        journal = Journal.for_package(metadata['package_name'])
+        journal.metadata = metadata
+    run_pipeline(faToTwoBit_path, journal.metadata, journal, resuming=args.resume is not None, install=args.install)
+    if rworker is not None:
+        rworker.close()
     print("\n[bold green]Process completed.[/bold green]")
 
 if __name__ == "__main__":
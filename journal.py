@@ -0,0 +1,106 @@
+"""Step journal for autoBSgenome.py: which pipeline steps finished, from which inputs.
+
+The journal is a JSON file next to the seed (<package>.journal.json). Each
+finished step records a fingerprint of its inputs and of the files it wrote;
+`--resume` skips a step only while both still match, and reruns everything
+from the first step that does not.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import time
+
+STEPS = ('seed', '2bit', 'forge', 'build', 'install')
+
+
+def path_fingerprint(path):
+    """Size and mtime of a file, of every file under a directory, or None if the path is missing."""
+    if os.path.isfile(path):
+        info = os.stat(path)
+        return [info.st_size, info.st_mtime_ns]
+    if os.path.isdir(path):
+        entries = []
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                full = os.path.join(root, name)
+                info = os.stat(full)
+                entries.append([os.path.relpath(full, path), info.st_size, info.st_mtime_ns])
+        return entries
+    return None
+
+
+def inputs_fingerprint(values=(), paths=()):
+    """Digest of plain values plus the current state of the input paths."""
+    state = {'values': list(values), 'paths': {path: path_fingerprint(path) for path in paths}}
+    return hashlib.sha256(json.dumps(state, sort_keys=True).encode()).hexdigest()
+
+
+class Journal:
+    """Finished steps of one package build, saved after every change."""
+
+    def __init__(self, path, data=None):
+        self.path = path
+        self.data = data or {'metadata': None, 'options': {}, 'steps': {}}
+
+    @classmethod
+    def for_package(cls, package_name):
+        """A new, empty journal for the package (any previous one is replaced)."""
+        return cls(f"{package_name}.journal.json")
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(path, json.load(f))
+
+    @classmethod
+    def find(cls, path=''):
+        """The journal at `path`, or the only *.journal.json in the current directory."""
+        if path:
+            return cls.load(path)
+        found = glob.glob('*.journal.json')
+        if len(found) != 1:
+            raise ValueError(f"found {len(found)} *.journal.json files here; pass the one to resume")
+        return cls.load(found[0])
+
+    @property
+    def metadata(self):
+        return self.data['metadata']
+
+    @metadata.setter
+    def metadata(self, value):
+        self.data['metadata'] = value
+        self.save()
+
+    @property
+    def options(self):
+        return self.data['options']
+
+    def is_done(self, step, inputs):
+        """True if `step` finished from the same inputs and its outputs are untouched."""
+        record = self.data['steps'].get(step)
+        if not record or record['inputs'] != inputs:
+            return False
+        return all(path_fingerprint(path) == state for path, state in record['outputs'].items())
+
+    def complete(self, step, inputs, outputs):
+        self.data['steps'][step] = {
+            'inputs': inputs,
+            'outputs': {path: path_fingerprint(path) for path in outputs},
+            'finished': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        self.save()
+
+    def invalidate(self, step):
+        """Forget `step` and every step after it."""
+        for name in STEPS[STEPS.index(step):]:
+            self.data['steps'].pop(name, None)
+        self.save()
+
+    def save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.data, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
@@ -104,5 +104,6 @@ The absolute path to the folder containing the sequence data files.
 # (15/15) seqfile_name information
 Required if the sequence data files is a single twoBit file. 
 `If you dot have a twoBit file, just input a fasta file name, I will automatic cover it to .2bit format for you!`
+`If the sequences are split over several FASTA files (e.g. one per chromosome) in seqs_srcdir, leave it empty and they will be combined into one .2bit file.`
 """
 }
\ No newline at end of file
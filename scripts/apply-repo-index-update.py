@@ -20,6 +20,35 @@ def load_json_arg(value: object, default: object) -> object:
     return value
 
 
+def index_provenance(provenance: dict) -> dict:
+    """The packages.json form of a build's provenance, without per-sequence lists.
+
+    packages.json is downloaded whole by the package browser, so the
+    sequence names, lengths and digests and the excluded names stay in the
+    provenance ledger; the index keeps their counts and digests.
+    """
+    result = dict(provenance)
+    digests = result.get("sequence_digests")
+    if isinstance(digests, dict):
+        result["sequence_digests"] = {
+            key: digests[key] for key in ("algorithm", "seqcol", "count", "level1") if key in digests
+        }
+    selection = result.get("selection")
+    if isinstance(selection, dict):
+        result["selection"] = {key: value for key, value in selection.items() if key != "excluded"}
+    return result
+
+
+def load_payload(payload_json: str, event_path: str) -> dict:
+    """The dispatch payload: --payload-json if given, else client_payload of the event file."""
+    if payload_json:
+        return json.loads(payload_json)
+    if event_path:
+        with open(event_path, encoding="utf-8") as handle:
+            return json.load(handle).get("client_payload", {})
+    return {}
+
+
 def int_or_zero(value: object) -> int:
     try:
         return int(str(value))
@@ -142,6 +171,9 @@ def regenerate_packages_index(packages_path: Path, output_path: Path) -> None:
 def main() -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument("--payload-json", default=os.environ.get("PAYLOAD", ""))
+    # Read from the event file by default: a large payload does not fit in an
+    # environment variable or argument (128 KiB each on Linux).
+    parser.add_argument("--event-path", default=os.environ.get("GITHUB_EVENT_PATH", ""))
     parser.add_argument("--repo", default=os.environ.get("REPO", ""))
     parser.add_argument("--packages", type=Path, default=Path("packages.json"))
     parser.add_argument("--queue", type=Path, default=Path("build-queue.json"))
@@ -149,10 +181,11 @@ def main() -> None:
     parser.add_argument("--provenance", type=Path, default=Path("provenance/builds.jsonl"))
     args = parser.parse_args()
 
-    payload = json.loads(args.payload_json)
+    payload = load_payload(args.payload_json, args.event_path)
     storage_info = load_json_arg(payload.get("storage_info"), {})
     metrics = storage_info.get("metrics", {}) if isinstance(storage_info, dict) else {}
     provenance = storage_info.get("provenance", {}) if isinstance(storage_info, dict) else {}
+    composition = storage_info.get("composition", {}) if isinstance(storage_info, dict) else {}
 
     package = payload.get("package_name", "")
     version = payload.get("version", "")
@@ -209,11 +242,13 @@ def main() -> None:
         new_entry["doi"] = doi
     if metrics:
         new_entry["metrics"] = metrics
+    if composition:
+        new_entry["composition"] = composition
     if provenance:
         provenance.setdefault("provider", provider)
         provenance.setdefault("source_url", source_url)
         provenance.setdefault("source_accession", accession)
-        new_entry["provenance"] = provenance
+        new_entry["provenance"] = index_provenance(provenance)
 
     flat = [pkg for pkg in load_flat_packages(args.packages) if pkg.get("package") != package]
     flat.append(new_entry)
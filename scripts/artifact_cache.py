@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""Content-addressed cache of 2bit files and package tarballs.
+
+A 2bit is keyed by the SHA-256 of its FASTA file(s) and the encoder version
+(plus the kept-names digest of select_sequences.py for a build mode), a tarball by the seed fields, the 2bit key and the packaging format, so a
+metadata-only rebuild of a genome converted before skips FASTA -> 2bit and a
+rebuild with nothing changed skips packaging too.
+
+Objects live in a local directory (AUTOBSGENOME_CACHE, default
+~/.cache/autoBSgenome) that is trimmed least-recently-used first to
+AUTOBSGENOME_CACHE_SIZE GB; 0 disables it. AUTOBSGENOME_CACHE_REMOTE adds a
+shared backend behind it: an http(s):// URL served with GET/PUT (bearer
+token from AUTOBSGENOME_CACHE_TOKEN) or a directory / file:// URL, e.g. a
+network mount or a local stand-in for the server. Cache failures are
+reported and otherwise ignored; a build never fails because of the cache.
+
+Usage:
+    KEY=$(python3 scripts/artifact_cache.py key 2bit genome.fa.gz)
+    KEY=$(python3 scripts/artifact_cache.py key 2bit genome.fa.gz --selection "$KEPT_DIGEST")
+    KEY=$(python3 scripts/artifact_cache.py key 2bit genome.fa.gz --sha256 "$SHA256")  # from profile_fasta.py
+    python3 scripts/artifact_cache.py get 2bit "$KEY" genome.2bit || encode ...
+    python3 scripts/artifact_cache.py put 2bit "$KEY" genome.2bit
+    python3 scripts/artifact_cache.py key tarball BSgenome.X.seed --twobit-key "$KEY"
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from build_tarball import PACKAGE_FORMAT
+from forge_bsgenome import read_seed
+from twobit import ENCODER_VERSION
+
+
+KINDS = ("2bit", "tarball")
+DEFAULT_SIZE_GB = 20
+HASH_BLOCK = 8 * 1024 * 1024
+TIMEOUT = 60
+# Seed fields that only say where the 2bit was staged.
+LOCATION_FIELDS = ("seqs_srcdir", "seqfile_name")
+
+
+def file_digest(path: Path, memo: dict | None = None) -> str:
+    """SHA-256 of a file; `memo` skips re-reading files whose size and mtime are unchanged."""
+    info = path.stat()
+    stamp = [info.st_size, info.st_mtime_ns]
+    name = str(path.resolve())
+    if memo is not None and memo.get(name, [None])[:2] == stamp:
+        return memo[name][2]
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        while block := handle.read(HASH_BLOCK):
+            digest.update(block)
+    if memo is not None:
+        memo[name] = stamp + [digest.hexdigest()]
+    return digest.hexdigest()
+
+
+def twobit_key(
+    fastas: list[Path], memo: dict | None = None, selection: str | None = None, sha256: list[str] | None = None
+) -> str:
+    """`sha256` are the files' digests when already known, e.g. from profile_fasta.py's pass."""
+    parts = [f"twobit-encoder:{ENCODER_VERSION}"] + (sha256 or [file_digest(fasta, memo) for fasta in fastas])
+    if selection:
+        parts.append(f"selection:{selection}")
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+def tarball_key(seed: dict[str, str], twobit: str) -> str:
+    fields = sorted((key, value) for key, value in seed.items() if key not in LOCATION_FIELDS)
+    parts = [f"package-format:{PACKAGE_FORMAT}", f"2bit:{twobit}"] + [f"{key}: {value}" for key, value in fields]
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+def _place(src: Path, dest: Path) -> None:
+    """Hardlink `src` to `dest` (a copy across filesystems), replacing `dest` atomically."""
+    tmp = dest.with_name(f".{dest.name}.cache-tmp")
+    tmp.unlink(missing_ok=True)
+    try:
+        try:
+            os.link(src, tmp)
+        except OSError:
+            shutil.copyfile(src, tmp)
+        os.replace(tmp, dest)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+class LocalStore:
+    """Objects under root/objects/<kind>/<key>, evicted least recently used first."""
+
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def path(self, kind: str, key: str) -> Path:
+        return self.root / "objects" / kind / key
+
+    def get(self, kind: str, key: str, dest: Path) -> bool:
+        path = self.path(kind, key)
+        if not path.is_file():
+            return False
+        os.utime(path)
+        _place(path, dest)
+        return True
+
+    def put(self, kind: str, key: str, src: Path) -> None:
+        if src.stat().st_size > self.max_bytes:
+            return
+        path = self.path(kind, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _place(src, path)
+        self.evict(keep=path)
+
+    def evict(self, keep: Path | None = None) -> list[Path]:
+        """Delete the least recently used objects until the store fits in max_bytes."""
+        objects = []
+        for kind in KINDS:
+            folder = self.root / "objects" / kind
+            if folder.is_dir():
+                objects += [(entry.stat().st_mtime, entry.stat().st_size, entry) for entry in folder.iterdir()]
+        total = sum(size for _, size, _ in objects)
+        removed = []
+        for _, size, entry in sorted(objects):
+            if total <= self.max_bytes:
+                break
+            if entry == keep:
+                continue
+            entry.unlink(missing_ok=True)
+            total -= size
+            removed.append(entry)
+        return removed
+
+
+class DirectoryRemote:
+    """Remote backend on a shared directory; also the local stand-in for the HTTP one."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    def fetch(self, kind: str, key: str, dest: Path) -> bool:
+        path = self.root / kind / key
+        if not path.is_file():
+            return False
+        shutil.copyfile(path, dest)
+        return True
+
+    def store(self, kind: str, key: str, src: Path) -> None:
+        path = self.root / kind / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{key}.tmp")
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, path)
+
+
+class HttpRemote:
+    """Remote backend on an HTTP object store: GET/PUT <base>/<kind>/<key>."""
+
+    def __init__(self, base_url: str, token: str | None = None) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+
+    def _request(self, kind: str, key: str, method: str, body=None, length: int | None = None):
+        request = urllib.request.Request(f"{self.base_url}/{kind}/{key}", data=body, method=method)
+        if self.token:
+            request.add_header("Authorization", f"Bearer {self.token}")
+        if length is not None:
+            request.add_header("Content-Length", str(length))
+        return urllib.request.urlopen(request, timeout=TIMEOUT)
+
+    def fetch(self, kind: str, key: str, dest: Path) -> bool:
+        try:
+            response = self._request(kind, key, "GET")
+        except urllib.error.HTTPError as exc:
+            if exc.code == 404:
+                return False
+            raise
+        tmp = dest.with_name(f".{dest.name}.cache-tmp")
+        try:
+            with response, tmp.open("wb") as out:
+                shutil.copyfileobj(response, out, HASH_BLOCK)
+            os.replace(tmp, dest)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        return True
+
+    def store(self, kind: str, key: str, src: Path) -> None:
+        with src.open("rb") as body:
+            self._request(kind, key, "PUT", body, src.stat().st_size).close()
+
+
+REMOTE_BACKENDS = {"http": HttpRemote, "https": HttpRemote, "file": DirectoryRemote}
+
+
+def open_remote(url: str):
+    scheme = urllib.parse.urlparse(url).scheme
+    if scheme in ("http", "https"):
+        return REMOTE_BACKENDS[scheme](url, os.environ.get("AUTOBSGENOME_CACHE_TOKEN") or None)
+    if scheme == "file":
+        return REMOTE_BACKENDS["file"](Path(urllib.parse.unquote(urllib.parse.urlparse(url).path)))
+    if scheme:
+        raise ValueError(f"unsupported cache remote {url}")
+    return DirectoryRemote(Path(url))
+
+
+class ArtifactCache:
+    """Local store in front of an optional remote backend."""
+
+    def __init__(self, local: LocalStore | None, remote=None) -> None:
+        self.local = local
+        self.remote = remote
+        self._memo_path = local.root / "digests.json" if local else None
+        self._memo: dict | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.local is not None or self.remote is not None
+
+    @property
+    def digests(self) -> dict | None:
+        """Saved FASTA digests keyed by path, size and mtime (None without a local store)."""
+        if self._memo is None and self._memo_path is not None:
+            try:
+                self._memo = json.loads(self._memo_path.read_text())
+            except (OSError, ValueError):
+                self._memo = {}
+        return self._memo
+
+    def save_digests(self) -> None:
+        if self._memo is None:
+            return
+        try:
+            self._memo_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self._memo_path.with_name(f"digests.{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(self._memo, sort_keys=True))
+            os.replace(tmp, self._memo_path)
+        except OSError as exc:
+            _warn(f"cannot save FASTA digests: {exc}")
+
+    def twobit_key(self, fastas: list[Path], selection: str | None = None, sha256: list[str] | None = None) -> str:
+        key = twobit_key(fastas, self.digests, selection, sha256)
+        self.save_digests()
+        return key
+
+    def fetch(self, kind: str, key: str, dest: Path) -> bool:
+        """Put the cached object at `dest`; False on a miss."""
+        try:
+            if self.local and self.local.get(kind, key, dest):
+                return True
+            if self.remote and self.remote.fetch(kind, key, dest):
+                if self.local:
+                    self.local.put(kind, key, dest)
+                return True
+        except (OSError, urllib.error.URLError) as exc:
+            _warn(f"cache lookup of {kind} {key[:12]} failed: {exc}")
+        return False
+
+    def store(self, kind: str, key: str, src: Path) -> None:
+        for backend, method in ((self.local, "put"), (self.remote, "store")):
+            if backend is None:
+                continue
+            try:
+                getattr(backend, method)(kind, key, src)
+            except (OSError, urllib.error.URLError) as exc:
+                _warn(f"cannot cache {kind} {key[:12]}: {exc}")
+
+
+def _warn(message: str) -> None:
+    print(f"WARNING: {message}", file=sys.stderr)
+
+
+def default_cache() -> ArtifactCache:
+    """The cache configured by the AUTOBSGENOME_CACHE* environment variables."""
+    root = Path(os.environ.get("AUTOBSGENOME_CACHE") or Path.home() / ".cache" / "autoBSgenome")
+    size_gb = float(os.environ.get("AUTOBSGENOME_CACHE_SIZE") or DEFAULT_SIZE_GB)
+    local = LocalStore(root, int(size_gb * 1024 ** 3)) if size_gb > 0 else None
+    remote_url = os.environ.get("AUTOBSGENOME_CACHE_REMOTE")
+    return ArtifactCache(local, open_remote(remote_url) if remote_url else None)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", 1)[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    key = sub.add_parser("key", help="Print the cache key of a 2bit (from FASTA files) or a tarball (from a seed).")
+    key.add_argument("kind", choices=KINDS)
+    key.add_argument("inputs", type=Path, nargs="+", help="FASTA file(s) for 2bit, the .seed file for tarball.")
+    key.add_argument("--twobit-key", default=None, help="Key of the 2bit the tarball is built from.")
+    key.add_argument("--selection", default=None, help="kept_digest of the build mode's selection, for a 2bit of a subset.")
+    key.add_argument("--sha256", action="append", default=None,
+                     help="SHA-256 of each FASTA file, in order, instead of reading them again.")
+    get = sub.add_parser("get", help="Copy a cached object to DEST; exit status 1 on a miss.")
+    get.add_argument("kind", choices=KINDS)
+    get.add_argument("key")
+    get.add_argument("dest", type=Path)
+    put = sub.add_parser("put", help="Add SRC to the cache.")
+    put.add_argument("kind", choices=KINDS)
+    put.add_argument("key")
+    put.add_argument("src", type=Path)
+    sub.add_parser("evict", help="Trim the local store to AUTOBSGENOME_CACHE_SIZE.")
+    args = parser.parse_args()
+
+    try:
+        cache = default_cache()
+        if args.command == "key":
+            if args.kind == "2bit":
+                if args.sha256 and len(args.sha256) != len(args.inputs):
+                    parser.error("key 2bit takes one --sha256 per FASTA file")
+                print(cache.twobit_key(args.inputs, args.selection, args.sha256))
+            elif not args.twobit_key or len(args.inputs) != 1:
+                parser.error("key tarball takes one seed file and --twobit-key")
+            else:
+                print(tarball_key(read_seed(args.inputs[0]), args.twobit_key))
+        elif args.command == "get":
+            if not cache.fetch(args.kind, args.key, args.dest):
+                return 1
+        elif args.command == "put":
+            cache.store(args.kind, args.key, args.src)
+        elif cache.local:
+            for path in cache.local.evict():
+                print(f"evicted {path.name}")
+    except (OSError, ValueError) as exc:
+        print(f"ERROR: {exc}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""Typed, indexed SQLite copies of NCBI assembly_summary files.
+
+The RefSeq and GenBank assembly_summary TSVs are hundreds of MB; tokenizing
+them row by row into dicts takes most of the run time of every script that
+reads them. SummaryStore converts a summary once into an SQLite file next to
+it (<summary>.sqlite): numeric columns become INTEGER/REAL ("na" becomes
+NULL), the rest stay TEXT verbatim, and the columns scripts filter on are
+indexed. The copy is rebuilt whenever the summary's size or mtime changes, so
+later runs open it in milliseconds and read only the columns and rows they
+ask for. assembly_accession is indexed too: find() looks rows up by
+accession, with or without its version, without reading the rest.
+
+    with SummaryStore(Path("assembly_summary_refseq.txt")) as store:
+        for row in store.rows(["assembly_accession", "genome_size"],
+                              version_status="latest", group=["plant", "fungi"]):
+            ...
+
+Usage:
+    python3 scripts/assembly_summary.py assembly_summary_refseq.txt --count --group plant
+    python3 scripts/assembly_summary.py assembly_summary_refseq.txt --column assembly_accession \\
+        --column organism_name --refseq-category "reference genome" --version-status latest
+    python3 scripts/assembly_summary.py assembly_summary_genbank.txt --accession GCA_000001405 --column seq_rel_date
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+from typing import Iterable, Iterator
+
+
+SCHEMA_VERSION = 2
+HEADER_PREFIX = "#assembly_accession"
+INTEGER_COLUMNS = {
+    "taxid",
+    "species_taxid",
+    "genome_size",
+    "genome_size_ungapped",
+    "replicon_count",
+    "scaffold_count",
+    "contig_count",
+    "total_gene_count",
+    "protein_coding_gene_count",
+    "non_coding_gene_count",
+}
+REAL_COLUMNS = {"gc_percent"}
+# Indexed columns; any column can be filtered on, these quickly.
+FILTER_COLUMNS = ("version_status", "refseq_category", "group", "assembly_level")
+ACCESSION_COLUMN = "assembly_accession"
+MISSING = {"", "na"}
+BATCH_ROWS = 50_000
+
+
+def read_header(handle) -> list[str]:
+    """Column names from the #assembly_accession line; the handle is left at the first row."""
+    for line in handle:
+        if line.startswith(HEADER_PREFIX):
+            return line.lstrip("#").rstrip("\r\n").split("\t")
+    raise ValueError(f"no assembly_summary header found in {getattr(handle, 'name', 'input')}")
+
+
+def store_path(summary: Path) -> Path:
+    return summary.with_name(summary.name + ".sqlite")
+
+
+def quote(column: str) -> str:
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _typed(column: str):
+    if column in INTEGER_COLUMNS:
+        return lambda value: int(value) if value not in MISSING else None
+    if column in REAL_COLUMNS:
+        return lambda value: float(value) if value not in MISSING else None
+    return None
+
+
+def row_parser(columns: list[str]):
+    """A function turning one data line into its typed field list, as the store keeps it."""
+    width = len(columns)
+    converters = [(i, _typed(column)) for i, column in enumerate(columns)]
+    converters = [(i, convert) for i, convert in converters if convert]
+
+    def parse(line: str) -> list:
+        fields = line.rstrip("\r\n").split("\t")
+        # Short rows are padded, like csv.DictReader's missing fields.
+        fields = (fields + [""] * width)[:width]
+        for i, convert in converters:
+            try:
+                fields[i] = convert(fields[i])
+            except ValueError:
+                fields[i] = None
+        return fields
+
+    return parse
+
+
+def build_store(summary: Path, store: Path) -> int:
+    """Convert `summary` into the SQLite file `store` (replaced atomically); returns the row count."""
+    info = summary.stat()
+    store.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=store.parent, prefix=f".{store.name}.", suffix=".tmp")
+    os.close(fd)
+    tmp = Path(tmp_name)
+    try:
+        connection = sqlite3.connect(tmp)
+        with summary.open(encoding="utf-8", errors="replace") as handle:
+            columns = read_header(handle)
+            parse = row_parser(columns)
+            types = ["INTEGER" if c in INTEGER_COLUMNS else "REAL" if c in REAL_COLUMNS else "TEXT" for c in columns]
+            connection.executescript("PRAGMA journal_mode=OFF; PRAGMA synchronous=OFF;")
+            connection.execute(
+                "CREATE TABLE summary (" + ", ".join(f"{quote(c)} {t}" for c, t in zip(columns, types)) + ")"
+            )
+            insert = f"INSERT INTO summary VALUES ({', '.join('?' * len(columns))})"
+            count = 0
+            batch = []
+            for line in handle:
+                if line.startswith("#") or not line.strip():
+                    continue
+                batch.append(parse(line))
+                if len(batch) >= BATCH_ROWS:
+                    connection.executemany(insert, batch)
+                    count += len(batch)
+                    batch = []
+            connection.executemany(insert, batch)
+            count += len(batch)
+        for column in (ACCESSION_COLUMN, *FILTER_COLUMNS):
+            if column in columns:
+                connection.execute(f"CREATE INDEX {quote('by_' + column)} ON summary ({quote(column)})")
+        connection.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        connection.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("schema_version", str(SCHEMA_VERSION)),
+            ("source_size", str(info.st_size)),
+            ("source_mtime_ns", str(info.st_mtime_ns)),
+            ("columns", json.dumps(columns)),
+            ("rows", str(count)),
+        ])
+        connection.commit()
+        connection.close()
+        os.replace(tmp, store)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return count
+
+
+def _meta(store: Path) -> dict[str, str]:
+    try:
+        connection = sqlite3.connect(f"file:{store}?mode=ro", uri=True)
+        try:
+            return dict(connection.execute("SELECT key, value FROM meta"))
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        return {}
+
+
+def is_current(summary: Path, store: Path) -> bool:
+    """True if `store` was built by this schema from the summary as it is now."""
+    if not store.exists():
+        return False
+    info = summary.stat()
+    meta = _meta(store)
+    return meta.get("schema_version") == str(SCHEMA_VERSION) and (
+        meta.get("source_size"), meta.get("source_mtime_ns")
+    ) == (str(info.st_size), str(info.st_mtime_ns))
+
+
+class SummaryStore:
+    """Query an assembly_summary through its SQLite copy, building or refreshing it first."""
+
+    def __init__(self, summary: Path, store: Path | None = None) -> None:
+        self.summary = Path(summary)
+        self.store = store or store_path(self.summary)
+        if not is_current(self.summary, self.store):
+            build_store(self.summary, self.store)
+        self.connection = sqlite3.connect(f"file:{self.store}?mode=ro", uri=True)
+        meta = dict(self.connection.execute("SELECT key, value FROM meta"))
+        self.columns: list[str] = json.loads(meta["columns"])
+        self.row_count = int(meta["rows"])
+
+    def __enter__(self) -> SummaryStore:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def _where(self, filters: dict[str, str | Iterable[str] | None]) -> tuple[str, list]:
+        clauses, params = [], []
+        for column, wanted in filters.items():
+            if wanted is None:
+                continue
+            self._check(column)
+            values = [wanted] if isinstance(wanted, str) else list(wanted)
+            clauses.append(f"{quote(column)} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def _check(self, column: str) -> None:
+        if column not in self.columns:
+            raise ValueError(f"{self.summary} has no column {column!r}")
+
+    def rows(self, columns: list[str] | None = None, **filters) -> Iterator[dict]:
+        """Rows in file order as dicts of `columns` (default: all); each filter is a value or a collection of values.
+
+        Numeric columns come back as int/float and missing values as None.
+        """
+        columns = list(columns or self.columns)
+        for column in columns:
+            self._check(column)
+        where, params = self._where(filters)
+        cursor = self.connection.execute(
+            f"SELECT {', '.join(quote(c) for c in columns)} FROM summary{where} ORDER BY rowid", params
+        )
+        for values in cursor:
+            yield dict(zip(columns, values))
+
+    def find(self, accessions: Iterable[str], columns: list[str] | None = None) -> dict[str, dict]:
+        """Rows by assembly_accession, keyed by the accession as given; missing ones are left out.
+
+        An accession without a version (GCF_000001405) finds its highest
+        version. Each is one index lookup, so memory and time follow the
+        number of accessions, not the size of the summary.
+        """
+        columns = list(columns or self.columns)
+        for column in (ACCESSION_COLUMN, *columns):
+            self._check(column)
+        selected = ", ".join(quote(c) for c in (ACCESSION_COLUMN, *columns))
+        exact = f"SELECT {selected} FROM summary WHERE {quote(ACCESSION_COLUMN)} = ? ORDER BY rowid DESC LIMIT 1"
+        # "." < digits < "/", so every version of BASE sorts between BASE. and BASE/.
+        versions = f"SELECT {selected} FROM summary WHERE {quote(ACCESSION_COLUMN)} > ? AND {quote(ACCESSION_COLUMN)} < ?"
+        found = {}
+        for accession in accessions:
+            key = accession.strip()
+            if not key or accession in found:
+                continue
+            if "." in key:
+                matches = self.connection.execute(exact, (key,)).fetchall()
+            else:
+                matches = self.connection.execute(versions, (key + ".", key + "/")).fetchall()
+            if matches:
+                best = max(matches, key=lambda values: _version(values[0]))
+                found[accession] = dict(zip(columns, best[1:]))
+        return found
+
+    def count(self, **filters) -> int:
+        where, params = self._where(filters)
+        return self.connection.execute(f"SELECT COUNT(*) FROM summary{where}", params).fetchone()[0]
+
+
+def _version(accession: str) -> int:
+    try:
+        return int(accession.rpartition(".")[2])
+    except ValueError:
+        return -1
+
+
+def iter_summary(path: Path, columns: list[str] | None = None, **filters) -> Iterator[dict]:
+    """Rows of an assembly_summary file through its SummaryStore; see SummaryStore.rows()."""
+    with SummaryStore(path) as store:
+        yield from store.rows(columns, **filters)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", 1)[0])
+    parser.add_argument("summary", type=Path)
+    parser.add_argument("--store", type=Path, default=None, help="SQLite file (default: SUMMARY.sqlite).")
+    parser.add_argument("--column", action="append", default=None, help="Column to print; repeatable (default: all).")
+    for column in FILTER_COLUMNS:
+        parser.add_argument(f"--{column.replace('_', '-')}", dest=column, action="append", default=None,
+                            help=f"Keep rows with this {column}; repeatable.")
+    parser.add_argument("--accession", action="append", default=None,
+                        help="Print the row of this accession (any version if none is given); repeatable.")
+    parser.add_argument("--count", action="store_true", help="Print the number of matching rows only.")
+    args = parser.parse_args()
+
+    filters = {column: getattr(args, column) for column in FILTER_COLUMNS}
+    try:
+        with SummaryStore(args.summary, args.store) as store:
+            if args.accession:
+                found = store.find(args.accession, args.column)
+                for accession in args.accession:
+                    if accession in found:
+                        print(json.dumps(found[accession], sort_keys=True))
+                    else:
+                        print(f"WARNING: {accession} is not in {args.summary}", file=sys.stderr)
+                return 0 if len(found) == len(set(args.accession)) else 1
+            if args.count:
+                print(store.count(**filters))
+                return 0
+            for row in store.rows(args.column, **filters):
+                print(json.dumps(row, sort_keys=True))
+    except BrokenPipeError:
+        # Output cut short (e.g. by head); keep the interpreter's final flush quiet.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    except (OSError, ValueError, sqlite3.Error) as exc:
+        print(f"ERROR: {exc}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,23 +4,13 @@
 from __future__ import annotations
 
 import argparse
-import csv
 import json
 import time
 import urllib.request
 from collections import Counter
 from pathlib import Path
 
-
-def iter_summary(path: Path):
-    with path.open() as handle:
-        for line in handle:
-            if line.startswith("#assembly_accession"):
-                headers = line.lstrip("#").rstrip("\n").split("\t")
-                break
-        else:
-            raise ValueError(f"no assembly_summary header found in {path}")
-        yield from csv.DictReader(handle, fieldnames=headers, delimiter="\t")
+from assembly_summary import SummaryStore
 
 
 def normalize_release_date(value: str) -> str:
@@ -80,10 +70,10 @@ def main() -> None:
 
     release_by_accession: dict[str, str] = {}
     for path in (args.refseq_summary, args.genbank_summary):
-        for row in iter_summary(path):
-            accession = row.get("assembly_accession", "")
-            if accession in wanted and accession not in release_by_accession:
-                release_by_accession[accession] = normalize_release_date(row.get("seq_rel_date", ""))
+        with SummaryStore(path) as store:
+            found = store.find(wanted - release_by_accession.keys(), ["seq_rel_date"])
+        for accession, row in found.items():
+            release_by_accession[accession] = normalize_release_date(row["seq_rel_date"])
 
     if args.api_missing:
         missing = sorted(accession for accession in wanted if accession not in release_by_accession)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Fail if autoBSgenome.py takes longer than a fixed budget to start headless.
+
+Runs `autoBSgenome.py --headless --manifest EMPTY.tsv` (argument parsing,
+module imports and the manifest path, with no genome to build) in a fresh
+interpreter several times without bytecode caches, and compares the median
+wall time with the budget. It also fails if the headless run imports the
+terminal UI (rich, prompt_toolkit), which is what made start-up slow.
+
+Usage:
+    python3 scripts/bench_startup.py [--runs 5] [--budget 0.5] [--json startup.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+SCRIPT = Path(__file__).resolve().parent.parent / "autoBSgenome.py"
+BUDGET = 0.5
+UI_MODULES = ("rich", "prompt_toolkit")
+
+
+def headless_command(workdir: Path) -> list[str]:
+    manifest = workdir / "empty.tsv"
+    manifest.write_text("package_name\ttitle\tversion\torganism\n", encoding="utf-8")
+    return [sys.executable, str(SCRIPT), "--headless", "--manifest", str(manifest), "--outdir", str(workdir / "out")]
+
+
+def time_run(command: list[str], env: dict[str, str]) -> float:
+    start = time.perf_counter()
+    subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def imported_modules(command: list[str], env: dict[str, str]) -> set[str]:
+    """Top-level packages imported by the run, from python -X importtime."""
+    result = subprocess.run(command[:1] + ["-X", "importtime"] + command[1:], env=env, check=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    modules = set()
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and line.count("|") == 2:
+            modules.add(line.rsplit("|", 1)[1].strip().split(".")[0])
+    return modules
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", 1)[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=BUDGET, help=f"Seconds (default: {BUDGET}).")
+    parser.add_argument("--json", type=Path, default=None)
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    with tempfile.TemporaryDirectory() as tmp:
+        command = headless_command(Path(tmp))
+        try:
+            seconds = [time_run(command, env) for _ in range(max(1, args.runs))]
+            ui = sorted(set(UI_MODULES) & imported_modules(command, env))
+        except subprocess.CalledProcessError as exc:
+            print(f"ERROR: headless start failed with status {exc.returncode}", file=sys.stderr)
+            return 1
+
+    result = {
+        "budget_s": args.budget,
+        "first_s": round(seconds[0], 3),
+        "median_s": round(statistics.median(seconds), 3),
+        "runs": len(seconds),
+        "ui_imports": ui,
+    }
+    text = json.dumps(result, sort_keys=True)
+    print(text)
+    if args.json:
+        args.json.write_text(text + "\n", encoding="utf-8")
+    if ui:
+        print(f"ERROR: headless start imported {', '.join(ui)}", file=sys.stderr)
+        return 1
+    if result["median_s"] > args.budget:
+        print(f"ERROR: headless start took {result['median_s']:.3f} s, over the {args.budget:g} s budget",
+              file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
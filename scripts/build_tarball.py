@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""Build the source tarball of a BSgenome data package without R CMD build.
+
+Writes PACKAGE_VERSION.tar.gz straight from the package directory that
+forge_bsgenome.py (or forgeBSgenomeDataPkg) produced. R CMD build copies the
+whole tree, 2bit included, into a temporary directory and compresses it on
+one core; utils::tar() also refuses members over 8 GB. Here the tree is
+streamed into a POSIX pax archive (no member size limit) and compressed in
+independent chunks on all cores into a standard multi-member gzip file, so
+the 2bit is read once and never copied.
+
+The tarball has the layout R CMD build gives a data package: everything
+under PACKAGE/, .Rbuildignore and R's default exclusions applied, file
+permissions normalised, and NeedsCompilation/Packaged added to DESCRIPTION.
+
+Usage:
+    python3 scripts/build_tarball.py BSgenome.Hsapiens.UCSC.hg38 [--destdir .] [--jobs 4]
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import getpass
+import io
+import json
+import os
+import re
+import stat
+import sys
+import tarfile
+from pathlib import Path
+from typing import Iterator
+
+sys.path.insert(0, str(Path(__file__).parent))
+from gzip_stream import ParallelGzipWriter
+
+
+# Subset of the exclusions R CMD build applies before reading .Rbuildignore.
+DEFAULT_EXCLUDES = (
+    r"^\.Rbuildignore$",
+    r"(^|/)\.DS_Store$",
+    r"^\.(RData|Rhistory)$",
+    r"~$",
+    r"\.bak$",
+    r"\.swp$",
+    r"(^|/)\.#[^/]*$",
+    r"(^|/)#[^/]*#$",
+    r"(^|/)\.(git|svn|hg|bzr)(/|$)",
+    r"(^|/)CVS(/|$)",
+    r"^\.Rproj\.user(/|$)",
+)
+COMPRESS_LEVEL = 6
+# Part of the artifact cache key of every tarball; bump it whenever this
+# module or forge_bsgenome.py package the same seed and 2bit differently.
+PACKAGE_FORMAT = 1
+
+
+def read_description(path: Path) -> dict[str, str]:
+    fields: dict[str, str] = {}
+    key = None
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if line[:1] in (" ", "\t") and key is not None:
+            fields[key] += "\n" + line
+            continue
+        name, sep, value = line.partition(":")
+        if sep:
+            key = name.strip()
+            fields[key] = value.strip()
+    return fields
+
+
+def packaged_description(pkgdir: Path, fields: dict[str, str]) -> bytes:
+    """DESCRIPTION as R CMD build ships it: NeedsCompilation and a fresh Packaged line."""
+    fields = dict(fields)
+    fields.pop("Packaged", None)
+    fields.setdefault("NeedsCompilation", "yes" if (pkgdir / "src").is_dir() else "no")
+    try:
+        user = getpass.getuser()
+    except (KeyError, OSError):
+        user = "unknown"
+    now = datetime.datetime.now(datetime.timezone.utc)
+    fields["Packaged"] = f"{now:%Y-%m-%d %H:%M:%S} UTC; {user}"
+    return "".join(f"{key}: {value}\n" for key, value in fields.items()).encode("utf-8")
+
+
+def exclusion_patterns(pkgdir: Path) -> list[re.Pattern]:
+    patterns = list(DEFAULT_EXCLUDES)
+    ignore = pkgdir / ".Rbuildignore"
+    if ignore.is_file():
+        patterns += [line.strip() for line in ignore.read_text(encoding="utf-8").splitlines() if line.strip()]
+    return [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+
+
+def package_files(pkgdir: Path, excludes: list[re.Pattern]) -> Iterator[tuple[Path, str]]:
+    """(path, path relative to pkgdir) for every entry to archive, parents first."""
+    for root, dirs, files in os.walk(pkgdir):
+        base = Path(root)
+        dirs.sort()
+        for name in sorted(dirs) + sorted(files):
+            path = base / name
+            rel = path.relative_to(pkgdir).as_posix()
+            if any(pattern.search(rel) for pattern in excludes):
+                if name in dirs:
+                    dirs.remove(name)
+                continue
+            yield path, rel
+
+
+def _normalise(info: tarfile.TarInfo) -> tarfile.TarInfo:
+    if info.isdir() or info.mode & stat.S_IXUSR:
+        info.mode = 0o755
+    else:
+        info.mode = 0o644
+    return info
+
+
+def build_tarball(pkgdir: Path, destdir: Path = Path("."), jobs: int | None = None,
+                  level: int = COMPRESS_LEVEL) -> dict:
+    """Write PACKAGE_VERSION.tar.gz for the package in `pkgdir` into `destdir`."""
+    description = pkgdir / "DESCRIPTION"
+    if not description.is_file():
+        raise ValueError(f"{pkgdir} has no DESCRIPTION")
+    fields = read_description(description)
+    package, version = fields.get("Package"), fields.get("Version")
+    if not package or not version:
+        raise ValueError(f"{description} lacks Package or Version")
+
+    target = destdir / f"{package}_{version}.tar.gz"
+    tmp = target.with_name(target.name + ".tmp")
+    files = 0
+    try:
+        with tmp.open("wb") as out, ParallelGzipWriter(out, jobs, level) as gz:
+            with tarfile.open(fileobj=gz, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+                tar.addfile(_normalise(tar.gettarinfo(pkgdir, package)))
+                for path, rel in package_files(pkgdir, exclusion_patterns(pkgdir)):
+                    info = _normalise(tar.gettarinfo(path, f"{package}/{rel}"))
+                    if rel == "DESCRIPTION":
+                        data = packaged_description(pkgdir, fields)
+                        info.size = len(data)
+                        tar.addfile(info, io.BytesIO(data))
+                    elif info.isreg():
+                        with path.open("rb") as handle:
+                            tar.addfile(info, handle)
+                    else:
+                        tar.addfile(info)
+                    files += 1
+        os.replace(tmp, target)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return {
+        "package": package,
+        "version": version,
+        "tarball": str(target),
+        "files": files,
+        "uncompressed_bytes": gz.bytes_in,
+        "bytes": target.stat().st_size,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", 1)[0])
+    parser.add_argument("pkgdir", type=Path)
+    parser.add_argument("--destdir", type=Path, default=Path("."))
+    parser.add_argument("--jobs", type=int, default=None, help="Compression threads (default: all cores).")
+    parser.add_argument("--level", type=int, default=COMPRESS_LEVEL, choices=range(1, 10), metavar="1-9")
+    parser.add_argument("--json", type=Path, default=None)
+    args = parser.parse_args()
+
+    try:
+        result = build_tarball(args.pkgdir, args.destdir, args.jobs, args.level)
+    except Exception as exc:
+        print(f"ERROR: cannot build tarball for {args.pkgdir}: {exc}", file=sys.stderr)
+        return 1
+
+    text = json.dumps(result, sort_keys=True)
+    print(text)
+    if args.json:
+        args.json.write_text(text + "\n", encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Download a FASTA file and validate it while it arrives.
+
+Every received chunk goes to validate_fasta.StreamValidator before the next
+one is requested, so a protein FASTA, a FASTQ or binary garbage is rejected
+within the first megabytes instead of after a multi-gigabyte download. The
+file is saved as received (gzip stays compressed). A transfer that ends
+early is resumed with an HTTP Range request; the bytes received are checked
+against Content-Length and, with --genome-size, the bases against the
+assembly summary genome_size, so a truncated file never reaches conversion.
+
+Usage:
+    python3 scripts/fetch_fasta.py <url> genome.fa.gz [--genome-size N] [--json fetch.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from http_download import ATTEMPTS, RETRY_DELAY, Download, TransferError, chunks
+from validate_fasta import StreamValidator
+
+
+class _Download(Download):
+    """Writes the body to `out` and validates it as it arrives."""
+
+    def __init__(self, url: str, out, genome_size: int | None) -> None:
+        super().__init__(url)
+        self.out = out
+        self.genome_size = genome_size
+        self.validator = StreamValidator(genome_size=genome_size)
+
+    def restart(self) -> None:
+        super().restart()
+        self.out.seek(0)
+        self.out.truncate()
+        self.validator = StreamValidator(genome_size=self.genome_size)
+
+    def save(self, chunk: bytes) -> None:
+        self.out.write(chunk)
+        self.validator.write(chunk)
+
+
+def fetch(
+    url: str,
+    dest: Path,
+    genome_size: int | None = None,
+    attempts: int = ATTEMPTS,
+    retry_delay: float = RETRY_DELAY,
+) -> dict:
+    """Download `url` to `dest`, validating on the fly; raises ValueError for bad FASTA."""
+    tmp = dest.with_name(dest.name + ".part")
+    try:
+        with tmp.open("wb") as out:
+            download = _Download(url, out, genome_size)
+            for _ in chunks(download, attempts, retry_delay):
+                pass
+        stats = download.validator.finish()
+        os.replace(tmp, dest)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    stats["bytes"] = download.received
+    stats["compressed"] = download.validator.compressed
+    return stats
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", 1)[0])
+    parser.add_argument("url")
+    parser.add_argument("dest", type=Path)
+    parser.add_argument("--genome-size", type=int, default=None,
+                        help="Assembly genome_size in bases; a FASTA with clearly fewer is rejected.")
+    parser.add_argument("--json", type=Path, default=None)
+    args = parser.parse_args()
+
+    try:
+        stats = fetch(args.url, args.dest, args.genome_size or None)
+    except TransferError as exc:
+        print(f"ERROR: download failed: {exc}", file=sys.stderr)
+        return 1
+    except ValueError as exc:
+        print(f"ERROR: invalid nucleotide FASTA: {exc}", file=sys.stderr)
+        return 1
+
+    text = json.dumps(stats, sort_keys=True)
+    print(text)
+    if args.json:
+        args.json.write_text(text + "\n", encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
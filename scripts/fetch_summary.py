@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""Fetch an NCBI assembly_summary only when it changed, parsing rows as they arrive.
+
+The RefSeq and GenBank summaries are re-published in place, so a copy that is
+still current can be reused: each fetch sends If-None-Match/If-Modified-Since
+with the ETag and Last-Modified of the copy on disk (kept in
+<dest>.meta.json), and a 304 costs one round trip. A changed summary is
+downloaded to <dest>.part and moved into place once complete; an interrupted
+download resumes from there with a Range request (If-Range guards against the
+file changing in between).
+
+summary_rows() yields parsed rows while the bytes are still arriving, typed
+and filtered like assembly_summary.SummaryStore.rows(), or reads them from
+the SummaryStore when the copy on disk is current.
+
+Usage:
+    python3 scripts/fetch_summary.py refseq /tmp/ncbi/assembly_summary_refseq.txt [--json fetch.json]
+    python3 scripts/fetch_summary.py https://example.org/assembly_summary.txt summary.txt
+"""
+
+from __future__ import annotations
+
+import argparse
+import email.utils
+import json
+import os
+import sys
+import urllib.error
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+sys.path.insert(0, str(Path(__file__).parent))
+from assembly_summary import HEADER_PREFIX, iter_summary, row_parser
+from http_download import ATTEMPTS, CHUNK_SIZE, RETRY_DELAY, Download, TransferError, chunks
+
+
+SUMMARY_URLS = {
+    "refseq": "https://ftp.ncbi.nlm.nih.gov/genomes/refseq/assembly_summary_refseq.txt",
+    "genbank": "https://ftp.ncbi.nlm.nih.gov/genomes/genbank/assembly_summary_genbank.txt",
+}
+
+
+class SummaryChanged(TransferError):
+    """The summary was replaced on the server after rows of it were handed out."""
+
+    retryable = False
+
+
+def meta_path(dest: Path) -> Path:
+    return dest.with_name(dest.name + ".meta.json")
+
+
+def part_path(dest: Path) -> Path:
+    return dest.with_name(dest.name + ".part")
+
+
+def read_meta(dest: Path) -> dict:
+    try:
+        return json.loads(meta_path(dest).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def write_meta(dest: Path, meta: dict) -> None:
+    path = meta_path(dest)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(meta, sort_keys=True) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _validators(response) -> dict:
+    return {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+
+
+class _Download(Download):
+    """One summary transfer into <dest>.part, resumed across attempts."""
+
+    def __init__(self, url: str, dest: Path, meta: dict, rewind: Callable[[], bool] | None = None) -> None:
+        super().__init__(url)
+        self.dest = dest
+        self.part = part_path(dest)
+        self.meta = meta
+        self.rewind = rewind
+        self.validators: dict = {}
+        self.not_modified = False
+        self._out = None
+
+    def offset(self) -> int:
+        return self.part.stat().st_size if self.part.exists() else 0
+
+    def headers(self, offset: int) -> dict:
+        headers = super().headers(0)
+        partial = self.meta.get("partial") or {}
+        if offset and partial.get("url") == self.url:
+            headers["Range"] = f"bytes={offset}-"
+            validator = partial.get("etag") or partial.get("last_modified")
+            if validator:
+                headers["If-Range"] = validator
+        elif self.dest.exists() and self.meta.get("url") == self.url:
+            if self.meta.get("etag"):
+                headers["If-None-Match"] = self.meta["etag"]
+            if self.meta.get("last_modified"):
+                headers["If-Modified-Since"] = self.meta["last_modified"]
+        return headers
+
+    def refused(self, exc: urllib.error.HTTPError, headers: dict) -> None:
+        if exc.code == 304:
+            self.not_modified = True
+            return
+        if exc.code == 416 and "Range" in headers:
+            # The kept .part is not a prefix of anything the server has.
+            self.part.unlink(missing_ok=True)
+            raise TransferError("server refused to resume the partial download") from None
+        super().refused(exc, headers)
+
+    def opened(self, response, offset: int, resumed: bool) -> Iterator[bytes]:
+        """Open the .part for this response; the first attempt replays what an earlier run kept."""
+        if self.received and not resumed:
+            if self.rewind is None or not self.rewind():
+                # Rows were already handed out; a restart would repeat them.
+                self.part.unlink(missing_ok=True)
+                raise SummaryChanged(f"{self.url} changed during the download")
+            self.restart()
+        self.validators = _validators(response)
+        self.meta["partial"] = {"url": self.url, **self.validators}
+        write_meta(self.dest, self.meta)
+        self._out = self.part.open("r+b" if resumed else "wb")
+        if resumed and not self.received:
+            # Replay what an earlier run saved before continuing it.
+            while self.received < offset:
+                chunk = self._out.read(min(CHUNK_SIZE, offset - self.received))
+                if not chunk:
+                    break
+                self.received += len(chunk)
+                yield chunk
+        self._out.seek(self.received)
+        self._out.truncate()
+
+    def save(self, chunk: bytes) -> None:
+        self._out.write(chunk)
+
+    def closed(self) -> None:
+        if self._out is not None:
+            self._out.close()
+            self._out = None
+
+    def finish(self) -> None:
+        os.replace(self.part, self.dest)
+        self.meta.pop("partial", None)
+        self.meta.update({
+            "url": self.url,
+            **self.validators,
+            "bytes": self.received,
+            "fetched": email.utils.formatdate(usegmt=True),
+        })
+        write_meta(self.dest, self.meta)
+
+
+def fetch_chunks(
+    url: str,
+    dest: Path,
+    status: dict | None = None,
+    attempts: int = ATTEMPTS,
+    retry_delay: float = RETRY_DELAY,
+    rewind: Callable[[], bool] | None = None,
+) -> Iterator[bytes]:
+    """Yield the new summary's bytes as they arrive and move it to `dest` once complete.
+
+    Nothing is yielded when `dest` is still current (HTTP 304). `status`, if
+    given, is filled with "status" ("not_modified" or "downloaded"), "bytes"
+    and the validators. A transfer left unfinished (an error, or a consumer
+    that stopped early) stays in <dest>.part for the next fetch to resume.
+
+    If a resume comes back as the whole body, `rewind` is asked to drop what
+    the consumer made of the bytes so far and the body is yielded again from
+    the start; without it, or when it returns False, SummaryChanged is raised.
+    """
+    status = {} if status is None else status
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    download = _Download(url, dest, read_meta(dest), rewind)
+    yield from chunks(download, attempts, retry_delay)
+    if download.not_modified:
+        status.update(status="not_modified", bytes=dest.stat().st_size, url=url,
+                      etag=download.meta.get("etag"), last_modified=download.meta.get("last_modified"))
+        return
+    download.finish()
+    status.update(status="downloaded", bytes=download.received, url=url, **download.validators)
+
+
+def fetch(url: str, dest: Path, attempts: int = ATTEMPTS, retry_delay: float = RETRY_DELAY) -> dict:
+    """Bring `dest` up to date with `url` without parsing it; returns the fetch status."""
+    status: dict = {}
+    for _ in fetch_chunks(url, dest, status, attempts, retry_delay, rewind=lambda: True):
+        pass
+    return status
+
+
+class RowStream:
+    """Turn summary bytes, fed in arbitrary chunks, into typed, filtered rows."""
+
+    def __init__(self, columns: list[str] | None = None, filters: dict | None = None) -> None:
+        self.wanted = list(columns) if columns else None
+        self.filters = {
+            column: {wanted} if isinstance(wanted, str) else set(wanted)
+            for column, wanted in (filters or {}).items() if wanted is not None
+        }
+        self.columns: list[str] | None = None
+        self._tail = b""
+
+    def _start(self, line: str) -> None:
+        self.columns = line.lstrip("#").rstrip("\r\n").split("\t")
+        for column in (*(self.wanted or ()), *self.filters):
+            if column not in self.columns:
+                raise ValueError(f"summary has no column {column!r}")
+        index = {column: i for i, column in enumerate(self.columns)}
+        self._parse = row_parser(self.columns)
+        self._checks = [(index[column], values) for column, values in self.filters.items()]
+        self._project = [(column, index[column]) for column in (self.wanted or self.columns)]
+
+    def _rows(self, lines: Iterable[bytes]) -> Iterator[dict]:
+        for raw in lines:
+            line = raw.decode("utf-8", errors="replace")
+            if self.columns is None:
+                if line.startswith(HEADER_PREFIX):
+                    self._start(line)
+                continue
+            if line.startswith("#") or not line.strip():
+                continue
+            fields = self._parse(line)
+            if all(fields[i] in values for i, values in self._checks):
+                yield {column: fields[i] for column, i in self._project}
+
+    def feed(self, chunk: bytes) -> Iterator[dict]:
+        lines = (self._tail + chunk).split(b"\n")
+        self._tail = lines.pop()
+        yield from self._rows(lines)
+
+    def close(self) -> Iterator[dict]:
+        tail, self._tail = self._tail, b""
+        yield from self._rows([tail] if tail else [])
+        if self.columns is None:
+            raise ValueError("no assembly_summary header found in the download")
+
+
+def summary_rows(
+    url: str,
+    dest: Path,
+    columns: list[str] | None = None,
+    status: dict | None = None,
+    **filters,
+) -> Iterator[dict]:
+    """Rows of the summary at `url`, streamed during the download or read from the current copy at `dest`.
+
+    Columns and filters work as in SummaryStore.rows(); values are typed the same way either path.
+    """
+    status = {} if status is None else status
+    stream = RowStream(columns, filters)
+    handed_out = False
+
+    def rewind() -> bool:
+        nonlocal stream
+        if handed_out:
+            return False
+        stream = RowStream(columns, filters)
+        return True
+
+    for chunk in fetch_chunks(url, dest, status, rewind=rewind):
+        for row in stream.feed(chunk):
+            handed_out = True
+            yield row
+    if status.get("status") == "not_modified":
+        yield from iter_summary(dest, columns, **filters)
+    else:
+        yield from stream.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", 1)[0])
+    parser.add_argument("source", help=f"{' or '.join(SUMMARY_URLS)}, or the URL of a summary.")
+    parser.add_argument("dest", type=Path)
+    parser.add_argument("--json", type=Path, default=None)
+    args = parser.parse_args()
+
+    url = SUMMARY_URLS.get(args.source, args.source)
+    try:
+        status = fetch(url, args.dest)
+    except (TransferError, ValueError) as exc:
+        print(f"ERROR: cannot fetch {url}: {exc}", file=sys.stderr)
+        return 1
+
+    text = json.dumps(status, sort_keys=True)
+    print(text)
+    if args.json:
+        args.json.write_text(text + "\n", encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
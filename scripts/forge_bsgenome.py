@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""Assemble a BSgenome data package from a .seed file without R.
+
+Writes the same package tree as BSgenome's forgeBSgenomeDataPkg() for a
+single 2bit source (DESCRIPTION, NAMESPACE, R/zzz.R, man/package.Rd and
+inst/extdata/single_sequences.2bit), filled in from the seed fields that
+autoBSgenome.py and build-bsgenome.yml write. forge loads every sequence
+into R, so its memory grows with the number of contigs; here the 2bit is
+hardlinked, reflinked or moved into place (see staging.place), or put there
+with exactly the method a staging plan chose (--placement), and its index
+streamed once to check circ_seqs, so memory stays flat for any genome.
+
+Usage:
+    python3 scripts/forge_bsgenome.py BSgenome.Hsapiens.UCSC.hg38.seed [--destdir .] [--move] [--placement hardlink]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from staging import PLACEMENTS, place
+from twobit import TwoBitFile
+
+
+# Dependency versions forgeBSgenomeDataPkg() writes in the builder image.
+R_VERSION = "4.2.0"
+GENOMEINFODB_VERSION = "1.34.9"
+BSGENOME_VERSION = "1.72.0"
+
+REQUIRED_FIELDS = (
+    "Package", "Title", "Version", "organism", "genome", "provider",
+    "release_date", "BSgenomeObjname", "seqs_srcdir", "seqfile_name",
+)
+DEFAULTS = {
+    "Description": "",
+    "Author": "The Bioconductor Dev Team",
+    "Maintainer": "Bioconductor Package Maintainer <maintainer@bioconductor.org>",
+    "Suggests": "",
+    "License": "Artistic-2.0",
+    "common_name": "",
+    "source_url": "",
+    "organism_biocview": "",
+    "seqnames": "NULL",
+    "circ_seqs": "character(0)",
+    "mseqnames": "NULL",
+    "SrcDataFiles": "-- information not available --",
+    "PkgDetails": "",
+    "PkgExamples": "",
+}
+
+DESCRIPTION_TEMPLATE = """\
+Package: @PKGNAME@
+Title: @PKGTITLE@
+Description: @PKGDESCRIPTION@
+Version: @PKGVERSION@
+Author: @AUTHOR@
+Maintainer: @MAINTAINER@
+Depends: R (>= @R_VERSION@), GenomeInfoDb (>= @GENOMEINFODB_VERSION@), BSgenome (>= @BSGENOME_VERSION@)
+Suggests: @SUGGESTS@
+License: @LICENSE@
+organism: @ORGANISM@
+common_name: @COMMONNAME@
+provider: @PROVIDER@
+genome: @GENOME@
+release_date: @RELEASEDATE@
+source_url: @SOURCEURL@
+biocViews: AnnotationData, Genetics, BSgenome, @ORGANISMBIOCVIEW@
+"""
+
+NAMESPACE_TEMPLATE = """\
+import(GenomeInfoDb)
+import(BSgenome)
+
+### Don't export @PKGNAME@ or @BSGENOMEOBJNAME@ (the new and
+### old names of the BSgenome object defined in this package): the object
+### is created and its 2 names are dynamically exported at load time (refer
+### to R/zzz.R for the details).
+#export(@PKGNAME@)
+#export(@BSGENOMEOBJNAME@)
+
+"""
+
+ZZZ_TEMPLATE = """\
+###
+###
+
+.pkgname <- "@PKGNAME@"
+
+.seqnames <- @SEQNAMES@
+
+.circ_seqs <- @CIRCSEQS@
+
+.mseqnames <- @MSEQNAMES@
+
+.onLoad <- function(libname, pkgname)
+{
+    if (pkgname != .pkgname)
+        stop("package name (", pkgname, ") is not ",
+             "the expected name (", .pkgname, ")")
+    extdata_dirpath <- system.file("extdata", package=pkgname,
+                                   lib.loc=libname, mustWork=TRUE)
+
+    ## Make and export BSgenome object.
+    bsgenome <- BSgenome(
+        organism="@R_ORGANISM@",
+        common_name="@R_COMMONNAME@",
+        genome="@R_GENOME@",
+        provider="@R_PROVIDER@",
+        release_date="@R_RELEASEDATE@",
+        source_url="@R_SOURCEURL@",
+        seqnames=.seqnames,
+        circ_seqs=.circ_seqs,
+        mseqnames=.mseqnames,
+        seqs_pkgname=pkgname,
+        seqs_dirpath=extdata_dirpath
+    )
+
+    ns <- asNamespace(pkgname)
+
+    objname <- pkgname
+    assign(objname, bsgenome, envir=ns)
+    namespaceExport(ns, objname)
+
+    old_objname <- "@R_BSGENOMEOBJNAME@"
+    assign(old_objname, bsgenome, envir=ns)
+    namespaceExport(ns, old_objname)
+}
+
+"""
+
+RD_TEMPLATE = """\
+\\name{@PKGNAME@}
+\\docType{package}
+
+\\alias{@PKGNAME@-package}
+\\alias{@PKGNAME@}
+\\alias{@BSGENOMEOBJNAME@}
+
+\\title{@PKGTITLE@}
+
+\\description{
+  @PKGDESCRIPTION@
+}
+
+\\details{
+  @PKGDETAILS@
+}
+
+\\note{
+  This BSgenome data package was made from the following source data files:
+  \\preformatted{
+@SRCDATAFILES@
+  }
+
+  See \\code{?\\link[BSgenome]{BSgenomeForge}} and the BSgenomeForge
+  vignette (\\code{vignette("BSgenomeForge")}) in the \\pkg{BSgenome}
+  software package for how to create a BSgenome data package.
+}
+
+\\author{@AUTHOR@}
+
+\\seealso{
+  \\itemize{
+    \\item \\link[BSgenome]{BSgenome} objects in the \\pkg{BSgenome}
+          software package.
+
+    \\item The \\code{\\link[GenomeInfoDb]{seqinfo}} getter and
+          \\link[GenomeInfoDb]{Seqinfo} objects in the \\pkg{GenomeInfoDb}
+          package.
+
+    \\item The \\code{\\link[GenomeInfoDb]{seqlevelsStyle}} getter and
+          setter in the \\pkg{GenomeInfoDb} package.
+
+    \\item \\link[Biostrings]{DNAString} objects in the \\pkg{Biostrings}
+          package.
+
+    \\item The \\code{\\link[BSgenome]{available.genomes}} function
+          in the \\pkg{BSgenome} software package.
+
+    \\item The BSgenomeForge vignette (\\code{vignette("BSgenomeForge")})
+          in the \\pkg{BSgenome} software package for how to create a BSgenome
+          data package.
+  }
+}
+
+\\examples{
+@PKGNAME@
+bsg <- @PKGNAME@
+head(seqlengths(bsg))
+seqinfo(bsg)
+@PKGEXAMPLES@
+
+
+## ---------------------------------------------------------------------
+## Genome-wide motif searching
+## ---------------------------------------------------------------------
+
+## See the GenomeSearching vignette in the BSgenome software
+## package for some examples of genome-wide motif searching using
+## Biostrings and the BSgenome data packages:
+if (interactive())
+    vignette("GenomeSearching", package="BSgenome")
+}
+
+\\keyword{package}
+\\keyword{data}
+"""
+
+
+def read_seed(path: Path) -> dict[str, str]:
+    """Parse a DCF seed file like R's read.dcf(): continuation lines start with blanks."""
+    fields: dict[str, str] = {}
+    key = None
+    with path.open(encoding="utf-8") as handle:
+        for line in handle:
+            line = line.rstrip("\r\n")
+            if not line.strip():
+                key = None
+                continue
+            if line[0] in " \t" and key is not None:
+                fields[key] = (fields[key] + "\n" + line.strip()).strip()
+                continue
+            name, sep, value = line.partition(":")
+            if not sep:
+                raise ValueError(f"{path}: malformed seed line: {line}")
+            key = name.strip()
+            fields[key] = value.strip()
+    return fields
+
+
+def r_string(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def fill(template: str, values: dict[str, str]) -> str:
+    return re.sub(r"@([A-Z_]+)@", lambda match: values[match.group(1)], template)
+
+
+def template_values(seed: dict[str, str]) -> dict[str, str]:
+    missing = [name for name in REQUIRED_FIELDS if not seed.get(name)]
+    if missing:
+        raise ValueError(f"seed file lacks {', '.join(missing)}")
+    seed = {**DEFAULTS, **{key: value for key, value in seed.items() if value or key not in DEFAULTS}}
+    values = {
+        "PKGNAME": seed["Package"],
+        "PKGTITLE": seed["Title"],
+        "PKGDESCRIPTION": seed["Description"],
+        "PKGVERSION": seed["Version"],
+        "AUTHOR": seed["Author"],
+        "MAINTAINER": seed["Maintainer"],
+        "R_VERSION": R_VERSION,
+        "GENOMEINFODB_VERSION": GENOMEINFODB_VERSION,
+        "BSGENOME_VERSION": BSGENOME_VERSION,
+        "SUGGESTS": seed["Suggests"],
+        "LICENSE": seed["License"],
+        "ORGANISM": seed["organism"],
+        "COMMONNAME": seed["common_name"],
+        "PROVIDER": seed["provider"],
+        "GENOME": seed["genome"],
+        "RELEASEDATE": seed["release_date"],
+        "SOURCEURL": seed["source_url"],
+        "ORGANISMBIOCVIEW": seed["organism_biocview"],
+        "BSGENOMEOBJNAME": seed["BSgenomeObjname"],
+        "SEQNAMES": seed["seqnames"],
+        "CIRCSEQS": seed["circ_seqs"],
+        "MSEQNAMES": seed["mseqnames"],
+        "SRCDATAFILES": seed["SrcDataFiles"],
+        "PKGDETAILS": seed["PkgDetails"],
+        "PKGEXAMPLES": seed["PkgExamples"],
+    }
+    for name in ("ORGANISM", "COMMONNAME", "GENOME", "PROVIDER", "RELEASEDATE", "SOURCEURL", "BSGENOMEOBJNAME"):
+        values["R_" + name] = r_string(values[name])
+    return values
+
+
+def circ_seq_names(expr: str) -> list[str] | None:
+    """Names in a literal c("a", "b") / character(0) circ_seqs value, else None."""
+    expr = expr.strip()
+    if expr in ("character(0)", "NULL", "c()"):
+        return []
+    match = re.fullmatch(r"c\((.*)\)", expr, re.S)
+    if not match:
+        return None
+    items = re.findall(r'"((?:[^"\\]|\\.)*)"|\'((?:[^\'\\]|\\.)*)\'', match.group(1))
+    return [double or single for double, single in items]
+
+
+def check_twobit(twobit: Path, circ_seqs: str) -> int:
+    wanted = set(circ_seq_names(circ_seqs) or [])
+    count = 0
+    with TwoBitFile(twobit) as reader:
+        for name, _ in reader.iter_index():
+            count += 1
+            wanted.discard(name)
+    if wanted:
+        raise ValueError(f"circ_seqs not in {twobit.name}: {', '.join(sorted(wanted))}")
+    return count
+
+
+def assemble(seed_path: Path, destdir: Path = Path("."), move: bool = False, placement: str | None = None) -> dict:
+    """Write the package directory for `seed_path` into `destdir`.
+
+    `placement` is the one staging.place() method to put the 2bit in with, as
+    a staging plan chose it; an OSError if it does not work here. With `move`
+    the source 2bit is gone afterwards either way.
+    """
+    seed = read_seed(seed_path)
+    values = template_values(seed)
+    package = values["PKGNAME"]
+    twobit = Path(seed["seqs_srcdir"]) / seed["seqfile_name"]
+    if twobit.suffix != ".2bit":
+        raise ValueError(f"seqfile_name must be a .2bit file, got {seed['seqfile_name']}")
+    if not twobit.is_file():
+        raise ValueError(f"{twobit} does not exist")
+    seq_count = check_twobit(twobit, values["CIRCSEQS"])
+
+    target = destdir / package
+    if target.exists():
+        raise ValueError(f"{target} already exists")
+    tmpdir = destdir / f".{package}.tmp"
+    shutil.rmtree(tmpdir, ignore_errors=True)
+    tmpdir.mkdir()
+    try:
+        (tmpdir / "R").mkdir()
+        (tmpdir / "man").mkdir()
+        (tmpdir / "inst" / "extdata").mkdir(parents=True)
+        for name, template in (
+            ("DESCRIPTION", DESCRIPTION_TEMPLATE),
+            ("NAMESPACE", NAMESPACE_TEMPLATE),
+            ("R/zzz.R", ZZZ_TEMPLATE),
+            ("man/package.Rd", RD_TEMPLATE),
+        ):
+            (tmpdir / name).write_text(fill(template, values), encoding="utf-8")
+        dest = tmpdir / "inst" / "extdata" / "single_sequences.2bit"
+        if placement:
+            place(twobit, dest, (placement,))
+            if move and placement != "rename":
+                twobit.unlink()
+        elif move:
+            # A rename across filesystems becomes a copy; the source still goes.
+            if place(twobit, dest, ("rename", "copy")) == "copy":
+                twobit.unlink()
+        else:
+            place(twobit, dest)
+        os.replace(tmpdir, target)
+    except BaseException:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+        raise
+    return {
+        "package": package,
+        "path": str(target),
+        "seq_count": seq_count,
+        "twobit_size": (target / "inst" / "extdata" / "single_sequences.2bit").stat().st_size,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", 1)[0])
+    parser.add_argument("seed", type=Path)
+    parser.add_argument("--destdir", type=Path, default=Path("."))
+    parser.add_argument("--move", action="store_true",
+                        help="Move the 2bit into the package instead of hardlinking (or reflinking) it.")
+    parser.add_argument("--placement", choices=PLACEMENTS, default=None,
+                        help="Place the 2bit with only this method (staging.py's plan); fail if it does not work.")
+    parser.add_argument("--json", type=Path, default=None)
+    args = parser.parse_args()
+
+    try:
+        result = assemble(args.seed, args.destdir, args.move, args.placement)
+    except Exception as exc:
+        print(f"ERROR: cannot assemble BSgenome package: {exc}", file=sys.stderr)
+        return 1
+
+    text = json.dumps(result, sort_keys=True)
+    print(text)
+    if args.json:
+        args.json.write_text(text + "\n", encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
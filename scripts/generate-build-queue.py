@@ -2,7 +2,8 @@
 """
 Generate a build queue from NCBI RefSeq representative genomes.
 
-Downloads the assembly summary, filters to representative/reference genomes,
+Fetches the assembly summary (only if NCBI changed it since the cached copy),
+filters to representative/reference genomes while it downloads,
 sorts by priority (vertebrates first, then by genome size ascending),
 and outputs a JSON queue file.
 
@@ -10,16 +11,15 @@ Usage:
     python3 scripts/generate-build-queue.py [--output build-queue.json]
 """
 
-import csv
 import json
 import sys
-import urllib.request
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
+from fetch_summary import SUMMARY_URLS, TransferError, summary_rows
 from normalize_package_name import build_package_name
 
-REFSEQ_SUMMARY_URL = "https://ftp.ncbi.nlm.nih.gov/genomes/refseq/assembly_summary_refseq.txt"
+REFSEQ_SUMMARY_URL = SUMMARY_URLS["refseq"]
 
 # Priority order for organism groups (lower = higher priority)
 GROUP_PRIORITY = {
@@ -44,33 +44,22 @@ BIOCONDUCTOR_ORGANISMS = {
 }
 
 
-def download_summary(cache_path="/tmp/refseq_summary.txt"):
-    """Download or use cached assembly summary."""
-    p = Path(cache_path)
-    if not p.exists() or p.stat().st_size < 1_000_000:
-        print(f"Downloading assembly summary from NCBI...", file=sys.stderr)
-        urllib.request.urlretrieve(REFSEQ_SUMMARY_URL, cache_path)
-    else:
+def fetch_reference_genomes(cache_path="/tmp/refseq_summary.txt"):
+    """Reference genomes of the assembly summary, parsed while it downloads or from the cached copy if current."""
+    print(f"Checking assembly summary from NCBI (cache: {cache_path})...", file=sys.stderr)
+    status = {}
+    entries = list(summary_rows(
+        REFSEQ_SUMMARY_URL,
+        Path(cache_path),
+        ["assembly_accession", "organism_name", "group", "genome_size", "asm_name"],
+        status,
+        refseq_category="reference genome",
+        version_status="latest",
+    ))
+    if status["status"] == "not_modified":
         print(f"Using cached summary: {cache_path}", file=sys.stderr)
-    return cache_path
-
-
-def parse_summary(filepath):
-    """Parse the assembly summary TSV."""
-    entries = []
-    with open(filepath, "r") as f:
-        # Skip comment lines
-        for line in f:
-            if line.startswith("#assembly_accession"):
-                headers = line.lstrip("#").strip().split("\t")
-                break
-        reader = csv.DictReader(f, fieldnames=headers, delimiter="\t")
-        for row in reader:
-            if row.get("refseq_category") != "reference genome":
-                continue
-            if row.get("version_status") != "latest":
-                continue
-            entries.append(row)
+    else:
+        print(f"Downloaded {status['bytes']:,} bytes to {cache_path}", file=sys.stderr)
     return entries
 
 
@@ -114,8 +103,11 @@ def make_queue(entries):
 def main():
     output = sys.argv[1] if len(sys.argv) > 1 else "build-queue.json"
 
-    filepath = download_summary()
-    entries = parse_summary(filepath)
+    try:
+        entries = fetch_reference_genomes()
+    except (TransferError, ValueError) as exc:
+        print(f"ERROR: cannot fetch the assembly summary: {exc}", file=sys.stderr)
+        sys.exit(1)
     print(f"Found {len(entries)} representative/reference genomes", file=sys.stderr)
 
     queue = make_queue(entries)
@@ -9,31 +9,40 @@ The public package browser keeps catalog rows intentionally small:
 This script refreshes NCBI RefSeq rows from current assembly_summary files and
 preserves non-NCBI rows from the existing catalog, such as curated Ensembl
 entries.
+
+With --feed-dir it also publishes the change against the existing catalog as
+a versioned patch next to a periodic full snapshot, so clients that already
+hold the catalog fetch only the delta (see docs/CATALOG-FEED.md).
+
+With --shard-dir it also splits the catalog by organism-name prefix into
+shards small enough to fetch on the first keystroke, listed in a small
+index.json, and with --precompress every file written gets .gz and .br
+siblings (brotli only if the brotli module is installed).
 """
 
 from __future__ import annotations
 
 import argparse
-import csv
+import gzip
+import hashlib
 import json
 import re
+import sys
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Iterable
 
+from assembly_summary import SummaryStore
 
-def clean_organism(value: str) -> str:
-    return re.sub(r"\s+", " ", value).strip()
 
+# The assembly_summary columns catalog rows are made from.
+SUMMARY_COLUMNS = [
+    "assembly_accession", "organism_name", "asm_name", "group", "genome_size",
+    "version_status", "refseq_category",
+]
 
-def iter_summary(path: Path) -> Iterable[dict[str, str]]:
-    with path.open() as handle:
-        for line in handle:
-            if line.startswith("#assembly_accession"):
-                headers = line.lstrip("#").rstrip("\n").split("\t")
-                break
-        else:
-            raise ValueError(f"no assembly_summary header found in {path}")
-        yield from csv.DictReader(handle, fieldnames=headers, delimiter="\t")
+
+def clean_organism(value: str) -> str:
+    return re.sub(r"\s+", " ", value).strip()
 
 
 ALLOWED_GROUPS = {
@@ -115,30 +124,235 @@ def sort_key(row: dict[str, object]) -> tuple[str, str, str, str]:
     )
 
 
+FEED_VERSION = 1
+# A full snapshot is written after this many patches; older patches are dropped.
+SNAPSHOT_EVERY = 30
+
+
+def feed_key(row: dict[str, object]) -> str:
+    """row_key() as one string: "accession:<a>" or "fallback:<o>|<m>|<s>"."""
+    return ":".join(row_key(row))
+
+
+def catalog_text(catalog: list[dict[str, object]]) -> str:
+    return json.dumps(catalog, separators=(",", ":")) + "\n"
+
+
+def sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def diff_catalog(
+    previous: list[dict[str, object]], catalog: list[dict[str, object]]
+) -> dict[str, list]:
+    """Rows added and updated, and keys removed, going from `previous` to `catalog`."""
+    old = {feed_key(row): row for row in previous}
+    new = {feed_key(row): row for row in catalog}
+    return {
+        "add": [row for key, row in new.items() if key not in old],
+        "update": [row for key, row in new.items() if key in old and old[key] != row],
+        "remove": sorted(key for key in old if key not in new),
+    }
+
+
+def write_feed_file(path: Path, data: object) -> str:
+    """Write compact JSON and return its sha256, which the manifest lists."""
+    text = json.dumps(data, separators=(",", ":")) + "\n"
+    path.write_text(text)
+    return sha256(text)
+
+
+def write_feed(
+    feed_dir: Path,
+    previous: list[dict[str, object]],
+    catalog: list[dict[str, object]],
+    snapshot_every: int = SNAPSHOT_EVERY,
+) -> dict[str, object]:
+    """Add the change from `previous` to `catalog` to the feed in `feed_dir` and return its manifest.
+
+    The feed continues only if `previous` is the catalog the manifest last
+    published (same sha256); otherwise, or every `snapshot_every` patches,
+    it restarts from a full snapshot.
+    """
+    feed_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = feed_dir / "manifest.json"
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+    text = catalog_text(catalog)
+    continues = (
+        manifest.get("feed_version") == FEED_VERSION
+        and manifest.get("catalog_sha256") == sha256(catalog_text(previous))
+    )
+    if continues and manifest["catalog_sha256"] == sha256(text):
+        return manifest
+
+    version = int(manifest.get("catalog_version", 0)) + 1
+    generated_at = datetime.now(timezone.utc).replace(microsecond=0).isoformat()
+    patches = list(manifest.get("patches", [])) if continues else []
+    if continues and len(patches) < snapshot_every:
+        change = diff_catalog(previous, catalog)
+        path = f"patch-{version}.json"
+        patch = {"feed_version": FEED_VERSION, "from": version - 1, "to": version,
+                 "generated_at": generated_at, **change}
+        patches.append({
+            "from": version - 1,
+            "to": version,
+            "path": path,
+            "sha256": write_feed_file(feed_dir / path, patch),
+            **{kind: len(rows) for kind, rows in change.items()},
+        })
+        snapshot = manifest["snapshot"]
+    else:
+        path = f"snapshot-{version}.json"
+        (feed_dir / path).write_text(text)
+        snapshot = {"version": version, "path": path, "rows": len(catalog), "sha256": sha256(text)}
+        patches = []
+
+    manifest = {
+        "feed_version": FEED_VERSION,
+        "catalog_version": version,
+        "generated_at": generated_at,
+        "rows": len(catalog),
+        "catalog_sha256": sha256(text),
+        "snapshot": snapshot,
+        "patches": patches,
+    }
+    # Only the current snapshot and the patches on top of it are published.
+    published = {snapshot["path"], *(patch["path"] for patch in patches)}
+    for old in [*feed_dir.glob("snapshot-*.json"), *feed_dir.glob("patch-*.json")]:
+        if old.name not in published:
+            remove_artifact(old)
+    write_feed_file(manifest_path, manifest)
+    return manifest
+
+
+# Rows per shard before it is split by a longer organism prefix.
+SHARD_ROWS = 5000
+MAX_PREFIX = 8
+COMPRESSED_SUFFIXES = (".gz", ".br")
+
+
+def shard_prefix(organism: str, length: int) -> str:
+    """The first `length` characters of the organism, uppercased; other than A-Z and 0-9 they become "_"."""
+    head = organism.upper()[:length].ljust(length, "_")
+    return "".join(char if "A" <= char <= "Z" or "0" <= char <= "9" else "_" for char in head)
+
+
+def plan_shards(
+    catalog: list[dict[str, object]], max_rows: int = SHARD_ROWS
+) -> dict[str, list[dict[str, object]]]:
+    """Rows by shard key: one-letter prefixes, lengthened where a shard would exceed `max_rows`."""
+    shards: dict[str, list[dict[str, object]]] = {}
+    pending = [("", catalog)]
+    while pending:
+        prefix, rows = pending.pop()
+        groups: dict[str, list[dict[str, object]]] = {}
+        for row in rows:
+            groups.setdefault(shard_prefix(str(row.get("o") or ""), len(prefix) + 1), []).append(row)
+        for key, group in groups.items():
+            if len(group) > max_rows and len(key) < MAX_PREFIX:
+                pending.append((key, group))
+            else:
+                shards[key] = group
+    return dict(sorted(shards.items()))
+
+
+def write_catalog_shards(
+    shard_dir: Path, catalog: list[dict[str, object]], max_rows: int = SHARD_ROWS
+) -> list[Path]:
+    """Write <KEY>.json shards and index.json to `shard_dir`, replacing the previous set; returns the files."""
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    shards = plan_shards(catalog, max_rows)
+    written = []
+    summaries = []
+    for key, rows in shards.items():
+        path = shard_dir / f"{key}.json"
+        path.write_text(catalog_text(rows))
+        written.append(path)
+        summaries.append({"key": key, "path": path.name, "count": len(rows)})
+    for old in shard_dir.glob("*.json"):
+        if old not in written and old.name != "index.json":
+            remove_artifact(old)
+    # No timestamp: an unchanged catalog must leave index.json (and its
+    # compressed copies) byte-identical, so the refresh commits nothing.
+    index = {
+        "version": 1,
+        "total": len(catalog),
+        "shard_rows": max_rows,
+        "shards": summaries,
+    }
+    write_feed_file(shard_dir / "index.json", index)
+    return [*written, shard_dir / "index.json"]
+
+
+def remove_artifact(path: Path) -> None:
+    for stale in (path, *(path.with_name(path.name + suffix) for suffix in COMPRESSED_SUFFIXES)):
+        stale.unlink(missing_ok=True)
+
+
+def precompress(path: Path) -> bool:
+    """Write <path>.gz and, with the brotli module, <path>.br; returns whether brotli was available.
+
+    Unchanged files keep their compressed copies (compared through the .gz).
+    """
+    data = path.read_bytes()
+    gz_path = path.with_name(path.name + ".gz")
+    br_path = path.with_name(path.name + ".br")
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+    try:
+        current = gz_path.exists() and gzip.decompress(gz_path.read_bytes()) == data
+    except (OSError, EOFError):
+        current = False
+    if not current:
+        # mtime=0 keeps the .gz byte-identical when the content is.
+        gz_path.write_bytes(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is None:
+        # A .br left from a run with brotli would no longer match.
+        br_path.unlink(missing_ok=True)
+        return False
+    if not current or not br_path.exists():
+        br_path.write_bytes(brotli.compress(data, quality=11))
+    return True
+
+
 def main() -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument("--existing-catalog", type=Path)
     parser.add_argument("--refseq-summary", required=True, type=Path)
     parser.add_argument("--output", required=True, type=Path)
+    parser.add_argument("--feed-dir", type=Path,
+                        help="Publish the change against --existing-catalog as a patch feed here.")
+    parser.add_argument("--snapshot-every", type=int, default=SNAPSHOT_EVERY,
+                        help="Write a full snapshot after this many patches.")
+    parser.add_argument("--shard-dir", type=Path,
+                        help="Also write organism-prefix shards and their index.json here.")
+    parser.add_argument("--shard-rows", type=int, default=SHARD_ROWS,
+                        help="Split a shard by a longer prefix above this many rows.")
+    parser.add_argument("--precompress", action="store_true",
+                        help="Write .gz and .br copies of every file written.")
     args = parser.parse_args()
 
     by_key: dict[tuple[str, str], dict[str, object]] = {}
 
-    for row in load_existing(args.existing_catalog):
+    previous = load_existing(args.existing_catalog)
+    for row in previous:
         # Preserve curated non-NCBI rows. NCBI rows are regenerated below from
         # current assembly_summary files so accession versions and sizes stay fresh.
         if str(row.get("s") or "").lower() == "ncbi":
             continue
         by_key[row_key(row)] = row
 
-    for summary_row in iter_summary(args.refseq_summary):
-        row = catalog_row(summary_row, "ncbi")
-        if not row:
-            continue
-        by_key[row_key(row)] = row
+    with SummaryStore(args.refseq_summary) as store:
+        for summary_row in store.rows(SUMMARY_COLUMNS, version_status="latest", group=sorted(ALLOWED_GROUPS)):
+            row = catalog_row(summary_row, "ncbi")
+            if not row:
+                continue
+            by_key[row_key(row)] = row
 
     catalog = sorted(by_key.values(), key=sort_key)
-    args.output.write_text(json.dumps(catalog, separators=(",", ":")) + "\n")
+    args.output.write_text(catalog_text(catalog))
 
     groups: dict[str, int] = {}
     sources: dict[str, int] = {}
@@ -150,6 +364,24 @@ def main() -> None:
     print("Sources:", dict(sorted(sources.items())))
     print("Groups:", dict(sorted(groups.items())))
 
+    if args.feed_dir:
+        manifest = write_feed(args.feed_dir, previous, catalog, max(args.snapshot_every, 0))
+        print(f"Feed: version {manifest['catalog_version']} = {manifest['snapshot']['path']} "
+              f"+ {len(manifest['patches'])} patches")
+
+    artifacts = [args.output]
+    if args.feed_dir:
+        artifacts += [args.feed_dir / "manifest.json", args.feed_dir / manifest["snapshot"]["path"]]
+        artifacts += [args.feed_dir / patch["path"] for patch in manifest["patches"]]
+    if args.shard_dir:
+        shard_files = write_catalog_shards(args.shard_dir, catalog, max(args.shard_rows, 1))
+        artifacts += shard_files
+        print(f"Shards: {len(shard_files) - 1} in {args.shard_dir}")
+    if args.precompress:
+        with_brotli = [precompress(path) for path in artifacts]
+        if not all(with_brotli):
+            print("WARNING: brotli module not installed; wrote .gz copies only", file=sys.stderr)
+
 
 if __name__ == "__main__":
     main()
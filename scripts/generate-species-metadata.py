@@ -14,7 +14,6 @@ fill taxonomy fields over time.
 from __future__ import annotations
 
 import argparse
-import csv
 import json
 import re
 import sys
@@ -28,10 +27,15 @@ from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+from assembly_summary import SummaryStore
+
 
 TAXONOMY_URL = "https://api.ncbi.nlm.nih.gov/datasets/v2/taxonomy/taxon/{taxon}/dataset_report"
 RANKS = ("domain", "kingdom", "phylum", "class", "order", "family", "genus")
 IMAGE_HOST = "https://www.ensembl.org/i/species"
+SUMMARY_COLUMNS = [
+    "assembly_accession", "taxid", "species_taxid", "organism_name", "assembly_level", "seq_rel_date",
+]
 
 
 def log(message: str) -> None:
@@ -207,32 +211,29 @@ def load_catalog(path: Path) -> list[dict[str, Any]]:
     return data
 
 
-def load_assembly_summaries(paths: list[Path]) -> dict[str, dict[str, str]]:
+def load_assembly_summaries(paths: list[Path], accessions: set[str]) -> dict[str, dict[str, str]]:
+    """Summary fields of `accessions`, looked up in each summary's accession index; later summaries win."""
     by_accession: dict[str, dict[str, str]] = {}
     for path in paths:
         if not path.exists():
             log(f"WARNING: assembly summary not found: {path}")
             continue
-        with path.open(encoding="utf-8") as handle:
-            for line in handle:
-                if line.startswith("#assembly_accession"):
-                    headers = line.lstrip("#").rstrip("\n").split("\t")
-                    break
-            else:
-                raise SystemExit(f"ERROR: no assembly_summary header found in {path}")
-
-            for row in csv.DictReader(handle, fieldnames=headers, delimiter="\t"):
-                accession = row.get("assembly_accession", "").strip()
-                if not accession:
-                    continue
-                by_accession[accession] = {
-                    "accession": accession,
-                    "taxid": row.get("taxid", "").strip(),
-                    "species_taxid": row.get("species_taxid", "").strip(),
-                    "organism": clean_name(row.get("organism_name", "")),
-                    "assembly_level": row.get("assembly_level", "").strip(),
-                    "release_date": row.get("seq_rel_date", "").strip().replace("/", "-"),
-                }
+        try:
+            store = SummaryStore(path)
+        except ValueError as exc:
+            raise SystemExit(f"ERROR: {exc}") from None
+        with store:
+            found = store.find(accessions, SUMMARY_COLUMNS)
+        for accession, row in found.items():
+            by_accession[accession] = {
+                "accession": row["assembly_accession"],
+                # Typed columns: integers, None for "na".
+                "taxid": "" if row["taxid"] is None else str(row["taxid"]),
+                "species_taxid": "" if row["species_taxid"] is None else str(row["species_taxid"]),
+                "organism": clean_name(row["organism_name"]),
+                "assembly_level": row["assembly_level"].strip(),
+                "release_date": row["seq_rel_date"].strip().replace("/", "-"),
+            }
     return by_accession
 
 
@@ -646,7 +647,9 @@ def main() -> None:
     packages = load_packages(args.packages)
     bioc_packages = load_json(args.bioc_packages, []) if args.bioc_packages else []
     catalog = load_catalog(args.catalog)
-    assembly_by_accession = load_assembly_summaries(args.assembly_summary)
+    accessions = {str(package["accession"]) for package in (*packages, *bioc_packages) if package.get("accession")}
+    accessions.update(str(row["a"]) for row in catalog if row.get("a"))
+    assembly_by_accession = load_assembly_summaries(args.assembly_summary, accessions)
     taxonomy_cache = load_json(args.taxonomy_cache, {}) if args.taxonomy_cache else {}
 
     entries, taxonomy_cache, stats = build_entries(
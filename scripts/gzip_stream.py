@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""Stream a FASTA file as decompressed byte blocks, inflating gzip on all cores.
+
+`read_blocks()` is a generator of raw byte blocks that the FASTA scanners
+consume directly, so a downloaded genome.fa.gz never has to be written out
+decompressed. Uncompressed files are read as they are.
+
+BGZF files (bgzip, and most Ensembl/NCBI .gz files produced with htslib) are
+made of independent gzip members whose compressed size is stored in each
+header, so batches of members are inflated in a thread pool; zlib releases
+the GIL while inflating. Any other gzip file, including plain multi-member
+files whose member boundaries are not recorded anywhere, is inflated as one
+stream on a background thread so that decompression overlaps with the
+consumer's work. `ParallelGzipWriter` is the writing side: it compresses
+independent chunks in the same thread pool and writes a multi-member file.
+
+Usage:
+    python3 scripts/gzip_stream.py genome.fa.gz genome.fa [--jobs 4]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import queue
+import sys
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+
+GZIP_MAGIC = b"\x1f\x8b"
+READ_SIZE = 8 * 1024 * 1024
+# Compressed bytes handed to one BGZF worker task (about 16 members).
+BGZF_BATCH = 1024 * 1024
+# Decompressed blocks buffered ahead of the consumer per worker.
+PREFETCH = 2
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+# Input bytes per gzip member written by ParallelGzipWriter.
+GZIP_CHUNK = 4 * 1024 * 1024
+
+
+def is_gzip(path: Path) -> bool:
+    with path.open("rb") as handle:
+        return handle.read(2) == GZIP_MAGIC
+
+
+def default_jobs() -> int:
+    return os.cpu_count() or 1
+
+
+class _Tee:
+    """Read-only file wrapper that feeds every byte read to a hash."""
+
+    def __init__(self, handle: BinaryIO, digest) -> None:
+        self.handle = handle
+        self.digest = digest
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.handle.read(size)
+        self.digest.update(data)
+        return data
+
+
+def read_blocks(path: Path, block_size: int = READ_SIZE, jobs: int | None = None, digest=None) -> Iterator[bytes]:
+    """Yield the (decompressed) contents of `path` in blocks of about `block_size` bytes.
+
+    `digest`, a hashlib object, is updated with the file's bytes as stored
+    (compressed for gzip), so a full read also hashes the file.
+    """
+    jobs = jobs or default_jobs()
+    with path.open("rb") as raw:
+        handle = _Tee(raw, digest) if digest is not None else raw
+        head = handle.read(block_size)
+        if not head.startswith(GZIP_MAGIC):
+            while head:
+                yield head
+                head = handle.read(block_size)
+            return
+        if bgzf_block_size(head, 0) > 0:
+            yield from _bgzf_blocks(handle, head, jobs)
+        else:
+            yield from _pipelined(_inflate_stream(handle, head, block_size))
+
+
+def bgzf_block_size(data: bytes, pos: int) -> int:
+    """Total size of the BGZF member starting at data[pos], 0 if it is not BGZF, -1 if cut short."""
+    if len(data) - pos < 12:
+        return -1 if data[pos:] == GZIP_MAGIC[: len(data) - pos] else 0
+    if data[pos:pos + 3] != GZIP_MAGIC + b"\x08" or not data[pos + 3] & 0x04:
+        return 0
+    xlen = int.from_bytes(data[pos + 10:pos + 12], "little")
+    end = pos + 12 + xlen
+    if end > len(data):
+        return -1
+    i = pos + 12
+    while i + 4 <= end:
+        slen = int.from_bytes(data[i + 2:i + 4], "little")
+        if data[i:i + 2] == b"BC" and slen == 2 and i + 6 <= end:
+            return int.from_bytes(data[i + 4:i + 6], "little") + 1
+        i += 4 + slen
+    return 0
+
+
+def _bgzf_blocks(handle: BinaryIO, data: bytes, jobs: int) -> Iterator[bytes]:
+    pending: deque = deque()
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        try:
+            for batch in _bgzf_batches(handle, data):
+                if isinstance(batch, _Rest):
+                    while pending:
+                        yield pending.popleft().result()
+                    yield from _pipelined(_inflate_stream(handle, batch.data, READ_SIZE))
+                    return
+                pending.append(pool.submit(_inflate_bgzf, batch))
+                if len(pending) >= jobs * PREFETCH:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+class _Rest:
+    """Data from the first non-BGZF member on; inflated as a plain stream."""
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+
+
+def _bgzf_batches(handle: BinaryIO, data: bytes) -> Iterator[bytes | _Rest]:
+    # Cut the compressed input into runs of whole members; the tail of each
+    # read is carried over to the next one.
+    pos = 0
+    while True:
+        start = pos
+        while pos - start < BGZF_BATCH:
+            size = bgzf_block_size(data, pos)
+            if size <= 0 or pos + size > len(data):
+                break
+            pos += size
+        if pos > start:
+            yield data[start:pos]
+            continue
+        if size == 0 and data[pos:].strip(b"\0"):
+            yield _Rest(data[pos:].lstrip(b"\0"))
+            return
+        more = handle.read(READ_SIZE)
+        if not more:
+            if data[pos:].strip(b"\0"):
+                raise ValueError("gzip data is truncated")
+            return
+        data = data[pos:] + more
+        pos = 0
+
+
+def _inflate_bgzf(data: bytes) -> bytes:
+    out = []
+    pos = 0
+    while pos < len(data):
+        size = bgzf_block_size(data, pos)
+        try:
+            out.append(zlib.decompress(data[pos:pos + size], GZIP_WBITS))
+        except zlib.error as exc:
+            raise ValueError(f"corrupt gzip data: {exc}") from None
+        pos += size
+    return b"".join(out)
+
+
+def _inflate_stream(handle: BinaryIO, data: bytes, block_size: int) -> Iterator[bytes]:
+    inflater = zlib.decompressobj(GZIP_WBITS)
+    full = False
+    while True:
+        if not data and not full:
+            data = handle.read(READ_SIZE)
+            if not data:
+                break
+        if inflater.eof:
+            # Next member of a multi-member file; zero padding is ignored
+            # like gzip does.
+            data = data.lstrip(b"\0")
+            if not data:
+                continue
+            if not data.startswith(GZIP_MAGIC[: len(data)]):
+                raise ValueError("trailing garbage after gzip data")
+            inflater = zlib.decompressobj(GZIP_WBITS)
+        try:
+            out = inflater.decompress(data, block_size)
+        except zlib.error as exc:
+            raise ValueError(f"corrupt gzip data: {exc}") from None
+        data = inflater.unused_data if inflater.eof else inflater.unconsumed_tail
+        full = len(out) == block_size and not inflater.eof
+        if out:
+            yield out
+    if not inflater.eof:
+        raise ValueError("gzip data is truncated")
+
+
+class StreamInflater:
+    """Push-style gzip decoder for data that arrives in pieces, e.g. a download."""
+
+    def __init__(self) -> None:
+        self._inflater = zlib.decompressobj(GZIP_WBITS)
+
+    def decompress(self, data: bytes) -> bytes:
+        out = []
+        while data:
+            if self._inflater.eof:
+                data = data.lstrip(b"\0")
+                if not data:
+                    break
+                if not data.startswith(GZIP_MAGIC[: len(data)]):
+                    raise ValueError("trailing garbage after gzip data")
+                self._inflater = zlib.decompressobj(GZIP_WBITS)
+            try:
+                out.append(self._inflater.decompress(data))
+            except zlib.error as exc:
+                raise ValueError(f"corrupt gzip data: {exc}") from None
+            data = self._inflater.unused_data if self._inflater.eof else b""
+        return b"".join(out)
+
+    def finish(self) -> None:
+        if not self._inflater.eof:
+            raise ValueError("gzip data is truncated")
+
+
+class ParallelGzipWriter:
+    """File-like gzip compressor that deflates independent chunks on all cores.
+
+    Every `chunk_size` bytes of input become one gzip member, so the output
+    is a standard multi-member gzip file that gzip, tar and R read as one
+    stream. Members are written in order; at most `jobs * PREFETCH` chunks
+    are held in memory.
+    """
+
+    def __init__(self, out: BinaryIO, jobs: int | None = None, level: int = 6,
+                 chunk_size: int = GZIP_CHUNK) -> None:
+        self.out = out
+        self.level = level
+        self.chunk_size = chunk_size
+        self.jobs = jobs or default_jobs()
+        self.bytes_in = 0
+        self._buffer = bytearray()
+        self._pending: deque = deque()
+        self._pool = ThreadPoolExecutor(max_workers=self.jobs)
+
+    def write(self, data: bytes) -> int:
+        self._buffer += data
+        self.bytes_in += len(data)
+        while len(self._buffer) >= self.chunk_size:
+            self._submit(bytes(self._buffer[:self.chunk_size]))
+            del self._buffer[:self.chunk_size]
+        return len(data)
+
+    def _submit(self, chunk: bytes) -> None:
+        self._pending.append(self._pool.submit(_deflate_member, chunk, self.level))
+        while len(self._pending) >= self.jobs * PREFETCH:
+            self.out.write(self._pending.popleft().result())
+
+    def close(self) -> None:
+        if self._pool is None:
+            return
+        try:
+            if self._buffer or not self.bytes_in:
+                self._submit(bytes(self._buffer))
+                self._buffer.clear()
+            while self._pending:
+                self.out.write(self._pending.popleft().result())
+        finally:
+            for future in self._pending:
+                future.cancel()
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self) -> "ParallelGzipWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _deflate_member(data: bytes, level: int) -> bytes:
+    deflater = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+    return deflater.compress(data) + deflater.flush()
+
+
+def _pipelined(blocks: Iterator[bytes]) -> Iterator[bytes]:
+    """Run `blocks` on a background thread, a few blocks ahead of the consumer."""
+    ready: queue.Queue = queue.Queue(maxsize=PREFETCH)
+    stop = threading.Event()
+    done = object()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                ready.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce() -> None:
+        try:
+            for block in blocks:
+                if not put(block):
+                    return
+            put(done)
+        except BaseException as exc:
+            put(exc)
+
+    worker = threading.Thread(target=produce, name="gzip-inflate", daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = ready.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        worker.join()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", 1)[0])
+    parser.add_argument("source", type=Path)
+    parser.add_argument("dest", type=Path, nargs="?", default=None, help="Output file (default: stdout).")
+    parser.add_argument("--jobs", type=int, default=None, help="Threads for BGZF input (default: all cores).")
+    args = parser.parse_args()
+
+    try:
+        if args.dest is None:
+            for block in read_blocks(args.source, jobs=args.jobs):
+                sys.stdout.buffer.write(block)
+        else:
+            tmp = args.dest.with_name(args.dest.name + ".tmp")
+            try:
+                with tmp.open("wb") as out:
+                    for block in read_blocks(args.source, jobs=args.jobs):
+                        out.write(block)
+                os.replace(tmp, args.dest)
+            except BaseException:
+                tmp.unlink(missing_ok=True)
+                raise
+    except Exception as exc:
+        print(f"ERROR: cannot decompress {args.source}: {exc}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
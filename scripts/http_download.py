@@ -0,0 +1,123 @@
+"""Resumable HTTP downloads shared by fetch_fasta.py and fetch_summary.py.
+
+A Download yields the body of one URL chunk by chunk. When a transfer fails
+or ends before Content-Length, the next attempt asks for the rest with a
+Range request; a server that answers with the whole body instead makes the
+download start over. chunks() makes the attempts, pausing longer after each
+failure; a 4xx status ends the download at once, since asking again gets the
+same answer. Subclasses save or check the bytes (save()), and can change the
+request (offset(), headers()) and how a response is taken up (refused(),
+opened(), closed()).
+"""
+
+from __future__ import annotations
+
+import http.client
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import Iterable, Iterator
+
+
+USER_AGENT = "autoBSgenome/1.0 (+https://github.com/JohnnyChen1113/autoBSgenome)"
+TIMEOUT = 60
+CHUNK_SIZE = 1024 * 1024
+ATTEMPTS = 3
+RETRY_DELAY = 10
+
+
+class TransferError(Exception):
+    """The connection failed or ended before the announced length."""
+
+    # False for failures another attempt cannot fix.
+    retryable = True
+
+
+class RequestRejected(TransferError):
+    """The server answered with a 4xx status."""
+
+    retryable = False
+
+
+class Download:
+    """One URL fetched over one or more attempts."""
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        # Bytes handed out so far; a resume continues exactly there.
+        self.received = 0
+
+    def offset(self) -> int:
+        """Where the next attempt asks the body to start."""
+        return self.received
+
+    def headers(self, offset: int) -> dict:
+        headers = {"User-Agent": USER_AGENT}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+        return headers
+
+    def refused(self, exc: urllib.error.HTTPError, headers: dict) -> None:
+        """Handle an HTTP error status; returning ends the attempt without a body."""
+        if 400 <= exc.code < 500:
+            raise RequestRejected(f"HTTP Error {exc.code}: {exc.reason}") from None
+        raise exc
+
+    def opened(self, response, offset: int, resumed: bool) -> Iterable[bytes]:
+        """Take up a response before its body is read; may yield bytes kept from earlier."""
+        if offset and not resumed:
+            # The server ignored the Range request: start over.
+            self.restart()
+        return ()
+
+    def restart(self) -> None:
+        self.received = 0
+
+    def save(self, chunk: bytes) -> None:
+        """Called with every chunk of the body as it arrives."""
+
+    def closed(self) -> None:
+        """Called when an attempt ends, whether or not it succeeded."""
+
+    def attempt(self) -> Iterator[bytes]:
+        offset = self.offset()
+        headers = self.headers(offset)
+        expected = None
+        try:
+            request = urllib.request.Request(self.url, headers=headers)
+            try:
+                response = urllib.request.urlopen(request, timeout=TIMEOUT)
+            except urllib.error.HTTPError as exc:
+                self.refused(exc, headers)
+                return
+            with response:
+                yield from self.opened(response, offset, "Range" in headers and response.status == 206)
+                length = response.headers.get("Content-Length")
+                expected = self.received + int(length) if length else None
+                while True:
+                    chunk = response.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    self.save(chunk)
+                    self.received += len(chunk)
+                    yield chunk
+        except (urllib.error.URLError, http.client.HTTPException, OSError) as exc:
+            raise TransferError(str(exc)) from None
+        finally:
+            self.closed()
+        if expected is not None and self.received < expected:
+            raise TransferError(f"connection closed after {self.received} of {expected} bytes")
+
+
+def chunks(download: Download, attempts: int = ATTEMPTS, retry_delay: float = RETRY_DELAY) -> Iterator[bytes]:
+    """Yield the body of `download`, resuming it over up to `attempts` attempts."""
+    for attempt in range(1, attempts + 1):
+        try:
+            yield from download.attempt()
+            return
+        except TransferError as exc:
+            if attempt == attempts or not exc.retryable:
+                raise
+            print(f"WARNING: download attempt {attempt} of {download.url} failed: {exc}; retrying", file=sys.stderr)
+            time.sleep(retry_delay * attempt)
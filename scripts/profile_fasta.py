@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""Validate and profile a nucleotide FASTA file in one streaming pass.
+
+The profiler runs the same checks as validate_fasta.py and, in the same read,
+collects the sequence IDs, lengths and byte offsets. It writes a samtools-style
+`.fai` index plus the JSON summary used by build-bsgenome.yml, so no later
+step has to grep or rescan genome.fa. A gzip-compressed FASTA is profiled
+straight from the compressed file (see gzip_stream.py); no .fai is written
+for it.
+
+The same pass digests every sequence the refget way (sha512t24u of the
+upper-cased letters) and combines names, lengths and digests into a GA4GH
+sequence-collection digest that identifies the whole genome. It also counts
+GC, N and soft-masked (lower-case) bases per sequence and derives N50/L50,
+so the package index can describe an assembly before anyone downloads it.
+`sha256` is the digest of the file as stored, for artifact_cache.py keys.
+subset_profile() narrows a profile to the sequences a build mode keeps,
+without another pass over the FASTA.
+
+Usage:
+    python3 scripts/profile_fasta.py genome.fa --fai genome.fa.fai --json profile.json
+    python3 scripts/profile_fasta.py genome.fa.gz --json profile.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+from typing import TextIO
+
+sys.path.insert(0, str(Path(__file__).parent))
+from gzip_stream import is_gzip, read_blocks
+from validate_fasta import BLOCK_SIZE, FastaScanner, check_genome_size, scan_blocks
+
+
+SAMPLE_IDS = 5
+# Per-sequence digests are only inlined into build provenance up to this many
+# sequences, to stay well inside the repository_dispatch payload limit.
+PROVENANCE_DIGEST_LIMIT = 1000
+# The index entry lists composition rows for at most this many of the longest
+# sequences; assembly-level figures always cover every sequence.
+COMPOSITION_ROW_LIMIT = 100
+COMPOSITION_FIELDS = ["name", "length", "gc", "n", "softmask"]
+
+LOWER = bytes(range(ord("a"), ord("z") + 1))
+UPPER = bytes(range(ord("A"), ord("Z") + 1))
+TO_UPPER = bytes.maketrans(LOWER, UPPER)
+NON_LETTERS = bytes(c for c in range(256) if c not in LOWER + UPPER)
+# One table lookup gives every byte a single-bit class: GC=1, AT=0, N=2,
+# other letters=4, non-letters=8. The popcount of the whole block minus the
+# rare classes is the GC count, which avoids a slow count() of a byte that
+# makes up half the sequence.
+BASE_CLASS = bytes(
+    1 if chr(c) in "GCgc" else 0 if chr(c) in "ATat" else 2 if chr(c) in "Nn"
+    else 4 if c in LOWER + UPPER else 8
+    for c in range(256)
+)
+CASE_CLASS = bytes(ord("a") if c in LOWER else ord("A") for c in range(256))
+
+
+def sequence_id(header: bytes) -> str:
+    parts = header.split(None, 1)
+    return parts[0].decode("utf-8", errors="replace") if parts else ""
+
+
+def sha512t24u(data: bytes) -> str:
+    return t24u(hashlib.sha512(data))
+
+
+def t24u(sha512) -> str:
+    """Base64url of the first 24 bytes of a SHA-512, as refget uses."""
+    return base64.urlsafe_b64encode(sha512.digest()[:24]).decode("ascii")
+
+
+def canonical_json(value) -> bytes:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, sort_keys=True).encode("utf-8")
+
+
+def seqcol_level1(names: list[str], lengths: list[int], sequences: list[str]) -> dict:
+    """Level-1 GA4GH sequence-collection digests: one per core array."""
+    return {
+        "lengths": sha512t24u(canonical_json(lengths)),
+        "names": sha512t24u(canonical_json(names)),
+        "sequences": sha512t24u(canonical_json(sequences)),
+    }
+
+
+def seqcol_digest(names: list[str], lengths: list[int], sequences: list[str]) -> str:
+    """Level-0 GA4GH sequence-collection digest of the three core arrays."""
+    return sha512t24u(canonical_json(seqcol_level1(names, lengths, sequences)))
+
+
+def fraction(part: int, whole: int) -> float:
+    return round(part / whole, 4) if whole else 0.0
+
+
+def nx(lengths: list[int], x: int) -> tuple[int, int]:
+    """Nx and Lx: the length at which x% of the bases are covered, and how many sequences it takes."""
+    target = sum(lengths) * x / 100
+    covered = 0
+    for count, length in enumerate(sorted(lengths, reverse=True), 1):
+        covered += length
+        if covered >= target:
+            return length, count
+    return 0, 0
+
+
+def composition_stats(rows: list[tuple[str, int, int, int, int, int]]) -> dict:
+    """Assembly-level and per-sequence composition from (name, bases, ACGT, GC, N, lower) rows.
+
+    GC is a fraction of unambiguous bases; N and soft-masking are fractions
+    of all bases.
+    """
+    totals = [sum(row[i] for row in rows) for i in range(1, 6)]
+    length, acgt, gc, n, lower = totals
+    lengths = [row[1] for row in rows]
+    n50, l50 = nx(lengths, 50)
+    n90, l90 = nx(lengths, 90)
+    return {
+        "length": length,
+        "gc": fraction(gc, acgt),
+        "n": fraction(n, length),
+        "softmask": fraction(lower, length),
+        "n50": n50,
+        "l50": l50,
+        "n90": n90,
+        "l90": l90,
+        "fields": COMPOSITION_FIELDS,
+        "sequences": [
+            [name, bases, fraction(seq_gc, seq_acgt), fraction(seq_n, bases), fraction(seq_lower, bases)]
+            for name, bases, seq_acgt, seq_gc, seq_n, seq_lower in rows
+        ],
+    }
+
+
+def composition_summary(composition: dict, limit: int = COMPOSITION_ROW_LIMIT) -> dict:
+    """The index form of a profile's composition: only the `limit` longest rows."""
+    if not composition:
+        return {}
+    result = dict(composition)
+    rows = composition["sequences"]
+    if len(rows) > limit:
+        result["sequences"] = sorted(rows, key=lambda row: row[1], reverse=True)[:limit]
+        result["sequences_total"] = len(rows)
+    return result
+
+
+def digest_provenance(digests: dict, limit: int = PROVENANCE_DIGEST_LIMIT) -> dict:
+    """The provenance form of a profile's digests: level-1 digests always, arrays only up to `limit`."""
+    if not digests:
+        return {}
+    result = {
+        "algorithm": digests["algorithm"],
+        "seqcol": digests["seqcol"],
+        "count": len(digests["names"]),
+        "level1": seqcol_level1(digests["names"], digests["lengths"], digests["sequences"]),
+    }
+    if len(digests["names"]) <= limit:
+        for key in ("names", "lengths", "sequences"):
+            result[key] = digests[key]
+    return result
+
+
+def subset_profile(profile: dict, names: set[str]) -> dict:
+    """`profile` restricted to the sequences in `names`, in FASTA order.
+
+    Counts, sample IDs, composition and digests (the seqcol digest included)
+    are recomputed over those sequences alone.
+    """
+    result = dict(profile)
+    counts = profile.get("composition_counts", [])
+    rows = [row for row in counts if row[0] in names]
+    result["seq_count"] = len(rows)
+    result["total_bases"] = sum(row[1] for row in rows)
+    result["longest_seq"] = max((row[1] for row in rows), default=0)
+    result["seq_ids"] = [row[0] for row in rows[:len(profile.get("seq_ids", []))]]
+    result["composition_counts"] = rows
+    if "titles" in profile:
+        result["titles"] = [title for row, title in zip(counts, profile["titles"]) if row[0] in names]
+    result["composition"] = composition_stats(rows)
+    digests = profile.get("digests")
+    if digests:
+        kept = [i for i, name in enumerate(digests["names"]) if name in names]
+        kept_names = [digests["names"][i] for i in kept]
+        lengths = [digests["lengths"][i] for i in kept]
+        sequences = [digests["sequences"][i] for i in kept]
+        result["digests"] = {
+            "algorithm": digests["algorithm"],
+            "seqcol": seqcol_digest(kept_names, lengths, sequences),
+            "names": kept_names,
+            "lengths": lengths,
+            "sequences": sequences,
+        }
+    return result
+
+
+class FastaProfiler(FastaScanner):
+    """FastaScanner that also records IDs and faidx line geometry."""
+
+    def __init__(self, fai: TextIO | None = None, sample_ids: int = SAMPLE_IDS, digests: bool = True) -> None:
+        super().__init__()
+        self.fai = fai
+        self.sample_ids = sample_ids
+        self.digests = digests
+        self.seq_ids: list[str] = []
+        self.titles: list[str] = []
+        self.rows: list[tuple[str, int, int, int, int, int]] = []
+        self.sequence_digests: list[str] = []
+        self._hash = None
+        self._counts = [0, 0, 0, 0, 0]
+        self.faidx_ok = True
+        self.faidx_problem = ""
+        self._names: set[str] = set()
+        self._name = ""
+        self._seq_offset = 0
+        self._skip_eol = False
+        self._width = 0
+        self._line_bases = 0
+        self._col = 0
+        self._short = False
+        self._last_byte = 0
+
+    def start_record(self, header: bytes, offset: int) -> None:
+        name = sequence_id(header)
+        if len(self.seq_ids) < self.sample_ids:
+            self.seq_ids.append(name)
+        self.titles.append(header.strip().decode("utf-8", errors="replace"))
+        if not name:
+            self._faidx_fail(f"record {self.seq_count} has an empty sequence name")
+        elif name in self._names:
+            self._faidx_fail(f"duplicate sequence name {name}")
+        self._names.add(name)
+        self._name = name
+        self._seq_offset = offset + 1 + len(header) + 1
+        self._skip_eol = True
+        self._width = 0
+        self._line_bases = 0
+        self._col = 0
+        self._short = False
+        self._counts = [0, 0, 0, 0, 0]
+        if self.digests:
+            self._hash = hashlib.sha512()
+
+    def sequence(self, raw: bytes, offset: int) -> None:
+        if self._skip_eol:
+            i = 1 if raw[:1] == b"\r" else 0
+            if raw[i:i + 1] == b"\n":
+                i += 1
+                self._skip_eol = False
+            elif i < len(raw):
+                self._skip_eol = False
+            raw = raw[i:]
+            offset += i
+            self._seq_offset = offset
+            if not raw:
+                return
+        if self.faidx_ok:
+            self._track_lines(raw)
+        bases = raw.translate(TO_UPPER, NON_LETTERS)
+        if self._hash is not None:
+            self._hash.update(bases)
+        classes = raw.translate(BASE_CLASS)
+        n = classes.count(b"\x02")
+        other = classes.count(b"\x04")
+        bits = int.from_bytes(classes, "little").bit_count()
+        counts = self._counts
+        counts[0] += len(bases)
+        counts[1] += len(bases) - n - other
+        counts[2] += bits - n - other - (len(raw) - len(bases))
+        counts[3] += n
+        counts[4] += raw.translate(CASE_CLASS).count(b"a")
+        self._last_byte = raw[-1]
+
+    def end_record(self, length: int) -> None:
+        if self._width == 0:
+            # Single unterminated line, or an empty record.
+            trailing_cr = 1 if self._last_byte == 0x0D and self._col else 0
+            self._line_bases = length
+            self._width = self._col - trailing_cr + 1 if self._col else 0
+        if self.fai is not None and self.faidx_ok:
+            self.fai.write(
+                f"{self._name}\t{length}\t{self._seq_offset}\t{self._line_bases}\t{self._width}\n"
+            )
+        self.rows.append((self._name, *self._counts))
+        if self._hash is not None:
+            self.sequence_digests.append("SQ." + t24u(self._hash))
+            self._hash = None
+        self.sequence_done(self._name, length, self._seq_offset)
+
+    def sequence_done(self, name: str, length: int, offset: int) -> None:
+        """Called once per record with its ID, length and first-base offset."""
+
+    def summary(self, stats: dict) -> dict:
+        result = dict(stats)
+        result["seq_ids"] = self.seq_ids
+        result["faidx"] = self.faidx_ok
+        if self.faidx_problem:
+            result["faidx_problem"] = self.faidx_problem
+        result["composition"] = composition_stats(self.rows)
+        # (name, bases, ACGT, GC, N, lower-case) per sequence, for subset_profile().
+        result["composition_counts"] = self.rows
+        # Header lines in the same order, for select_sequences.py --profile.
+        result["titles"] = self.titles
+        if self.digests:
+            names = [row[0] for row in self.rows]
+            lengths = [row[1] for row in self.rows]
+            result["digests"] = {
+                "algorithm": "sha512t24u",
+                "seqcol": seqcol_digest(names, lengths, self.sequence_digests),
+                "names": names,
+                "lengths": lengths,
+                "sequences": self.sequence_digests,
+            }
+        return result
+
+    def _faidx_fail(self, problem: str) -> None:
+        if self.faidx_ok:
+            self.faidx_ok = False
+            self.faidx_problem = problem
+
+    def _track_lines(self, raw: bytes) -> None:
+        # samtools faidx needs every line of a record but the last to have the
+        # same width. Newlines of a regular record sit exactly `width` bytes
+        # apart, so one strided slice checks a whole block at C speed.
+        n = len(raw)
+        pos = 0
+        if self._width == 0:
+            nl = raw.find(b"\n")
+            if nl < 0:
+                self._col += n
+                return
+            before = raw[nl - 1] if nl > 0 else self._last_byte if self._col else 0
+            self._width = self._col + nl + 1
+            self._line_bases = self._width - (2 if before == 0x0D else 1)
+            self._col = 0
+            pos = nl + 1
+            if pos == n:
+                return
+
+        if self._short:
+            if raw[pos:].strip():
+                self._faidx_fail(f"different line length in sequence {self._name}")
+            return
+
+        width = self._width
+        if self._col >= width:
+            self._faidx_fail(f"different line length in sequence {self._name}")
+            return
+        first = pos + width - 1 - self._col
+        newlines = raw.count(b"\n", pos)
+        strided = raw[first::width] if first < n else b""
+        regular = len(strided) - len(strided.lstrip(b"\n"))
+        if regular == len(strided) and newlines == regular:
+            last = first + (regular - 1) * width if regular else -1
+            self._col = n - last - 1 if regular else self._col + n - pos
+            return
+
+        # The only allowed irregularity is one short final line.
+        start = first + (regular - 1) * width + 1 if regular else pos
+        tail = raw[start:]
+        nl = tail.find(b"\n")
+        if nl < 0 or (regular < len(strided) and start + nl >= first + regular * width):
+            self._faidx_fail(f"different line length in sequence {self._name}")
+            return
+        if tail[nl + 1:].strip():
+            self._faidx_fail(f"different line length in sequence {self._name}")
+            return
+        self._short = True
+
+
+def profile(
+    path: Path,
+    fai_path: Path | None = None,
+    sample_ids: int = SAMPLE_IDS,
+    digests: bool = True,
+    genome_size: int | None = None,
+) -> dict:
+    compressed = is_gzip(path)
+    if compressed and fai_path:
+        # .fai offsets would point into the decompressed stream, which is
+        # never written to disk.
+        print(f"WARNING: not writing {fai_path}: {path} is gzip-compressed", file=sys.stderr)
+        fai_path = None
+    tmp_fai = fai_path.with_name(fai_path.name + ".tmp") if fai_path else None
+    fai = tmp_fai.open("w", encoding="utf-8") if tmp_fai else None
+    try:
+        profiler = FastaProfiler(fai, sample_ids, digests)
+        file_hash = hashlib.sha256()
+        result = profiler.summary(scan_blocks(read_blocks(path, BLOCK_SIZE, digest=file_hash), profiler))
+        result["sha256"] = file_hash.hexdigest()
+        check_genome_size(result["total_bases"], genome_size)
+    except BaseException:
+        if fai:
+            fai.close()
+            tmp_fai.unlink(missing_ok=True)
+        raise
+    if compressed:
+        result["fasta_size"] = profiler.offset
+        result["compressed_size"] = path.stat().st_size
+    else:
+        result["fasta_size"] = path.stat().st_size
+    if fai:
+        fai.close()
+        if profiler.faidx_ok:
+            os.replace(tmp_fai, fai_path)
+        else:
+            tmp_fai.unlink(missing_ok=True)
+            print(f"WARNING: not writing {fai_path}: {profiler.faidx_problem}", file=sys.stderr)
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("fasta", type=Path)
+    parser.add_argument("--json", type=Path, default=None)
+    parser.add_argument("--fai", type=Path, default=None, help="Write a samtools-style .fai index.")
+    parser.add_argument("--sample-ids", type=int, default=SAMPLE_IDS)
+    parser.add_argument("--no-digests", action="store_true", help="Skip per-sequence refget digests.")
+    parser.add_argument("--genome-size", type=int, default=None,
+                        help="Assembly genome_size; fewer bases than this means a truncated file.")
+    args = parser.parse_args()
+
+    try:
+        stats = profile(args.fasta, args.fai, args.sample_ids, not args.no_digests, args.genome_size)
+    except Exception as exc:
+        print(f"ERROR: invalid nucleotide FASTA: {exc}", file=sys.stderr)
+        return 1
+
+    text = json.dumps(stats, sort_keys=True)
+    if args.json:
+        args.json.write_text(text + "\n", encoding="utf-8")
+    # Per-sequence tables can run to millions of rows; print the index view.
+    brief = dict(stats, composition=composition_summary(stats["composition"]))
+    brief.pop("composition_counts")
+    brief.pop("titles")
+    if "digests" in stats:
+        brief["digests"] = digest_provenance(stats["digests"], limit=0)
+    print(json.dumps(brief, sort_keys=True))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
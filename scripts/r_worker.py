@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""Drive one long-lived R process instead of starting Rscript per task.
+
+Starting R and loading BSgenome takes seconds, which dominates small
+(bacterial) builds that run a dependency check, forgeBSgenomeDataPkg and
+R CMD INSTALL in separate R processes. RWorker starts scripts/r_worker.R
+once and sends it one JSON request per line; each reply is one JSON line.
+Every call has a timeout: a worker that hangs is killed, and one that dies
+is restarted on the next call (calls marked retry=True are repeated once).
+Installs skip R CMD INSTALL's test load in a fresh R process and load the
+package in the worker instead, where BSgenome is already loaded.
+
+Usage:
+    python3 scripts/r_worker.py check BSgenome BSgenomeForge
+    python3 scripts/r_worker.py forge A.seed B.seed C.seed [--destdir .]
+    python3 scripts/r_worker.py install A_1.0.0.tar.gz B_1.0.0.tar.gz [--lib ~/R/library]
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import queue
+import subprocess
+import sys
+import threading
+from pathlib import Path
+from typing import TextIO
+
+
+WORKER_SCRIPT = Path(__file__).with_name("r_worker.R")
+PREFIX = "@@R_WORKER@@ "
+STARTUP_TIMEOUT = 300
+CHECK_TIMEOUT = 120
+FORGE_TIMEOUT = 3600
+INSTALL_TIMEOUT = 3600
+
+
+class RWorkerError(Exception):
+    """The R worker reported an error, exited or could not be started."""
+
+
+class RWorkerTimeout(RWorkerError):
+    """The R worker did not answer in time and was killed."""
+
+
+class RWorker:
+    def __init__(self, rscript: str = "Rscript", log: TextIO = sys.stderr) -> None:
+        self.rscript = rscript
+        self.log = log
+        self.info: dict = {}
+        self._process: subprocess.Popen | None = None
+        self._replies: queue.Queue = queue.Queue()
+        self._ids = itertools.count(1)
+
+    def __enter__(self) -> RWorker:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def start(self) -> None:
+        self.close()
+        try:
+            self._process = subprocess.Popen(
+                [self.rscript, str(WORKER_SCRIPT)],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True,
+                encoding="utf-8",
+                bufsize=1,
+            )
+        except OSError as exc:
+            raise RWorkerError(f"cannot start {self.rscript}: {exc}") from None
+        self._replies = queue.Queue()
+        threading.Thread(target=self._read, args=(self._process, self._replies), daemon=True).start()
+        self.info = self._wait(0, STARTUP_TIMEOUT)
+
+    def _read(self, process: subprocess.Popen, replies: queue.Queue) -> None:
+        for line in process.stdout:
+            text, marker, reply = line.partition(PREFIX)
+            if text.strip():
+                self.log.write(text if marker else line)
+            if marker:
+                try:
+                    replies.put(json.loads(reply))
+                except ValueError:
+                    self.log.write(f"WARNING: unreadable R worker reply: {reply}")
+        replies.put(None)
+
+    def _wait(self, request_id: int, timeout: float) -> dict:
+        try:
+            while True:
+                reply = self._replies.get(timeout=timeout)
+                if reply is None:
+                    code = self._process.wait()
+                    self._process = None
+                    raise RWorkerError(f"R worker exited with status {code}")
+                if reply.get("id") == request_id:
+                    break
+        except queue.Empty:
+            self.kill()
+            raise RWorkerTimeout(f"R worker did not answer within {timeout:g} s") from None
+        if not reply.get("ok"):
+            raise RWorkerError(reply.get("error") or "R worker request failed")
+        return reply
+
+    def call(self, op: str, timeout: float, retry: bool = False, **fields) -> dict:
+        """Send one request and return the reply; raises RWorkerError on failure."""
+        for attempt in (1, 2):
+            if not self.alive:
+                self.start()
+            request_id = next(self._ids)
+            line = json.dumps({"id": request_id, "op": op, **fields}, ensure_ascii=True)
+            try:
+                self._process.stdin.write(line + "\n")
+                self._process.stdin.flush()
+                return self._wait(request_id, timeout)
+            except BrokenPipeError:
+                self.kill()
+                error = RWorkerError("R worker exited")
+            except RWorkerTimeout:
+                raise
+            except RWorkerError as exc:
+                if self.alive:
+                    raise
+                error = exc
+            if not retry or attempt == 2:
+                raise error
+            self.log.write(f"WARNING: R worker crashed ({error}); restarting\n")
+
+    def probe(self, packages: list[str]) -> dict:
+        """{"missing": packages not installed, "libpaths": R's library directories}."""
+        reply = self.call("check", CHECK_TIMEOUT, retry=True, packages=",".join(packages))
+        return {"missing": reply["missing"], "libpaths": reply.get("libpaths", [])}
+
+    def check(self, packages: list[str]) -> list[str]:
+        """The R packages in `packages` that are not installed."""
+        return self.probe(packages)["missing"]
+
+    def forge(self, seed: Path, destdir: Path = Path("."), replace: bool = False) -> None:
+        self.call("forge", FORGE_TIMEOUT, seed=str(seed), destdir=str(destdir), replace=replace)
+
+    def install(self, path: Path, package: str | None = None, lib: Path | None = None) -> None:
+        fields = {"path": str(path)}
+        if package:
+            fields["package"] = package
+        if lib:
+            fields["lib"] = str(lib)
+        self.call("install", INSTALL_TIMEOUT, **fields)
+
+    def kill(self) -> None:
+        if self._process is not None:
+            self._process.kill()
+            self._process.wait()
+            self._process = None
+
+    def close(self) -> None:
+        if not self.alive:
+            self._process = None
+            return
+        try:
+            self._process.stdin.write(json.dumps({"id": next(self._ids), "op": "quit"}) + "\n")
+            self._process.stdin.close()
+            self._process.wait(timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        self.kill()
+
+
+def package_name(path: Path) -> str:
+    """Package name from PACKAGE_VERSION.tar.gz or a package directory."""
+    name = path.name
+    if name.endswith(".tar.gz"):
+        return name[: -len(".tar.gz")].rsplit("_", 1)[0]
+    return name
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", 1)[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    check = sub.add_parser("check", help="List which of the R packages are missing.")
+    check.add_argument("packages", nargs="+")
+    forge = sub.add_parser("forge", help="Run forgeBSgenomeDataPkg() on each seed file.")
+    forge.add_argument("seeds", type=Path, nargs="+")
+    forge.add_argument("--destdir", type=Path, default=Path("."))
+    install = sub.add_parser("install", help="R CMD INSTALL each tarball or package directory.")
+    install.add_argument("paths", type=Path, nargs="+")
+    install.add_argument("--lib", type=Path, default=None)
+    args = parser.parse_args()
+
+    results = []
+    with RWorker() as worker:
+        try:
+            if args.command == "check":
+                print(json.dumps({"missing": worker.check(args.packages)}, sort_keys=True))
+                return 0
+            for path in getattr(args, "seeds", None) or args.paths:
+                # A worker that died or timed out is restarted by the next call.
+                try:
+                    if args.command == "forge":
+                        worker.forge(path, args.destdir, replace=True)
+                    else:
+                        worker.install(path, package_name(path), args.lib)
+                    results.append({"path": str(path), "ok": True})
+                except RWorkerError as exc:
+                    results.append({"path": str(path), "ok": False, "error": str(exc)})
+        except RWorkerError as exc:
+            print(f"ERROR: {exc}", file=sys.stderr)
+            return 1
+    for result in results:
+        print(json.dumps(result, sort_keys=True))
+    return 0 if all(result["ok"] for result in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -51,7 +51,7 @@ trap 'rm -rf "$WORK_DIR"' EXIT
 cp "$INPUT_FASTA" "${WORK_DIR}/genome.fa"
 cd "$WORK_DIR"
 
-python3 /workspace/scripts/validate_fasta.py genome.fa --json fasta-validation.json
+python3 /workspace/scripts/validate_fasta.py genome.fa --jobs "$(nproc)" --json fasta-validation.json
 faToTwoBit genome.fa genome.2bit
 
 cat > "${PACKAGE}.seed" <<SEED
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""Choose the sequences a build keeps (build modes) and write their 2bit directly.
+
+Contig count, not base count, is what exhausts forge memory on fragmented
+assemblies, so a build can keep a subset of the FASTA records:
+
+- full: every record (the default),
+- chromosomes: the assembled molecules of the NCBI assembly report
+  (assembly_report.txt or datasets' sequence_report.jsonl) or, without one,
+  records whose header names a chromosome or organelle (unplaced and
+  unlocalized scaffolds are dropped),
+- top_n N: the N longest records,
+- min_length BP: records of at least BP bases (10000, 10kb, 1.5Mb),
+- coverage_pct X: the longest records that together hold X% of the bases.
+
+Lengths and headers come from the JSON of profile_fasta.py (--profile) when
+the FASTA was already profiled, otherwise from one twobit.prescan() pass;
+kept records stay in FASTA order. With --twobit the kept records are encoded straight into the
+2bit (twobit.encode_files(only=...)), with no filtered FASTA in between.
+The rule and the excluded records go into the seed Description
+(description()) and the build provenance (provenance()).
+
+Usage:
+    python3 scripts/select_sequences.py genome.fa --mode top_n --param 20 --kept kept.txt --json selection.json
+    python3 scripts/select_sequences.py genome.fa --mode min_length --param 1Mb --profile fasta_profile.json --kept kept.txt
+    python3 scripts/select_sequences.py genome.fa --mode chromosomes --assembly-report report.txt --twobit genome.2bit
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sys
+from pathlib import Path
+from typing import NamedTuple
+
+sys.path.insert(0, str(Path(__file__).parent))
+from forge_bsgenome import circ_seq_names
+from profile_fasta import canonical_json, sha512t24u
+from twobit import encode_files, prescan
+
+
+MODES = ("full", "chromosomes", "top_n", "min_length", "coverage_pct")
+# Excluded names are inlined into provenance up to this many; past it only
+# their count and digest are kept, like profile_fasta's sequence digests.
+EXCLUDED_LIMIT = 1000
+# Excluded names spelled out in the seed Description.
+DESCRIPTION_NAMES = 10
+LENGTH_UNITS = {"": 1, "bp": 1, "kb": 10 ** 3, "mb": 10 ** 6, "gb": 10 ** 9}
+ASSEMBLED_ROLE = "assembled-molecule"
+# Identifier columns of assembly_report.txt and fields of sequence_report.jsonl.
+REPORT_COLUMNS = ("Sequence-Name", "GenBank-Accn", "RefSeq-Accn", "UCSC-style-name")
+REPORT_FIELDS = ("sequenceName", "chrName", "genbankAccession", "refseqAccession", "ucscStyleName")
+CHROMOSOME_HEADER = re.compile(
+    r"\b(?:chromosome|linkage group)[\s:]+(?!un(?:known|placed)?\b)\w"
+    r"|\b(?:mitochondri(?:on|al)|chloroplast|plastid|apicoplast|kinetoplast)\b",
+    re.IGNORECASE,
+)
+NOT_CHROMOSOME_HEADER = re.compile(
+    r"\b(?:unplaced|unlocali[sz]ed|unknown|random|scaffold|contig|alternate|alt[-_ ]locus|patch|fix)\b",
+    re.IGNORECASE,
+)
+# UCSC-style names for headers that carry nothing else: chr1, chr2L, chrX, chrM, chrIV.
+CHROMOSOME_NAME = re.compile(r"chr(?:[0-9]+[A-Z]?|[XYZW]|M|MT|[IVX]+)", re.IGNORECASE)
+
+
+class Record(NamedTuple):
+    name: str
+    length: int
+    title: str
+
+
+def parse_param(mode: str, param: str | None) -> int | float | None:
+    """The numeric parameter of `mode`; ValueError if it is missing or out of range."""
+    if mode not in MODES:
+        raise ValueError(f"unknown build mode {mode!r}; expected one of {', '.join(MODES)}")
+    if mode in ("full", "chromosomes"):
+        return None
+    text = str(param or "").strip().lower().replace(",", "").replace("_", "")
+    if not text:
+        raise ValueError(f"build mode {mode} needs a parameter")
+    try:
+        if mode == "top_n":
+            value = int(text)
+        elif mode == "min_length":
+            number, unit = re.fullmatch(r"([0-9.]+)\s*([a-z]*)", text).groups()
+            value = int(float(number) * LENGTH_UNITS[unit])
+        else:
+            value = float(text.rstrip("%"))
+    except (AttributeError, KeyError, ValueError):
+        raise ValueError(f"invalid {mode} parameter {param!r}") from None
+    if value <= 0 or (mode == "coverage_pct" and value > 100):
+        raise ValueError(f"{mode} parameter {param!r} is out of range")
+    return value
+
+
+def read_assembly_report(path: Path) -> set[str]:
+    """Every identifier (name, accessions, UCSC name) of the assembled molecules in an NCBI sequence report."""
+    names: set[str] = set()
+    with path.open(encoding="utf-8") as handle:
+        if path.suffix == ".jsonl":
+            for line in handle:
+                if line.strip():
+                    row = json.loads(line)
+                    if row.get("role") == ASSEMBLED_ROLE:
+                        names.update(str(row[field]) for field in REPORT_FIELDS if row.get(field))
+            return names
+        columns: list[str] = []
+        for line in handle:
+            fields = line.rstrip("\r\n").split("\t")
+            if line.startswith("#"):
+                if "Sequence-Role" in line:
+                    columns = [field.lstrip("# ").strip() for field in fields]
+                continue
+            row = dict(zip(columns, fields))
+            if row.get("Sequence-Role") == ASSEMBLED_ROLE:
+                names.update(row[column] for column in REPORT_COLUMNS if row.get(column) not in (None, "", "na"))
+    if not columns:
+        raise ValueError(f"{path} is not an NCBI assembly report")
+    return names
+
+
+def is_chromosome(record: Record) -> bool:
+    """Header heuristic: the record names a chromosome or organelle and is not an unplaced piece."""
+    if NOT_CHROMOSOME_HEADER.search(record.title):
+        return False
+    return bool(CHROMOSOME_HEADER.search(record.title) or CHROMOSOME_NAME.fullmatch(record.name))
+
+
+def records_from_scans(scans: list[dict]) -> list[Record]:
+    """Records of twobit.prescan() results, in input order."""
+    return [
+        Record(name, length, title)
+        for scan in scans
+        for (name, _), length, title in zip(scan["headers"], scan["lengths"], scan["titles"])
+    ]
+
+
+def records_from_profile(profile: dict) -> list[Record]:
+    """Records of a profile_fasta.py result, in FASTA order."""
+    if "titles" not in profile:
+        raise ValueError("the FASTA profile has no header lines; re-run profile_fasta.py")
+    return [Record(row[0], row[1], title) for row, title in zip(profile["composition_counts"], profile["titles"])]
+
+
+def select(records: list[Record], mode: str, param=None, assembled: set[str] | None = None) -> dict:
+    """Apply a build mode to the records; the kept and excluded names stay in FASTA order."""
+    value = parse_param(mode, param)
+    by_length = sorted(range(len(records)), key=lambda i: -records[i].length)
+    if mode == "full":
+        keep = set(range(len(records)))
+        rule = "full"
+    elif mode == "chromosomes":
+        if assembled is not None:
+            keep = {i for i, record in enumerate(records) if record.name in assembled}
+            rule = "chromosomes (assembled molecules of the assembly report)"
+        else:
+            keep = {i for i, record in enumerate(records) if is_chromosome(record)}
+            rule = "chromosomes (chromosome and organelle headers)"
+        if not keep:
+            raise ValueError("no chromosome-level sequences found; pass an assembly report or use another build mode")
+    elif mode == "top_n":
+        keep = set(by_length[:value])
+        rule = f"top_n={value} (the {value:,} longest sequences)"
+    elif mode == "min_length":
+        keep = {i for i, record in enumerate(records) if record.length >= value}
+        rule = f"min_length={value} (sequences of at least {value:,} bp)"
+    else:
+        target = sum(record.length for record in records) * value / 100
+        keep, covered = set(), 0
+        for i in by_length:
+            if covered >= target:
+                break
+            keep.add(i)
+            covered += records[i].length
+        rule = f"coverage_pct={value:g} (the longest sequences covering {value:g}% of the bases)"
+    if not keep:
+        raise ValueError(f"build mode {rule} keeps no sequences")
+    kept = [record.name for i, record in enumerate(records) if i in keep]
+    excluded = [record.name for i, record in enumerate(records) if i not in keep]
+    return {
+        "mode": mode,
+        "param": value,
+        "rule": rule,
+        "kept": kept,
+        "excluded": excluded,
+        "seq_count": len(records),
+        "total_bases": sum(record.length for record in records),
+        "kept_bases": sum(records[i].length for i in keep),
+        "kept_digest": sha512t24u(canonical_json(kept)),
+    }
+
+
+def select_files(
+    fastas: list[Path],
+    mode: str,
+    param=None,
+    assembly_report: Path | None = None,
+    profile: Path | None = None,
+) -> tuple[dict, list[dict]]:
+    """Select from the FASTA files; also returns the scans for encode_files().
+
+    With `profile` (the --json of profile_fasta.py over the same FASTA) the
+    records come from it and nothing is scanned, so the scans are empty.
+    """
+    assembled = read_assembly_report(assembly_report) if assembly_report and mode == "chromosomes" else None
+    parse_param(mode, param)
+    if profile:
+        if len(fastas) != 1:
+            raise ValueError("--profile describes a single FASTA")
+        records = records_from_profile(json.loads(profile.read_text(encoding="utf-8")))
+        return select(records, mode, param, assembled), []
+    scans = [prescan(fasta) for fasta in fastas]
+    return select(records_from_scans(scans), mode, param, assembled), scans
+
+
+def provenance(selection: dict, limit: int = EXCLUDED_LIMIT) -> dict:
+    """The provenance form of a selection: excluded names inlined up to `limit`, always counted and digested."""
+    excluded = selection["excluded"]
+    result = {key: selection[key] for key in ("mode", "param", "rule", "seq_count", "total_bases", "kept_bases", "kept_digest")}
+    result["kept_count"] = len(selection["kept"])
+    result["excluded_count"] = len(excluded)
+    result["excluded_digest"] = sha512t24u(canonical_json(excluded))
+    if len(excluded) <= limit:
+        result["excluded"] = excluded
+    return result
+
+
+def description(selection: dict, names: int = DESCRIPTION_NAMES) -> str:
+    """One sentence for the seed Description: the rule, what it kept and which sequences it left out."""
+    kept, excluded = selection["kept"], selection["excluded"]
+    share = 100 * selection["kept_bases"] / selection["total_bases"] if selection["total_bases"] else 100
+    text = (f"Build mode {selection['rule']}: {len(kept):,} of {selection['seq_count']:,} sequences kept, "
+            f"{share:.2f}% of {selection['total_bases']:,} bases")
+    if excluded:
+        listed = ", ".join(excluded[:names])
+        more = f" and {len(excluded) - names:,} more" if len(excluded) > names else ""
+        text += f"; excluded: {listed}{more}"
+    return text + "."
+
+
+def kept_circ_seqs(circ_seqs: str, kept: list[str]) -> str:
+    """The circ_seqs R value without the sequences the selection dropped (unchanged if it is not a literal)."""
+    names = circ_seq_names(circ_seqs)
+    if names is None:
+        return circ_seqs
+    kept_set = set(kept)
+    names = [name for name in names if name in kept_set]
+    return "c(" + ", ".join(json.dumps(name) for name in names) + ")" if names else "character(0)"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", 1)[0])
+    parser.add_argument("fastas", type=Path, nargs="+")
+    parser.add_argument("--mode", choices=MODES, default="full")
+    parser.add_argument("--param", default=None, help="N for top_n, bp for min_length, percent for coverage_pct.")
+    parser.add_argument("--assembly-report", type=Path, default=None,
+                        help="NCBI assembly_report.txt or sequence_report.jsonl for chromosomes mode.")
+    parser.add_argument("--profile", type=Path, default=None,
+                        help="profile_fasta.py --json output for the same FASTA; read instead of scanning it.")
+    parser.add_argument("--twobit", type=Path, default=None, help="Encode the kept sequences into this 2bit.")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Encoding processes for --twobit.")
+    parser.add_argument("--kept", type=Path, default=None, help="Write the kept names here, one per line (twobit.py --only).")
+    parser.add_argument("--json", type=Path, default=None)
+    args = parser.parse_args()
+
+    try:
+        selection, scans = select_files(args.fastas, args.mode, args.param, args.assembly_report, args.profile)
+        if args.kept:
+            args.kept.write_text("".join(name + "\n" for name in selection["kept"]), encoding="utf-8")
+        if args.twobit:
+            headers = {fasta: scan["headers"] for fasta, scan in zip(args.fastas, scans)}
+            encode_files(args.fastas, args.twobit, max(args.jobs, 1), headers=headers, only=set(selection["kept"]))
+    except (OSError, ValueError) as exc:
+        print(f"ERROR: cannot select sequences: {exc}", file=sys.stderr)
+        return 1
+
+    result = {**provenance(selection), "description": description(selection)}
+    text = json.dumps(result, sort_keys=True)
+    print(text)
+    if args.json:
+        args.json.write_text(text + "\n", encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
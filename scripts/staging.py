@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""Pick how to stage a genome build so its peak disk use fits the free space.
+
+A build holds some of the FASTA (maybe gzip-compressed), the 2bit, the
+package tree and the tarball on disk at once. How many of them coexist
+depends on the staging choices:
+
+- whether a .gz is read compressed (stream) or inflated to disk first,
+- whether the 2bit is encoded in shards (part files plus the merged 2bit),
+- whether inputs are deleted as soon as they are consumed,
+- whether the 2bit gets into the package by rename, hardlink, reflink or copy.
+
+Every combination is costed from the input sizes, and the cheapest plan that
+fits the measured free space is chosen, keeping sharded encoding while it
+fits. When nothing fits the build is refused up front with the estimate
+instead of failing hours later with a full disk.
+
+Usage:
+    python3 scripts/staging.py genome.fa.gz [--workdir .] [--jobs 4] [--consume] [--json plan.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import errno
+import itertools
+import json
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from typing import NamedTuple
+
+sys.path.insert(0, str(Path(__file__).parent))
+from gzip_stream import is_gzip
+
+
+# Assumed FASTA compression ratio; a .gz is sized before it is read.
+GZIP_RATIO = 4
+# 2bit bytes per FASTA byte (four bases a byte, headers and newlines ignored).
+TWOBIT_RATIO = 0.25
+# gzip barely shrinks 2bit data, so the tarball is about as big as the 2bit.
+TARBALL_RATIO = 1.0
+# Disk left untouched for logs, R and the package tree's small files.
+HEADROOM = 512 * 1024 ** 2
+# Cheapest first; rename consumes the source.
+PLACEMENTS = ("rename", "hardlink", "reflink", "copy")
+FICLONE = 0x40049409
+
+
+class Inputs(NamedTuple):
+    plain_bytes: int
+    gzip_bytes: int
+    files: int
+
+    @property
+    def on_disk(self) -> int:
+        return self.plain_bytes + self.gzip_bytes
+
+    @property
+    def fasta_bytes(self) -> int:
+        return self.plain_bytes + self.gzip_bytes * GZIP_RATIO
+
+
+class Plan(NamedTuple):
+    decompress: str
+    encode_jobs: int
+    consume: bool
+    placement: str
+    peak_bytes: int
+
+    def as_dict(self) -> dict:
+        return self._asdict()
+
+
+def measure(fastas: list[Path]) -> Inputs:
+    plain = gz = 0
+    for fasta in fastas:
+        if is_gzip(fasta):
+            gz += fasta.stat().st_size
+        else:
+            plain += fasta.stat().st_size
+    return Inputs(plain, gz, len(fastas))
+
+
+def peak_disk(inputs: Inputs, decompress: str, encode_jobs: int, consume: bool, placement: str) -> int:
+    """Bytes on disk at the worst moment of the build, inputs included."""
+    twobit = int(inputs.fasta_bytes * TWOBIT_RATIO)
+    tarball = int(twobit * TARBALL_RATIO)
+    inflated = inputs.gzip_bytes * GZIP_RATIO
+    on_disk = inputs.on_disk
+    phases = []
+    if decompress == "inflate" and inputs.gzip_bytes:
+        phases.append(on_disk + inflated)
+        on_disk = inputs.plain_bytes + inflated if consume else on_disk + inflated
+    # Shards are merged into the 2bit, several inputs likewise, and a gzip
+    # stream goes through the side file of a deferred index: two copies.
+    streamed = inputs.gzip_bytes and decompress == "stream"
+    single_pass = encode_jobs == 1 and inputs.files == 1 and not streamed
+    phases.append(on_disk + twobit * (1 if single_pass else 2))
+    if consume:
+        on_disk = 0
+    placed = twobit * (2 if placement == "copy" else 1)
+    phases.append(on_disk + placed)
+    if placement == "copy" and consume:
+        placed = twobit
+    phases.append(on_disk + placed + tarball)
+    return max(phases)
+
+
+def placements(workdir: Path) -> list[str]:
+    """The methods that can place the 2bit staged in `workdir` into a package there, cheapest first."""
+    works = ["rename", "copy"]
+    with tempfile.TemporaryDirectory(dir=workdir, prefix=".staging-") as tmp:
+        probe = Path(tmp) / "probe"
+        probe.write_bytes(b"probe")
+        for method in ("hardlink", "reflink"):
+            try:
+                place(probe, Path(tmp) / method, (method,))
+                works.append(method)
+            except OSError:
+                pass
+    return [method for method in PLACEMENTS if method in works]
+
+
+def plans(inputs: Inputs, jobs: int, consume: bool, methods: list[str], inflate: bool = True) -> list[Plan]:
+    """Every staging plan, in order of preference: sharded encoding first, then least disk."""
+    options = itertools.product(
+        ("stream", "inflate") if inputs.gzip_bytes and inflate else ("stream",),
+        sorted({jobs, 1}, reverse=True),
+        (True, False) if consume else (False,),
+        methods,
+    )
+    # Renaming consumes the staged 2bit, so it only comes with consume.
+    candidates = [Plan(*option, peak_disk(inputs, *option)) for option in options
+                  if option[3] != "rename" or option[2]]
+    return sorted(candidates, key=lambda plan: (
+        plan.encode_jobs != jobs, plan.peak_bytes, PLACEMENTS.index(plan.placement),
+        plan.decompress != "stream", plan.consume,
+    ))
+
+
+def choose(fastas: list[Path], workdir: Path, jobs: int = 1, consume: bool = False,
+           free: int | None = None, inflate: bool = True) -> tuple[Plan | None, dict]:
+    """The preferred plan that fits the free space in `workdir` (None if none does) and the figures behind it.
+
+    `inflate` is False for a caller that always streams a .gz and never inflates it first.
+    """
+    inputs = measure(fastas)
+    free = shutil.disk_usage(workdir).free if free is None else free
+    candidates = plans(inputs, max(1, jobs), consume, placements(workdir), inflate)
+    chosen = next((plan for plan in candidates
+                   if plan.peak_bytes - inputs.on_disk + HEADROOM <= free), None)
+    least = min(candidates, key=lambda plan: plan.peak_bytes)
+    figures = {
+        "input_bytes": inputs.on_disk,
+        "free_bytes": free,
+        "required_bytes": (chosen or least).peak_bytes - inputs.on_disk + HEADROOM,
+        "fits": chosen is not None,
+    }
+    return chosen, figures
+
+
+def place(src: Path, dst: Path, methods: tuple[str, ...] = ("hardlink", "reflink", "copy")) -> str:
+    """Put `src` at `dst` with the first of `methods` that works and return it.
+
+    rename consumes `src`; hardlink and reflink share its blocks; copy is the
+    fallback where neither is possible (another filesystem, FAT, no CoW).
+    """
+    error: OSError | None = None
+    for method in methods:
+        try:
+            if method == "rename":
+                os.rename(src, dst)
+            elif method == "hardlink":
+                os.link(src, dst)
+            elif method == "reflink":
+                _reflink(src, dst)
+            elif method == "copy":
+                shutil.copyfile(src, dst)
+            else:
+                raise ValueError(f"unknown placement {method}")
+            return method
+        except OSError as exc:
+            error = exc
+    raise error or OSError(errno.EINVAL, "no placement method given")
+
+
+def _reflink(src: Path, dst: Path) -> None:
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError(errno.EOPNOTSUPP, "reflinks need fcntl") from None
+    try:
+        with src.open("rb") as source, dst.open("xb") as target:
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+    except OSError:
+        dst.unlink(missing_ok=True)
+        raise
+
+
+def gigabytes(size: int) -> str:
+    return f"{size / 1024 ** 3:.1f} GB"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", 1)[0])
+    parser.add_argument("fastas", type=Path, nargs="+")
+    parser.add_argument("--workdir", type=Path, default=Path("."))
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Encoding processes (default: all cores).")
+    parser.add_argument("--consume", action="store_true",
+                        help="Inputs may be deleted once used (the FASTA after encoding, a staged 2bit once placed).")
+    parser.add_argument("--json", type=Path, default=None)
+    args = parser.parse_args()
+
+    try:
+        plan, figures = choose(args.fastas, args.workdir, args.jobs, args.consume)
+    except OSError as exc:
+        print(f"ERROR: cannot plan staging: {exc}", file=sys.stderr)
+        return 1
+
+    result = {**(plan.as_dict() if plan else {}), **figures}
+    text = json.dumps(result, sort_keys=True)
+    print(text)
+    if args.json:
+        args.json.write_text(text + "\n", encoding="utf-8")
+    if plan is None:
+        print(f"ERROR: the build needs about {gigabytes(figures['required_bytes'])} of disk "
+              f"at its peak, but only {gigabytes(figures['free_bytes'])} is free in {args.workdir}",
+              file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
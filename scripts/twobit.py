@@ -0,0 +1,1090 @@
+#!/usr/bin/env python3
+"""Write and read UCSC .2bit files without the kent binaries.
+
+`encode` reads a FASTA file in one streaming pass and writes the same bytes
+faToTwoBit would: names are the first word of each header, non-letters are
+dropped, unknown IUPAC letters become N/n, runs of N are stored as N-blocks
+and runs of lower case as mask blocks. Sequences with no bases are skipped
+with a warning. The 64-bit index layout (faToTwoBit -long) is chosen
+automatically when a record would start past 4 GiB, which is when faToTwoBit
+stops with "index overflow" unless given -long.
+
+Memory stays bounded: packed bases of the current record are spooled to a
+temporary file, and only block coordinates are kept in memory.
+
+`encode --jobs N` splits the input on record boundaries, encodes the shards
+in a process pool and merges them; several FASTA files (e.g. one per
+chromosome) are combined into one 2bit the same way. `merge` concatenates
+existing 2bit files and rewrites the index. `verify` reads a 2bit back through
+mmap and checks it against the FASTA, either by per-sequence digests or, with
+a .fai, by sampled ranges.
+
+gzip-compressed FASTA files are read through gzip_stream.py without being
+decompressed to disk. Their record names are only known once the stream has
+been read, so records are written to a side file and the index is put in
+front of them afterwards; each compressed file is one shard.
+
+`prescan` profiles a FASTA ahead of time (e.g. while autoBSgenome.py is
+still asking questions): record names, offsets, largest sequence and whether
+the 64-bit index is needed. Its headers spare encode_files() the header pass,
+and for gzip input the side file as well.
+
+`only` (encode --only NAMES) restricts the 2bit to a subset of the records,
+e.g. the ones select_sequences.py keeps for a build mode; the others are read
+past and never written, so no filtered FASTA is needed.
+
+Usage:
+    python3 scripts/twobit.py encode genome.fa genome.2bit [--fai genome.fa.fai]
+    python3 scripts/twobit.py encode --jobs 4 chr*.fa genome.2bit
+    python3 scripts/twobit.py encode genome.fa.gz genome.2bit
+    python3 scripts/twobit.py encode genome.fa genome.2bit --only kept.txt
+    python3 scripts/twobit.py merge genome.2bit part1.2bit part2.2bit
+    python3 scripts/twobit.py verify genome.2bit genome.fa --fai genome.fa.fai --sample 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import hashlib
+import json
+import math
+import mmap
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, NamedTuple
+
+sys.path.insert(0, str(Path(__file__).parent))
+from gzip_stream import is_gzip, read_blocks
+from validate_fasta import BLOCK_SIZE, FastaScanner, scan_file
+
+
+# Part of the artifact cache key of every 2bit; bump it whenever encode()
+# would write different bytes for the same FASTA.
+ENCODER_VERSION = 2
+SIGNATURE = 0x1A412743
+UINT32_MAX = 0xFFFFFFFF
+MAX_NAME = 255
+CHUNK_BASES = 1024 * 1024
+SPOOL_SIZE = 64 * 1024 * 1024
+# Parallel encoding cuts the input into about SHARDS_PER_JOB shards per
+# worker so one long chromosome does not leave the other workers idle.
+SHARDS_PER_JOB = 4
+MIN_SHARD = 32 * 1024 * 1024
+# verify --sample compares ranges of this many bases.
+SAMPLE_BASES = 4096
+
+LETTERS = bytes(range(ord("A"), ord("Z") + 1)) + bytes(range(ord("a"), ord("z") + 1))
+NON_LETTERS = bytes(c for c in range(256) if c not in LETTERS)
+
+
+def _table(mapping: dict[int, int], default: int = 0) -> bytes:
+    return bytes(mapping.get(c, default) for c in range(256))
+
+
+# faToTwoBit's unknownToN(): letters outside ACGTNU keep their case as N/n.
+UNKNOWN_TO_N = _table(
+    {c: c if c in b"ACGTNUacgtnu" else ord("N" if c < ord("a") else "n") for c in LETTERS}
+)
+# Upper-case letters become b"A" and lower-case b"a", so soft-masked runs can
+# be found with bytes.find() instead of a per-base loop.
+CASE_CLASS = _table({c: ord("a" if c >= ord("a") else "A") for c in LETTERS}, ord("A"))
+N_CLASS = _table({ord("N"): ord("n"), ord("n"): ord("n")}, ord("A"))
+# 2-bit codes T=0, C=1, A=2, G=3; anything else (N, U) packs as T.
+PACK_TABLES = [
+    _table({c: code << shift for c, code in zip(b"TCAGtcag", (0, 1, 2, 3) * 2)})
+    for shift in (6, 4, 2, 0)
+]
+DECODE_TABLES = [bytes(b"TCAG"[(c >> shift) & 3] for c in range(256)) for shift in (6, 4, 2, 0)]
+# What a FASTA base reads back as from 2bit: U packs as T.
+EXPECTED_BASES = UNKNOWN_TO_N.replace(b"U", b"T").replace(b"u", b"t")
+
+
+def sequence_name(header: bytes) -> str:
+    parts = header.split(None, 1)
+    if not parts:
+        raise ValueError("expecting sequence name after '>'")
+    name = parts[0].decode("utf-8", errors="replace")
+    if len(parts[0]) > MAX_NAME:
+        raise ValueError(f"name {name} too long")
+    return name
+
+
+def pack_bases(seq: bytes) -> bytes:
+    """Pack bases four per byte, first base in the high bits."""
+    if len(seq) % 4:
+        seq += b"T" * (4 - len(seq) % 4)
+    value = 0
+    for phase, table in enumerate(PACK_TABLES):
+        value |= int.from_bytes(seq[phase::4].translate(table), "big")
+    return value.to_bytes(len(seq) // 4, "big")
+
+
+def find_runs(classes: bytes, mark: bytes, other: bytes) -> list[tuple[int, int]]:
+    runs = []
+    pos = classes.find(mark)
+    while pos >= 0:
+        end = classes.find(other, pos)
+        if end < 0:
+            end = len(classes)
+        runs.append((pos, end))
+        pos = classes.find(mark, end)
+    return runs
+
+
+class Blocks:
+    """Start/size arrays of one block list, merged across chunk boundaries."""
+
+    def __init__(self) -> None:
+        self.starts = array("I")
+        self.sizes = array("I")
+        self._end = -1
+
+    def add(self, offset: int, runs: list[tuple[int, int]]) -> None:
+        for start, end in runs:
+            start += offset
+            end += offset
+            if start == self._end:
+                self.sizes[-1] += end - start
+            else:
+                self.starts.append(start)
+                self.sizes.append(end - start)
+            self._end = end
+
+    def to_bytes(self) -> bytes:
+        starts, sizes = self.starts, self.sizes
+        if sys.byteorder != "little":
+            starts, sizes = array("I", starts), array("I", sizes)
+            starts.byteswap()
+            sizes.byteswap()
+        return struct.pack("<I", len(starts)) + starts.tobytes() + sizes.tobytes()
+
+
+class SequenceEncoder:
+    """Incremental encoder for one 2bit record.
+
+    add() takes sequence bytes in any chunking; the packed DNA is written to `sink`
+    and header() returns the record header that must precede it.
+    """
+
+    def __init__(self, sink: BinaryIO) -> None:
+        self.sink = sink
+        self.size = 0
+        self.n_blocks = Blocks()
+        self.mask_blocks = Blocks()
+        self._buffer = bytearray()
+
+    def add(self, raw: bytes) -> None:
+        """Append raw sequence bytes; newlines and other non-letters are dropped."""
+        self._buffer += raw.translate(UNKNOWN_TO_N, NON_LETTERS)
+        if len(self._buffer) < CHUNK_BASES:
+            return
+        data = bytes(self._buffer)
+        cut = len(data) & ~3
+        for start in range(0, cut, CHUNK_BASES):
+            self._encode(data[start:min(start + CHUNK_BASES, cut)])
+        self._buffer = bytearray(data[cut:])
+
+    def finish(self) -> None:
+        if self._buffer:
+            self._encode(bytes(self._buffer))
+            self._buffer.clear()
+        if self.size > UINT32_MAX:
+            raise ValueError("sequence is longer than the 2bit format allows")
+
+    def header(self) -> bytes:
+        return (
+            struct.pack("<I", self.size)
+            + self.n_blocks.to_bytes()
+            + self.mask_blocks.to_bytes()
+            + struct.pack("<I", 0)
+        )
+
+    def record_size(self) -> int:
+        blocks = len(self.n_blocks.starts) + len(self.mask_blocks.starts)
+        return 16 + 8 * blocks + (self.size + 3) // 4
+
+    def _encode(self, chunk: bytes) -> None:
+        if b"N" in chunk or b"n" in chunk:
+            self.n_blocks.add(self.size, find_runs(chunk.translate(N_CLASS), b"n", b"A"))
+        if not chunk.isupper():
+            self.mask_blocks.add(self.size, find_runs(chunk.translate(CASE_CLASS), b"a", b"A"))
+        self.sink.write(pack_bases(chunk))
+        self.size += len(chunk)
+
+
+class _Relayout(Exception):
+    """The reserved index does not match the records actually written."""
+
+    def __init__(self, names: list[str], long: bool) -> None:
+        super().__init__()
+        self.names = names
+        self.long = long
+
+
+class TwoBitWriter(FastaScanner):
+    """FastaScanner that encodes every record into an open .2bit file.
+
+    The header and index are reserved up front from `names` and filled in by
+    close(); if the records turn out different (skipped empty sequences, a
+    change of index width) close() raises _Relayout so the caller can retry.
+    With names=None nothing is reserved: `out` receives only the records and
+    the caller writes the index from `written` and `sizes`, choosing the
+    width with needs_long(). Records whose name is not in `only` (when
+    given) are read past without being encoded.
+    `part` marks one shard of a larger input, which may hold no bases.
+    """
+
+    def __init__(
+        self,
+        out: BinaryIO,
+        names: list[str] | None,
+        long: bool = False,
+        auto_long: bool = True,
+        only: set[str] | None = None,
+        part: bool = False,
+    ) -> None:
+        super().__init__()
+        self.require_bases = not part
+        self.out = out
+        self.names = names
+        self.long = long
+        self.auto_long = auto_long
+        self.only = only
+        self.written: list[tuple[str, int]] = []
+        self.sizes: list[int] = []
+        self.skipped: list[str] = []
+        self._seen: set[str] = set()
+        self._name = ""
+        self._encoder: SequenceEncoder | None = None
+        self._spool: BinaryIO | None = None
+        self._data_size = 0
+        self._index32 = index_size(names, False) if names is not None else 0
+        out.seek(index_size(names, long) if names is not None else 0)
+
+    def start_record(self, header: bytes, offset: int) -> None:
+        self._name = sequence_name(header)
+        if self.only is not None and self._name not in self.only:
+            return
+        self._spool = tempfile.SpooledTemporaryFile(SPOOL_SIZE, dir=_spool_dir(self.out))
+        self._encoder = SequenceEncoder(self._spool)
+
+    def sequence(self, raw: bytes, offset: int) -> None:
+        if self._encoder is not None:
+            self._encoder.add(raw)
+
+    def end_record(self, length: int) -> None:
+        encoder, spool = self._encoder, self._spool
+        if encoder is None:
+            return
+        self._encoder = self._spool = None
+        try:
+            encoder.finish()
+            if encoder.size == 0:
+                self.skipped.append(self._name)
+                return
+            if self._name in self._seen:
+                raise ValueError(f"duplicate sequence name {self._name}")
+            self._seen.add(self._name)
+            # needs_long() one record at a time, against the reserved index.
+            if (
+                self.names is not None
+                and not self.long
+                and self._index32 + self._data_size > UINT32_MAX
+            ):
+                if not self.auto_long:
+                    raise ValueError(
+                        f"index overflow at {self._name}; the 2bit format needs the 64-bit (long) layout"
+                    )
+                raise _Relayout(self.names, True)
+            size = encoder.record_size()
+            self._data_size += size
+            self.sizes.append(size)
+            self.written.append((self._name, self.out.tell()))
+            self.out.write(encoder.header())
+            spool.seek(0)
+            shutil.copyfileobj(spool, self.out)
+        finally:
+            spool.close()
+
+    def close(self) -> None:
+        if self.names is None:
+            return
+        names = [name for name, _ in self.written]
+        long = needs_long(list(zip(names, self.sizes))) if self.auto_long else self.long
+        if names != self.names or long != self.long:
+            raise _Relayout(names, long)
+        self.out.seek(0)
+        self.out.write(index_bytes(self.written, self.long))
+
+
+def index_size(names: list[str], long: bool) -> int:
+    width = 8 if long else 4
+    return 16 + sum(1 + len(name.encode("utf-8")) + width for name in names)
+
+
+def needs_long(records: list[tuple[str, int]]) -> bool:
+    """Whether (name, record size) pairs, in file order, need the 64-bit index.
+
+    This is faToTwoBit's overflow test: with the 32-bit index, every record
+    must start at an offset below 4 GiB, counting the header and index in
+    front of it. Where the last record ends does not matter.
+    """
+    offset = index_size([name for name, _ in records], False)
+    for _, size in records:
+        if offset > UINT32_MAX:
+            return True
+        offset += size
+    return False
+
+
+def index_bytes(records: list[tuple[str, int]], long: bool) -> bytes:
+    parts = [struct.pack("<IIII", SIGNATURE, 1 if long else 0, len(records), 0)]
+    fmt = "<Q" if long else "<I"
+    for name, offset in records:
+        raw = name.encode("utf-8")
+        parts.append(bytes([len(raw)]) + raw + struct.pack(fmt, offset))
+    return b"".join(parts)
+
+
+def read_fai_names(path: Path) -> list[str]:
+    with path.open(encoding="utf-8") as handle:
+        return [line.split("\t", 1)[0] for line in handle if line.strip()]
+
+
+def read_names(path: Path) -> set[str]:
+    """Sequence names listed one per line (the first word of each line)."""
+    with path.open(encoding="utf-8") as handle:
+        return {line.split(None, 1)[0] for line in handle if line.strip()}
+
+
+def scan_headers(path: Path) -> list[tuple[str, int]]:
+    """Collect (name, offset of '>') for every header with a find()-only pass."""
+    headers = []
+    tail = b"\n"
+    base = -1
+    with path.open("rb") as handle:
+        while True:
+            block = handle.read(BLOCK_SIZE)
+            if not block:
+                break
+            data = tail + block
+            pos = data.find(b"\n>")
+            while pos >= 0:
+                eol = data.find(b"\n", pos + 1)
+                if eol < 0:
+                    break
+                parts = data[pos + 2:eol].split(None, 1)
+                name = parts[0].decode("utf-8", errors="replace") if parts else ""
+                headers.append((name, base + pos + 1))
+                pos = data.find(b"\n>", eol)
+            # Keep an unfinished header line for the next block.
+            keep = pos if pos >= 0 else len(data) - 1
+            tail = data[keep:]
+            base += keep
+    return headers
+
+
+class _LayoutScanner(FastaScanner):
+    """Record names, '>' offsets, header lines and lengths plus an estimate of the 2bit size, in one validating pass."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.headers: list[tuple[str, int]] = []
+        self.titles: list[str] = []
+        self.lengths: list[int] = []
+        self.records: list[tuple[str, int]] = []
+
+    def start_record(self, header: bytes, offset: int) -> None:
+        self.headers.append((sequence_name(header), offset))
+        self.titles.append(header.strip().decode("utf-8", errors="replace"))
+
+    def end_record(self, length: int) -> None:
+        self.lengths.append(length)
+        # N and mask blocks are not counted, so this is a lower bound.
+        if length:
+            self.records.append((self.headers[-1][0], 16 + (length + 3) // 4))
+
+
+def prescan(fasta: Path, stop: threading.Event | None = None) -> dict | None:
+    """Profile `fasta` ahead of encoding; None if `stop` is set before the scan ends.
+
+    `headers` can be handed to encode_files() in place of its own header
+    pass. `records` pairs each non-empty record with a lower bound of its
+    2bit size, and `long` is needs_long() of them: True when the 2bit
+    certainly needs the 64-bit index. `titles` (header lines) and `lengths`
+    line up with `headers`, for select_sequences.py. `size` and `mtime_ns` tell whether the file changed since.
+    """
+    info = fasta.stat()
+    scanner = _LayoutScanner()
+    for block in read_blocks(fasta, BLOCK_SIZE, jobs=1):
+        if stop is not None and stop.is_set():
+            return None
+        scanner.feed(block)
+    stats = scanner.finish()
+    return {
+        "path": str(fasta),
+        "size": info.st_size,
+        "mtime_ns": info.st_mtime_ns,
+        "seq_count": stats["seq_count"],
+        "total_bases": stats["total_bases"],
+        "longest_seq": stats["longest_seq"],
+        "headers": scanner.headers,
+        "titles": scanner.titles,
+        "lengths": scanner.lengths,
+        "records": scanner.records,
+        "long": needs_long(scanner.records),
+    }
+
+
+def encode(
+    fasta: Path,
+    twobit: Path,
+    names: list[str] | None = None,
+    long: bool | None = None,
+    start: int = 0,
+    end: int | None = None,
+    only: set[str] | None = None,
+    part: bool = False,
+) -> dict:
+    """Convert `fasta` (or its bytes [start, end)) to `twobit`.
+
+    `names` is the expected record order (e.g. from a .fai); it only saves a
+    second layout pass when correct. `long=None` picks the index width
+    automatically, True/False force faToTwoBit -long / the 32-bit layout.
+    `only` keeps just the records with these names. A `part` of a larger
+    input may hold only empty records; the caller checks the combined total.
+    """
+    deferred = names is None and is_gzip(fasta)
+    if names is None and not deferred:
+        names = [name for name, offset in scan_headers(fasta) if start <= offset < (end or math.inf)]
+    if names is not None and only is not None:
+        names = [name for name in names if name in only]
+    use_long = bool(long)
+    tmp = twobit.with_name(twobit.name + ".tmp")
+    try:
+        if deferred:
+            writer, stats = _encode_deferred(fasta, tmp, use_long, long is None, only, part)
+            use_long = writer.long
+        else:
+            for _ in range(3):
+                with tmp.open("w+b") as out:
+                    writer = TwoBitWriter(out, names, use_long, auto_long=long is None, only=only, part=part)
+                    try:
+                        stats = scan_file(fasta, writer, start=start, end=end)
+                        writer.close()
+                    except _Relayout as relayout:
+                        names, use_long = relayout.names, relayout.long
+                        continue
+                break
+            else:
+                raise RuntimeError("2bit layout did not converge")
+        os.replace(tmp, twobit)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    for name in writer.skipped:
+        print(f"WARNING: skipped item {name} which has no sequence.", file=sys.stderr)
+    return {
+        "seq_count": len(writer.written),
+        "skipped": writer.skipped,
+        "long": use_long,
+        "fasta_bases": stats["total_bases"],
+        "twobit_size": twobit.stat().st_size,
+    }
+
+
+def _encode_deferred(
+    fasta: Path, tmp: Path, long: bool, auto_long: bool, only: set[str] | None = None, part: bool = False
+) -> tuple[TwoBitWriter, dict]:
+    records = tmp.with_name(tmp.name + ".records")
+    try:
+        with records.open("w+b") as spool:
+            writer = TwoBitWriter(spool, None, long, auto_long, only, part)
+            stats = scan_file(fasta, writer)
+            if needs_long(list(zip([name for name, _ in writer.written], writer.sizes))) and not writer.long:
+                if not auto_long:
+                    raise ValueError("index overflow; the 2bit format needs the 64-bit (long) layout")
+                writer.long = True
+            start = index_size([name for name, _ in writer.written], writer.long)
+            with tmp.open("wb") as out:
+                out.write(index_bytes([(name, start + offset) for name, offset in writer.written], writer.long))
+                spool.seek(0)
+                shutil.copyfileobj(spool, out, BLOCK_SIZE)
+    finally:
+        records.unlink(missing_ok=True)
+    return writer, stats
+
+
+def merge(parts: list[Path], twobit: Path, long: bool | None = None) -> dict:
+    """Concatenate 2bit files into one, rewriting the header and index.
+
+    Record bytes never hold absolute offsets, so they are copied unchanged
+    and the result equals a single faToTwoBit run over the same sequences.
+    """
+    names: list[str] = []
+    sizes: list[int] = []
+    spans: list[tuple[Path, int, int]] = []
+    for part in parts:
+        with TwoBitFile(part) as reader:
+            if reader.byte_order != "<":
+                raise ValueError(f"{part} is big-endian; only little-endian 2bit files can be merged")
+            index = list(reader.index.items())
+            file_size = reader.file_size
+        for i, (name, offset) in enumerate(index):
+            names.append(name)
+            sizes.append((index[i + 1][1] if i + 1 < len(index) else file_size) - offset)
+        if index:
+            spans.append((part, index[0][1], file_size - index[0][1]))
+
+    seen: set[str] = set()
+    for name in names:
+        if name in seen:
+            raise ValueError(f"duplicate sequence name {name}")
+        seen.add(name)
+    overflow = needs_long(list(zip(names, sizes)))
+    if overflow and long is False:
+        raise ValueError("index overflow; the 2bit format needs the 64-bit (long) layout")
+    use_long = bool(long) or overflow
+
+    records = []
+    offset = index_size(names, use_long)
+    for name, size in zip(names, sizes):
+        records.append((name, offset))
+        offset += size
+
+    tmp = twobit.with_name(twobit.name + ".tmp")
+    try:
+        with tmp.open("wb") as out:
+            out.write(index_bytes(records, use_long))
+            for part, start, length in spans:
+                with part.open("rb") as handle:
+                    handle.seek(start)
+                    _copy(handle, out, length)
+        os.replace(tmp, twobit)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return {"seq_count": len(records), "long": use_long, "twobit_size": twobit.stat().st_size}
+
+
+def plan_shards(
+    fastas: list[Path], jobs: int, headers: dict[Path, list[tuple[str, int]]] | None = None
+) -> list[tuple[Path, int, int | None, list[str] | None]]:
+    """Split the inputs on record boundaries into roughly equal byte ranges.
+
+    `headers` maps a FASTA to its (name, offset) list from prescan(); the
+    other files get a scan_headers() pass.
+    """
+    total = sum(fasta.stat().st_size for fasta in fastas)
+    target = max(total // (jobs * SHARDS_PER_JOB), MIN_SHARD) if jobs > 1 else math.inf
+    headers = headers or {}
+    shards = []
+    for fasta in fastas:
+        records = headers.get(fasta)
+        if is_gzip(fasta):
+            # A compressed stream cannot be entered mid-way; known names
+            # still spare encode() the side file of a deferred index.
+            shards.append((fasta, 0, None, [name for name, _ in records] if records is not None else None))
+            continue
+        if records is None:
+            records = scan_headers(fasta)
+        start = 0
+        names: list[str] = []
+        for name, offset in records:
+            if names and offset - start >= target:
+                shards.append((fasta, start, offset, names))
+                start, names = offset, []
+            names.append(name)
+        shards.append((fasta, start, None, names))
+    return shards
+
+
+def encode_files(
+    fastas: list[Path],
+    twobit: Path,
+    jobs: int = 1,
+    long: bool | None = None,
+    headers: dict[Path, list[tuple[str, int]]] | None = None,
+    only: set[str] | None = None,
+) -> dict:
+    """Convert one or more FASTA files into a single 2bit, sharded over `jobs` processes.
+
+    Records keep their input order, so the result is the same file
+    faToTwoBit writes for `faToTwoBit in1.fa in2.fa ... out.2bit`.
+    `headers` are prescan() results for some of the inputs, see plan_shards().
+    `only` keeps just the records with these names.
+    """
+    shards = plan_shards(fastas, jobs, headers)
+    if len(shards) == 1:
+        fasta, _, _, names = shards[0]
+        result = encode(fasta, twobit, names, long, only=only)
+        result["shards"] = 1
+        return result
+
+    with tempfile.TemporaryDirectory(dir=twobit.parent, prefix=".twobit-") as tmpdir:
+        parts = [Path(tmpdir) / f"part{i:05d}.2bit" for i in range(len(shards))]
+        if jobs > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                results = list(pool.map(_encode_shard, shards, parts, [only] * len(shards)))
+        else:
+            results = [_encode_shard(shard, part, only) for shard, part in zip(shards, parts)]
+        # Shards may hold only empty records, which are skipped as in a
+        # serial run; the input as a whole still needs some sequence.
+        if not any(part["fasta_bases"] for part in results):
+            raise ValueError("no FASTA sequence data was found")
+        result = merge(parts, twobit, long)
+    result["skipped"] = [name for part in results for name in part["skipped"]]
+    result["fasta_bases"] = sum(part["fasta_bases"] for part in results)
+    result["shards"] = len(shards)
+    return result
+
+
+def _encode_shard(
+    shard: tuple[Path, int, int | None, list[str] | None], part: Path, only: set[str] | None = None
+) -> dict:
+    fasta, start, end, names = shard
+    return encode(fasta, part, names, None, start, end, only, part=True)
+
+
+class TwoBitFile:
+    """Read-only, memory-mapped view of a .2bit file.
+
+    The index is parsed on first use and each record header when that
+    sequence is first touched, so opening a 20 GB file costs nothing and
+    fetch() decodes only the bytes covering the requested range.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._handle = path.open("rb")
+        self.file_size = os.fstat(self._handle.fileno()).st_size
+        if self.file_size < 16:
+            self._handle.close()
+            raise ValueError(f"{path} is not a 2bit file")
+        self._map = mmap.mmap(self._handle.fileno(), 0, access=mmap.ACCESS_READ)
+        signature = struct.unpack("<I", self._map[:4])[0]
+        if signature == SIGNATURE:
+            self.byte_order = "<"
+        elif signature == struct.unpack(">I", struct.pack("<I", SIGNATURE))[0]:
+            self.byte_order = ">"
+        else:
+            self.close()
+            raise ValueError(f"{path} is not a 2bit file")
+        self.version, self.seq_count = struct.unpack(self.byte_order + "II", self._map[4:12])
+        if self.version not in (0, 1):
+            self.close()
+            raise ValueError(f"unsupported 2bit version {self.version}")
+        self._index: dict[str, int] | None = None
+        self._records: dict[str, _Record] = {}
+
+    def __enter__(self) -> TwoBitFile:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._map.close()
+        self._handle.close()
+
+    @property
+    def index(self) -> dict[str, int]:
+        """Sequence name -> record offset, in file order."""
+        if self._index is None:
+            self._index = dict(self.iter_index())
+        return self._index
+
+    def iter_index(self):
+        """Yield (name, record offset) pairs without keeping them."""
+        fmt = self.byte_order + ("Q" if self.version == 1 else "I")
+        width = struct.calcsize(fmt)
+        pos = 16
+        for _ in range(self.seq_count):
+            size = self._map[pos]
+            name = self._map[pos + 1:pos + 1 + size].decode("utf-8", errors="replace")
+            pos += 1 + size
+            yield name, struct.unpack(fmt, self._map[pos:pos + width])[0]
+            pos += width
+
+    def length(self, name: str) -> int:
+        return self._record(name).size
+
+    def fetch(self, name: str, start: int = 0, end: int | None = None, mask: bool = True) -> bytes:
+        """Decode bases [start, end) of `name`; lower case marks soft-masking."""
+        record = self._record(name)
+        end = record.size if end is None else min(end, record.size)
+        if start >= end:
+            return b""
+        first, last = start // 4, (end + 3) // 4
+        packed = self._map[record.dna + first:record.dna + last]
+        seq = bytearray(4 * len(packed))
+        for phase, table in enumerate(DECODE_TABLES):
+            seq[phase::4] = packed.translate(table)
+        seq = seq[start - 4 * first:end - 4 * first]
+        for block_start, block_end in _overlaps(record.n_starts, record.n_sizes, start, end):
+            seq[block_start - start:block_end - start] = b"N" * (block_end - block_start)
+        if mask:
+            for block_start, block_end in _overlaps(record.mask_starts, record.mask_sizes, start, end):
+                seq[block_start - start:block_end - start] = seq[block_start - start:block_end - start].lower()
+        return bytes(seq)
+
+    def _record(self, name: str) -> _Record:
+        record = self._records.get(name)
+        if record is None:
+            offset = self.index.get(name)
+            if offset is None:
+                raise KeyError(f"sequence {name} is not in {self.path}")
+            size, n_count = struct.unpack(self.byte_order + "II", self._map[offset:offset + 8])
+            pos = offset + 8
+            n_starts, n_sizes, pos = self._blocks(pos, n_count)
+            mask_count = struct.unpack(self.byte_order + "I", self._map[pos:pos + 4])[0]
+            mask_starts, mask_sizes, pos = self._blocks(pos + 4, mask_count)
+            record = _Record(size, n_starts, n_sizes, mask_starts, mask_sizes, pos + 4)
+            self._records[name] = record
+        return record
+
+    def _blocks(self, pos: int, count: int) -> tuple[array, array, int]:
+        starts = array("I", self._map[pos:pos + 4 * count])
+        sizes = array("I", self._map[pos + 4 * count:pos + 8 * count])
+        if (self.byte_order == "<") != (sys.byteorder == "little"):
+            starts.byteswap()
+            sizes.byteswap()
+        return starts, sizes, pos + 8 * count
+
+
+class _Record(NamedTuple):
+    size: int
+    n_starts: array
+    n_sizes: array
+    mask_starts: array
+    mask_sizes: array
+    dna: int
+
+
+def _overlaps(starts: array, sizes: array, start: int, end: int):
+    i = max(bisect.bisect_right(starts, start) - 1, 0)
+    while i < len(starts) and starts[i] < end:
+        block_end = starts[i] + sizes[i]
+        if block_end > start:
+            yield max(starts[i], start), min(block_end, end)
+        i += 1
+
+
+def verify(
+    twobit: Path,
+    fasta: Path,
+    fai: Path | None = None,
+    samples: int = 0,
+    jobs: int = 1,
+    only: set[str] | None = None,
+) -> dict:
+    """Check that `twobit` holds exactly the sequences of `fasta` (those named in `only`, if given).
+
+    Names, order and lengths are always compared. With samples=0 every
+    sequence is decoded and its digest compared with the FASTA record's;
+    otherwise the first and last SAMPLE_BASES of every sequence plus
+    `samples` random ranges are compared through the .fai index, which
+    reads only a small part of either file. A gzip-compressed FASTA is
+    always digested, in one streaming pass.
+    """
+    with TwoBitFile(twobit) as reader:
+        lengths = {name: reader.length(name) for name in reader.index}
+    if is_gzip(fasta):
+        return _verify_stream(twobit, fasta, lengths, jobs, only)
+    tasks: list[tuple] = []
+    sampled = bool(samples) and fai is not None
+    if sampled:
+        entries = [entry for entry in _read_fai(fai) if only is None or entry[0] in only]
+        names = [entry[0] for entry in entries]
+        rng = random.Random(0)
+        total = sum(lengths.values())
+        picks: dict[str, list[int]] = {}
+        for _ in range(samples if total else 0):
+            pos = rng.randrange(total)
+            for name, length in lengths.items():
+                if pos < length:
+                    picks.setdefault(name, []).append(pos)
+                    break
+                pos -= length
+        for entry in entries:
+            name, length = entry[0], entry[1]
+            if lengths.get(name) != length:
+                # Missing, or FASTA coordinates shifted by gap characters:
+                # compare the whole record instead.
+                tasks.append(("digest", name, *_fai_span(entry), False))
+            else:
+                starts = [0, max(length - SAMPLE_BASES, 0)] + picks.get(name, [])
+                tasks.append(("ranges", name, entry, starts))
+    else:
+        headers = scan_headers(fasta)
+        fasta_size = fasta.stat().st_size
+        names = [name for name, _ in headers]
+        for i, (name, offset) in enumerate(headers):
+            end = headers[i + 1][1] if i + 1 < len(headers) else fasta_size
+            tasks.append(("digest", name, offset, end, True))
+        if only is not None:
+            names = [name for name in names if name in only]
+            tasks = [task for task in tasks if task[1] in only]
+
+    problems = _check_names(names, list(lengths))
+    batches = [tasks[i::jobs] for i in range(jobs)] if jobs > 1 else [tasks]
+    if jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(_verify_batch, [twobit] * jobs, [fasta] * jobs, batches))
+    else:
+        results = [_verify_batch(twobit, fasta, batch) for batch in batches]
+    for batch_problems in results:
+        problems.extend(batch_problems)
+    return {
+        "ok": not problems,
+        "mode": "sampled" if sampled else "digest",
+        "seq_count": len(lengths),
+        "checked": len(tasks),
+        "problems": problems[:50],
+    }
+
+
+def _verify_batch(twobit: Path, fasta: Path, tasks: list[tuple]) -> list[str]:
+    problems = []
+    with TwoBitFile(twobit) as reader, fasta.open("rb") as handle:
+        for task in tasks:
+            kind, name = task[0], task[1]
+            if kind == "digest":
+                problem = _verify_digest(reader, handle, name, *task[2:])
+            else:
+                problem = _verify_ranges(reader, handle, name, task[2], task[3])
+            if problem:
+                problems.append(problem)
+    return problems
+
+
+def _verify_digest(
+    reader: TwoBitFile, handle: BinaryIO, name: str, start: int, end: int, has_header: bool
+) -> str:
+    handle.seek(start)
+    header = handle.readline(end - start) if has_header else b""
+    remaining = end - start - len(header)
+    digest = hashlib.sha256()
+    fasta_length = 0
+    while remaining > 0:
+        block = handle.read(min(BLOCK_SIZE, remaining))
+        if not block:
+            break
+        remaining -= len(block)
+        bases = block.translate(EXPECTED_BASES, NON_LETTERS)
+        fasta_length += len(bases)
+        digest.update(bases)
+    if name not in reader.index:
+        return f"{name}: missing from 2bit" if fasta_length else ""
+    length = reader.length(name)
+    if length != fasta_length:
+        return f"{name}: length {length} in 2bit, {fasta_length} in FASTA"
+    if _twobit_digest(reader, name) != digest.digest():
+        return f"{name}: sequence differs from FASTA"
+    return ""
+
+
+def _twobit_digest(reader: TwoBitFile, name: str) -> bytes:
+    digest = hashlib.sha256()
+    step = 4 * CHUNK_BASES
+    for pos in range(0, reader.length(name), step):
+        digest.update(reader.fetch(name, pos, pos + step))
+    return digest.digest()
+
+
+def _twobit_digests(twobit: Path, names: list[str]) -> dict[str, bytes]:
+    with TwoBitFile(twobit) as reader:
+        return {name: _twobit_digest(reader, name) for name in names}
+
+
+class _DigestScanner(FastaScanner):
+    """FastaScanner that digests each record's bases as 2bit stores them."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.records: list[tuple[str, int, bytes]] = []
+        self._name = ""
+        self._length = 0
+        self._hash = hashlib.sha256()
+
+    def start_record(self, header: bytes, offset: int) -> None:
+        parts = header.split(None, 1)
+        self._name = parts[0].decode("utf-8", errors="replace") if parts else ""
+        self._length = 0
+        self._hash = hashlib.sha256()
+
+    def sequence(self, raw: bytes, offset: int) -> None:
+        bases = raw.translate(EXPECTED_BASES, NON_LETTERS)
+        self._length += len(bases)
+        self._hash.update(bases)
+
+    def end_record(self, length: int) -> None:
+        self.records.append((self._name, self._length, self._hash.digest()))
+
+
+def _verify_stream(
+    twobit: Path, fasta: Path, lengths: dict[str, int], jobs: int, only: set[str] | None = None
+) -> dict:
+    # The 2bit side is digested in worker processes while this one reads the
+    # compressed FASTA.
+    names = list(lengths)
+    batches = [batch for batch in (names[i::jobs] for i in range(jobs)) if batch]
+    digests: dict[str, bytes] = {}
+    scanner = _DigestScanner()
+    if jobs > 1 and batches:
+        with ProcessPoolExecutor(max_workers=len(batches)) as pool:
+            futures = [pool.submit(_twobit_digests, twobit, batch) for batch in batches]
+            scan_file(fasta, scanner)
+            for future in futures:
+                digests.update(future.result())
+    else:
+        scan_file(fasta, scanner)
+        digests = _twobit_digests(twobit, names)
+    if only is not None:
+        scanner.records = [record for record in scanner.records if record[0] in only]
+
+    problems = _check_names([name for name, _, _ in scanner.records], names)
+    for name, fasta_length, digest in scanner.records:
+        if name not in lengths:
+            if fasta_length:
+                problems.append(f"{name}: missing from 2bit")
+        elif lengths[name] != fasta_length:
+            problems.append(f"{name}: length {lengths[name]} in 2bit, {fasta_length} in FASTA")
+        elif digests[name] != digest:
+            problems.append(f"{name}: sequence differs from FASTA")
+    return {
+        "ok": not problems,
+        "mode": "digest",
+        "seq_count": len(lengths),
+        "checked": len(scanner.records),
+        "problems": problems[:50],
+    }
+
+
+def _verify_ranges(reader: TwoBitFile, handle: BinaryIO, name: str, entry: tuple, starts: list[int]) -> str:
+    _, length, offset, line_bases, line_width = entry
+    for start in starts:
+        end = min(start + SAMPLE_BASES, length)
+
+        def byte_at(pos: int) -> int:
+            return offset + (pos // line_bases) * line_width + pos % line_bases
+
+        handle.seek(byte_at(start))
+        raw = handle.read(byte_at(end) - byte_at(start))
+        if raw.translate(EXPECTED_BASES, NON_LETTERS) != reader.fetch(name, start, end):
+            return f"{name}: bases {start}-{end} differ from FASTA"
+    return ""
+
+
+def _read_fai(path: Path) -> list[tuple[str, int, int, int, int]]:
+    entries = []
+    with path.open(encoding="utf-8") as handle:
+        for line in handle:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) >= 5:
+                entries.append((fields[0], *(int(value) for value in fields[1:5])))
+    return entries
+
+
+def _fai_span(entry: tuple[str, int, int, int, int]) -> tuple[int, int]:
+    # Byte range of a record for the digest check, header line excluded.
+    _, length, offset, line_bases, line_width = entry
+    lines = -(-length // line_bases) if line_bases else 0
+    return offset, offset + lines * line_width
+
+
+def _check_names(fasta_names: list[str], twobit_names: list[str]) -> list[str]:
+    # Names missing from the 2bit are reported by their digest check, since
+    # faToTwoBit legitimately drops records without bases.
+    fasta_set = set(fasta_names)
+    extra = [name for name in twobit_names if name not in fasta_set]
+    if extra:
+        return [f"sequences not in the FASTA: {', '.join(extra[:5])}"]
+    twobit_set = set(twobit_names)
+    if [name for name in fasta_names if name in twobit_set] != twobit_names:
+        return ["sequences are in a different order than in the FASTA"]
+    return []
+
+
+def _copy(src: BinaryIO, dst: BinaryIO, length: int) -> None:
+    while length > 0:
+        data = src.read(min(BLOCK_SIZE, length))
+        if not data:
+            raise ValueError(f"{getattr(src, 'name', '2bit')} is truncated")
+        dst.write(data)
+        length -= len(data)
+
+
+def _spool_dir(out: BinaryIO) -> str | None:
+    name = getattr(out, "name", None)
+    return os.path.dirname(os.path.abspath(name)) if isinstance(name, str) else None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", 1)[0])
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    enc = sub.add_parser("encode", help="Convert FASTA to 2bit like faToTwoBit.")
+    enc.add_argument("fasta", type=Path, nargs="+", help="One or more FASTA files, in output order.")
+    enc.add_argument("twobit", type=Path)
+    enc.add_argument("--fai", type=Path, default=None, help="Take the record order from this .fai index.")
+    enc.add_argument("--jobs", type=int, default=1, help="Encode record-aligned shards in this many processes.")
+    enc.add_argument("--only", type=Path, default=None, help="Encode only the sequences named in this file.")
+    layout = enc.add_mutually_exclusive_group()
+    layout.add_argument("--long", dest="long", action="store_const", const=True, default=None,
+                        help="Always use the 64-bit index (faToTwoBit -long).")
+    layout.add_argument("--short", dest="long", action="store_const", const=False,
+                        help="Fail instead of switching to the 64-bit index.")
+    enc.add_argument("--json", type=Path, default=None)
+    mrg = sub.add_parser("merge", help="Concatenate 2bit files and rewrite the index.")
+    mrg.add_argument("twobit", type=Path)
+    mrg.add_argument("parts", type=Path, nargs="+")
+    mrg.add_argument("--json", type=Path, default=None)
+    ver = sub.add_parser("verify", help="Check a 2bit file against its source FASTA.")
+    ver.add_argument("twobit", type=Path)
+    ver.add_argument("fasta", type=Path)
+    ver.add_argument("--fai", type=Path, default=None,
+                     help="FASTA .fai index; without it --sample falls back to full digests.")
+    ver.add_argument("--sample", type=int, default=0,
+                     help="Compare this many random ranges instead of every base.")
+    ver.add_argument("--jobs", type=int, default=1)
+    ver.add_argument("--only", type=Path, default=None, help="Check only the sequences named in this file.")
+    ver.add_argument("--json", type=Path, default=None)
+    args = parser.parse_args()
+
+    try:
+        only = read_names(args.only) if getattr(args, "only", None) else None
+        if args.cmd == "merge":
+            result = merge(args.parts, args.twobit)
+        elif args.cmd == "verify":
+            fai = args.fai if args.fai and args.fai.exists() else None
+            result = verify(args.twobit, args.fasta, fai, args.sample, max(args.jobs, 1), only)
+        elif len(args.fasta) == 1 and args.jobs <= 1:
+            names = read_fai_names(args.fai) if args.fai and args.fai.exists() else None
+            result = encode(args.fasta[0], args.twobit, names, args.long, only=only)
+        else:
+            result = encode_files(args.fasta, args.twobit, max(args.jobs, 1), args.long, only=only)
+    except Exception as exc:
+        print(f"ERROR: 2bit {args.cmd} failed: {exc}", file=sys.stderr)
+        return 1
+
+    text = json.dumps(result, sort_keys=True)
+    print(text)
+    if args.json:
+        args.json.write_text(text + "\n", encoding="utf-8")
+    if args.cmd == "verify" and not result["ok"]:
+        print(f"ERROR: {args.twobit} does not match {args.fasta}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
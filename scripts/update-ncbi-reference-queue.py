@@ -17,13 +17,12 @@ be handled through smaller representative selections or on-demand builds.
 from __future__ import annotations
 
 import argparse
-import csv
 import json
 import re
 from collections import Counter
 from pathlib import Path
-from typing import Iterable
 
+from assembly_summary import SummaryStore
 from normalize_package_name import build_package_name
 
 
@@ -43,6 +42,12 @@ ASSEMBLY_LEVEL_RANK = {
     "Contig": 3,
 }
 
+# The assembly_summary columns the selectors and queue items read.
+SUMMARY_COLUMNS = [
+    "assembly_accession", "organism_name", "asm_name", "group", "genome_size", "seq_rel_date",
+    "version_status", "refseq_category", "assembly_level",
+]
+
 BACTERIA_PRIORITY_PATTERNS = [
     r"\bEscherichia coli\b",
     r"\bBacillus subtilis\b",
@@ -72,17 +77,6 @@ BACTERIA_PRIORITY_PATTERNS = [
 ]
 
 
-def iter_summary(path: Path) -> Iterable[dict[str, str]]:
-    with path.open() as handle:
-        for line in handle:
-            if line.startswith("#assembly_accession"):
-                headers = line.lstrip("#").rstrip("\n").split("\t")
-                break
-        else:
-            raise ValueError(f"no assembly_summary header found in {path}")
-        yield from csv.DictReader(handle, fieldnames=headers, delimiter="\t")
-
-
 def clean_organism(value: str) -> str:
     return re.sub(r"\s+", " ", value).strip()
 
@@ -283,19 +277,20 @@ def main() -> None:
     published_packages = {item.get("package") for item in packages}
     published_accessions = {item.get("accession") for item in packages if item.get("provider") == "NCBI"}
 
-    refseq_rows = list(iter_summary(args.refseq_summary))
     wanted_accessions = {
         str(item.get("accession")) for item in queue if item.get("accession")
     }
     release_by_accession = {}
-    for row in refseq_rows:
-        accession = row.get("assembly_accession", "")
-        if accession in wanted_accessions:
-            release_by_accession[accession] = normalize_release_date(row.get("seq_rel_date", ""))
-    for row in iter_summary(args.genbank_summary):
-        accession = row.get("assembly_accession", "")
-        if accession in wanted_accessions and accession not in release_by_accession:
-            release_by_accession[accession] = normalize_release_date(row.get("seq_rel_date", ""))
+    with SummaryStore(args.refseq_summary) as store:
+        # Both selectors below only take latest reference genomes.
+        refseq_rows = list(store.rows(
+            SUMMARY_COLUMNS, version_status="latest", refseq_category="reference genome"
+        ))
+        found = store.find(wanted_accessions, ["seq_rel_date"])
+    with SummaryStore(args.genbank_summary) as store:
+        found = {**store.find(wanted_accessions - found.keys(), ["seq_rel_date"]), **found}
+    for accession, row in found.items():
+        release_by_accession[accession] = normalize_release_date(row["seq_rel_date"])
 
     by_key = {dedupe_key(item): item for item in queue}
     by_accession = {str(item.get("accession")): item for item in queue if item.get("accession")}
@@ -32,6 +32,7 @@ BROKEN_NCBI_BASE_RE = re.compile(
     r"^https://www\.ncbi\.nlm\.nih\.gov/datasets/genome/?$", re.I
 )
 SHA256_RE = re.compile(r"^[0-9a-f]{64}$", re.I)
+SHA512T24U_RE = re.compile(r"^[A-Za-z0-9_-]{32}$")
 ISO_UTC_RE = re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z$")
 
 
@@ -145,6 +146,28 @@ def validate_package(
             f"{label}: provenance.description_sha256 is not a SHA-256 hex digest"
         )
 
+    sequence_digests = provenance.get("sequence_digests")
+    if sequence_digests:
+        if not isinstance(sequence_digests, dict):
+            errors.append(f"{label}: provenance.sequence_digests must be an object")
+            return
+        if not SHA512T24U_RE.match(str(sequence_digests.get("seqcol") or "")):
+            errors.append(f"{label}: provenance.sequence_digests.seqcol is not a sha512t24u digest")
+        level1 = sequence_digests.get("level1")
+        if level1 is not None and (
+            not isinstance(level1, dict)
+            or not all(SHA512T24U_RE.match(str(level1.get(key) or "")) for key in ("names", "lengths", "sequences"))
+        ):
+            errors.append(f"{label}: provenance.sequence_digests.level1 must hold names/lengths/sequences digests")
+        arrays = [sequence_digests.get(key) for key in ("names", "lengths", "sequences")]
+        if any(array is not None for array in arrays):
+            if not all(isinstance(array, list) for array in arrays) or len({len(array) for array in arrays}) != 1:
+                errors.append(
+                    f"{label}: provenance.sequence_digests names/lengths/sequences must be lists of equal length"
+                )
+            elif not all(SHA512T24U_RE.match(str(digest).removeprefix("SQ.")) for digest in arrays[2]):
+                errors.append(f"{label}: provenance.sequence_digests.sequences has a malformed digest")
+
 
 def main() -> int:
     parser = argparse.ArgumentParser()